@@ -0,0 +1,95 @@
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict
+
+from fastapi.staticfiles import StaticFiles
+
+# Background image pipeline. `python -m app.assets` resizes each source in
+# static/ to the widths below and writes AVIF, WebP and JPEG variants with
+# content-hashed names to static/dist/ plus a manifest. Templates reference
+# them via __IMAGE_SET(name@width)__ / __IMAGE_URL(name@width)__ placeholders,
+# which render_assets() expands; without a manifest the originals are used.
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST = DIST_DIR / "manifest.json"
+
+SOURCES = {
+    "BG-desktop": ("BG-desktop.png", (1536, 1024)),
+    "BG-mobile": ("BG-mobile.png", (722,)),
+}
+FORMATS = (  # (extension, Pillow format, mime type, save options), best first
+    ("avif", "AVIF", "image/avif", {"quality": 50}),
+    ("webp", "WEBP", "image/webp", {"quality": 75, "method": 6}),
+    ("jpg", "JPEG", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}),
+)
+_MIME = {ext: mime for ext, _, mime, _ in FORMATS}
+
+_PLACEHOLDER = re.compile(r"__IMAGE_(SET|URL)\(([\w-]+)@(\d+)\)__")
+
+
+def build() -> dict:
+    from PIL import Image  # build-time only
+
+    DIST_DIR.mkdir(parents=True, exist_ok=True)
+    manifest: Dict[str, Dict[str, Dict[str, str]]] = {}
+    for name, (filename, widths) in SOURCES.items():
+        with Image.open(STATIC_DIR / filename) as src:
+            src = src.convert("RGB")
+            for width in widths:
+                height = round(src.height * width / src.width)
+                img = src if width == src.width else src.resize((width, height), Image.LANCZOS)
+                variants = manifest.setdefault(name, {}).setdefault(str(width), {})
+                for stale in DIST_DIR.glob(f"{name}-{width}.*"):
+                    stale.unlink()
+                for ext, fmt, _, options in FORMATS:
+                    tmp = DIST_DIR / f"{name}-{width}.tmp"
+                    img.save(tmp, fmt, **options)
+                    digest = hashlib.sha256(tmp.read_bytes()).hexdigest()[:10]
+                    out = DIST_DIR / f"{name}-{width}.{digest}.{ext}"
+                    tmp.replace(out)
+                    variants[ext] = f"/static/dist/{out.name}"
+    MANIFEST.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return manifest
+
+
+def load_manifest() -> dict:
+    try:
+        return json.loads(MANIFEST.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def render_assets(html: str, manifest: dict = None) -> str:
+    manifest = load_manifest() if manifest is None else manifest
+
+    def expand(m: re.Match) -> str:
+        kind, name, width = m.groups()
+        variants = manifest.get(name, {}).get(width)
+        if not variants:
+            return f"url('/static/{SOURCES[name][0]}')"
+        if kind == "URL":
+            return f"url('{variants['jpg']}')"
+        return "image-set(" + ", ".join(
+            f"url('{variants[ext]}') type('{_MIME[ext]}')" for ext, _, _, _ in FORMATS if ext in variants
+        ) + ")"
+
+    return _PLACEHOLDER.sub(expand, html)
+
+
+class AssetStaticFiles(StaticFiles):
+    # Hashed files under dist/ never change, so they can be cached forever.
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if "/dist/" in Path(full_path).as_posix() and not str(full_path).endswith("manifest.json"):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+if __name__ == "__main__":
+    for name, sizes in build().items():
+        for width, variants in sizes.items():
+            for ext, url in variants.items():
+                print(f"{name}@{width} {ext:4s} {(STATIC_DIR.parent / url.lstrip('/')).stat().st_size:>9,d} {url}")
@@ -0,0 +1,98 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from uuid import uuid4
+
+from . import relay, state
+from .frames import dumps
+
+# Saved cards. The store keeps each customer's cards as one list; the vault
+# caches them per customer, indexed by card_id and by (brand, last4, exp),
+# together with the encoded /customer/{id}/cards body and its ETag. Saving
+# the same card again reuses its entry, and a customer keeps at most
+# CARD_LIMIT cards, oldest dropped first. Other workers drop their cached
+# copy when a card is added (relay topic "cards:<customer_id>").
+
+CARD_LIMIT = int(os.environ.get("CARD_LIMIT", 10))
+CACHED_WALLETS = 10_000
+
+DEMO_CARDS = (
+    {"card_id": "card_demo_1", "brand": "VISA", "last4": "4242", "exp": "12/29"},
+    {"card_id": "card_demo_2", "brand": "MASTERCARD", "last4": "4444", "exp": "08/28"},
+)
+
+CardKey = Tuple[str, str, str]  # (brand, last4, exp)
+
+
+def card_key(card: dict) -> CardKey:
+    return (card["brand"], card["last4"], card["exp"])
+
+
+class Wallet:
+    __slots__ = ("customer_id", "cards", "by_key", "body", "etag")
+
+    def __init__(self, customer_id: str, cards: Dict[str, dict]) -> None:
+        self.customer_id = customer_id
+        self.cards = cards                # card_id -> card, oldest first
+        self.by_key: Dict[CardKey, str] = {card_key(c): card_id for card_id, c in cards.items()}
+        self.body = dumps({"customer_id": customer_id, "cards": list(cards.values())}).encode()
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=8).hexdigest()}"'
+
+
+class CardVault:
+    def __init__(self, limit: int = CARD_LIMIT, cached: int = CACHED_WALLETS) -> None:
+        self.limit = limit
+        self.cached = cached
+        self.wallets: "OrderedDict[str, Wallet]" = OrderedDict()
+
+    def wallet(self, customer_id: str) -> Wallet:
+        # New customers get the demo cards; lists saved before the vault
+        # existed are deduped and trimmed on first load.
+        w = self.wallets.get(customer_id)
+        if w is not None:
+            self.wallets.move_to_end(customer_id)
+            return w
+        stored = state.store.get_cards(customer_id)
+        cards: Dict[str, dict] = {}
+        seen: Dict[CardKey, str] = {}
+        for c in DEMO_CARDS if stored is None else stored:
+            previous = seen.pop(card_key(c), None)
+            if previous is not None:
+                del cards[previous]
+            seen[card_key(c)] = c["card_id"]
+            cards[c["card_id"]] = c
+        while len(cards) > self.limit:
+            del cards[next(iter(cards))]
+        if stored is None or len(cards) != len(stored):
+            state.store.save_cards(customer_id, list(cards.values()))
+        return self._cache(Wallet(customer_id, cards))
+
+    def get(self, customer_id: str, card_id: str) -> Optional[dict]:
+        return self.wallet(customer_id).cards.get(card_id)
+
+    def add(self, customer_id: str, brand: str, last4: str, exp: str) -> dict:
+        w = self.wallet(customer_id)
+        cards = dict(w.cards)
+        existing = w.by_key.get((brand, last4, exp))
+        card = cards.pop(existing) if existing else {"card_id": f"card_{uuid4().hex[:8]}", "brand": brand, "last4": last4, "exp": exp}
+        cards[card["card_id"]] = card  # (re)added cards count as newest
+        while len(cards) > self.limit:
+            del cards[next(iter(cards))]
+        state.store.save_cards(customer_id, list(cards.values()))
+        self._cache(Wallet(customer_id, cards))
+        relay.link.publish(f"cards:{customer_id}", [])
+        return card
+
+    def forget(self, customer_id: str) -> None:
+        self.wallets.pop(customer_id, None)
+
+    def _cache(self, w: Wallet) -> Wallet:
+        self.wallets[w.customer_id] = w
+        self.wallets.move_to_end(w.customer_id)
+        while len(self.wallets) > self.cached:
+            self.wallets.popitem(last=False)
+        return w
+
+
+vault = CardVault()
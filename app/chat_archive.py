@@ -0,0 +1,143 @@
+import itertools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .frames import dumps
+
+# Append-only chat transcript archive. Orders only keep their last few chat
+# messages (helpers.record_chat); every message is also appended here, one
+# JSON line per message, to segment files that roll over at SEGMENT_BYTES.
+# Each flush appends "order_id<TAB>segment<TAB>start<TAB>end" to index.log
+# for every order it wrote: the byte range holding all of that order's lines
+# in the segment so far, so a transcript read covers only that range. Writes are buffered and flushed
+# with the state store (main.py). Each process writes its own segments;
+# index lines are appended whole, so workers can share the directory.
+# Readers keep the index in memory for the INDEX_ORDERS most recently used
+# orders, reading only what was appended to index.log since their last read.
+# Order ids sort by creation time, so an order missing from the index is
+# either newer than every order dropped from it (no chat archived yet) or
+# is looked up again in index.log. transcript() does blocking file reads;
+# the route runs it in a thread.
+
+SEGMENT_BYTES = 16 << 20
+INDEX_ORDERS = 10_000
+
+_rolls = itertools.count()  # keeps segment names unique when two rolls share a millisecond
+
+Span = Tuple[int, int]  # (start, end) bytes of one order's lines in a segment
+
+
+class ChatArchive:
+    def __init__(self, directory: str, segment_bytes: int = SEGMENT_BYTES, index_orders: int = INDEX_ORDERS) -> None:
+        self.dir = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.index_orders = index_orders
+        self.segment: Optional[str] = None
+        self.size = 0                            # bytes in the current segment, buffered included
+        self.starts: Dict[str, int] = {}         # order_id -> first offset in the current segment
+        self.touched: Dict[str, Span] = {}       # orders written since the last flush
+        self.lines: List[bytes] = []
+        self.index: "OrderedDict[str, Dict[str, Span]]" = OrderedDict()  # order_id -> segment -> span, least recently used first
+        self._floor = ""                              # highest order id dropped from the index
+        self._index_pos = 0                           # bytes of index.log already read
+        self._index_lock = threading.Lock()
+
+    def append(self, order_id: str, message: dict) -> None:
+        if self.segment is None or self.size >= self.segment_bytes:
+            self._roll()
+        start = self.starts.setdefault(order_id, self.size)
+        line = dumps({"order_id": order_id, **message}).encode() + b"\n"
+        self.lines.append(line)
+        self.size += len(line)
+        self.touched[order_id] = (start, self.size)
+
+    def _roll(self) -> None:
+        self.flush()
+        self.segment = f"segment-{int(time.time() * 1000):013d}-{os.getpid()}-{next(_rolls)}.log"
+        self.size = 0
+        self.starts = {}
+
+    def flush(self) -> None:
+        if not self.lines:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / self.segment, "ab") as f:
+            f.write(b"".join(self.lines))
+        # Index after data, so an index entry never points past the segment end.
+        with open(self.dir / "index.log", "ab") as f:
+            f.write("".join(f"{oid}\t{self.segment}\t{start}\t{end}\n" for oid, (start, end) in self.touched.items()).encode())
+        self.lines = []
+        self.touched = {}
+
+    def _locations(self, order_id: str) -> List[Tuple[str, int, int]]:
+        with self._index_lock:
+            try:
+                with open(self.dir / "index.log", "rb") as f:
+                    f.seek(self._index_pos)
+                    data = f.read()
+            except FileNotFoundError:
+                return []
+            end = data.rfind(b"\n") + 1  # a line still being appended is read next time
+            for line in data[:end].decode().splitlines():
+                oid, segment, start, stop = line.split("\t")
+                spans = self.index.get(oid)
+                if spans is None:
+                    if oid <= self._floor:
+                        continue  # dropped: rebuilt from index.log when asked for
+                    spans = self._remember(oid, {})
+                spans[segment] = (int(start), int(stop))
+            self._index_pos += end
+            spans = self.index.get(order_id)
+            if spans is not None:
+                self.index.move_to_end(order_id)
+            elif order_id <= self._floor:
+                spans = self._remember(order_id, self._scan(order_id))
+            else:
+                return []
+            return [(segment, start, stop) for segment, (start, stop) in spans.items()]
+
+    def _remember(self, order_id: str, spans: Dict[str, Span]) -> Dict[str, Span]:
+        self.index[order_id] = spans
+        if len(self.index) > self.index_orders:
+            dropped, _ = self.index.popitem(last=False)
+            self._floor = max(self._floor, dropped)
+        return spans
+
+    def _scan(self, order_id: str) -> Dict[str, Span]:
+        # Slow path: the order's lines in the part of index.log already read.
+        key = f"{order_id}\t".encode()
+        spans: Dict[str, Span] = {}
+        pos = 0
+        with open(self.dir / "index.log", "rb") as f:
+            for line in f:
+                pos += len(line)
+                if pos > self._index_pos:
+                    break
+                if line.startswith(key):
+                    _, segment, start, stop = line.decode().split("\t")
+                    spans[segment] = (int(start), int(stop))
+        return spans
+
+    def transcript(self, order_id: str, after: int = 0, limit: int = 50) -> List[dict]:
+        # Messages numbered above `after` (see record_chat), lowest number
+        # first. With several workers one order's messages are spread over
+        # their segments in no particular order, so the page is picked by the
+        # stored number after reading all of the order's spans. Call flush()
+        # first to include buffered messages.
+        head = dumps({"order_id": order_id}).encode()[:-1]  # lines start with this order's key
+        found: List[dict] = []
+        for segment, start, end in self._locations(order_id):
+            with open(self.dir / segment, "rb") as f:
+                f.seek(start)
+                for line in f.read(end - start).splitlines():
+                    if line.startswith(head):
+                        msg = json.loads(line)
+                        if msg["n"] > after:
+                            found.append(msg)
+        found.sort(key=lambda msg: msg["n"])
+        return found[:limit]
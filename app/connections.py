@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple, Union
+from fastapi import WebSocket
+
+from . import metrics
+from .frames import Frame, TaggedFrame
+
+# Every accepted socket is wrapped in a Connection. Routes enqueue with
+# send(), which never blocks; a per-connection writer task drains the queue,
+# so a slow client only ever stalls its own writer. The queue holds Frames,
+# which may be shared with other connections and are encoded only once.
+
+QUEUE_SIZE = 64        # frames buffered per connection
+SEND_TIMEOUT = 2.0     # seconds a single frame may take before the peer is dropped
+
+# Overflow steps, tried in order when the queue is full:
+#   "coalesce_state" - merge the new order_state into the newest queued one
+#   "drop_chat"      - discard the oldest queued chat frame
+#   "disconnect"     - close the connection (also the fallback if nothing frees room)
+DEFAULT_POLICY: Tuple[str, ...] = ("coalesce_state", "drop_chat", "disconnect")
+# WebRTC signaling and cashier feed deltas must never be dropped; a client
+# that falls behind is disconnected and resyncs on reconnect.
+LOSSLESS_POLICY: Tuple[str, ...] = ("disconnect",)
+
+
+class Connection:
+    def __init__(self, ws: WebSocket, channel: str, maxsize: int = QUEUE_SIZE, policy: Tuple[str, ...] = DEFAULT_POLICY) -> None:
+        self.ws = ws
+        self.channel = channel  # metrics label: customer, order, call, cashier, lane
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue: Deque[Frame] = deque()
+        self.closed = False
+        self.dropped = 0
+        self._ready = asyncio.Event()
+        self._writer = asyncio.ensure_future(self._write_forever())
+
+    def send(self, payload: Union[Frame, dict]) -> bool:
+        if self.closed:
+            return False
+        if not isinstance(payload, Frame):
+            payload = Frame(payload)
+        if len(self.queue) >= self.maxsize:
+            payload = self._make_room(payload)
+            if payload is None:
+                self.close()
+                return False
+        self.queue.append(payload)
+        self._ready.set()
+        return True
+
+    def _make_room(self, payload: Frame) -> Optional[Frame]:
+        # Frames are shared between connections, so merges build a new one.
+        # Batched frames are never merged or dropped.
+        for step in self.policy:
+            if step == "coalesce_state" and payload.type == "order_state":
+                queued = self._pop_last("order_state", payload.stream)
+                if queued is not None:
+                    return queued.merge(payload)
+            elif step == "drop_chat" and self._pop_first("chat") is not None:
+                self.dropped += 1
+                return payload
+            elif step == "disconnect":
+                return None
+        return None
+
+    def _pop_first(self, msg_type: str) -> Optional[Frame]:
+        for i, queued in enumerate(self.queue):
+            if queued.type == msg_type:
+                del self.queue[i]
+                return queued
+        return None
+
+    def _pop_last(self, msg_type: str, stream: tuple = ()) -> Optional[Frame]:
+        for i in range(len(self.queue) - 1, -1, -1):
+            if self.queue[i].type == msg_type and self.queue[i].stream == stream:
+                queued = self.queue[i]
+                del self.queue[i]
+                return queued
+        return None
+
+    async def _write_forever(self) -> None:
+        try:
+            while True:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                started = time.perf_counter()
+                frame = self.queue.popleft()
+                await asyncio.wait_for(self.ws.send_text(frame.text), SEND_TIMEOUT)
+                channel = frame.label or self.channel
+                metrics.ws_send_seconds.observe(time.perf_counter() - started, channel)
+                metrics.ws_messages.inc(channel, "out")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Timed out or the socket went away; a partial frame makes it unusable.
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        asyncio.ensure_future(self._close_socket())
+
+    async def _close_socket(self) -> None:
+        try:
+            await asyncio.wait_for(self.ws.close(code=1011), SEND_TIMEOUT)
+        except Exception:
+            pass
+
+
+class Channel:
+    # One channel of a multiplexed socket (websockets/mux_ws.py), standing in
+    # for a Connection in the state registries. Frames are queued on the
+    # shared connection tagged with the channel (and order); closing a
+    # channel ends the subscription, not the socket. Its frames are counted
+    # in the metrics under `label` rather than the socket's "mux".
+    __slots__ = ("conn", "tag", "label", "closed")
+
+    def __init__(self, conn: Connection, tag: dict, label: str) -> None:
+        self.conn = conn
+        self.tag = tag
+        self.label = label
+        self.closed = False
+
+    def send(self, payload: Union[Frame, dict]) -> bool:
+        if self.closed:
+            return False
+        if not isinstance(payload, Frame):
+            payload = Frame(payload)
+        return self.conn.send(TaggedFrame(payload, self.tag, self.label))
+
+    def close(self) -> None:
+        self.closed = True
+
+
+Sink = Union[Connection, Channel]  # what the state registries hold
@@ -0,0 +1,213 @@
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from . import metrics, state, timers
+
+# Cashier assignment. Orders waiting for a cashier sit in one FIFO queue.
+# Whenever an order arrives or a cashier frees up, the queue is walked
+# oldest first and each order goes to an online cashier with room, least
+# loaded first: one that lists the order's lane (lane affinity) if any is
+# free. A free cashier is left to a younger order from their own lane
+# rather than given an older order from another lane, unless that older
+# order has waited AFFINITY_WAIT seconds (aging). No cashier is left idle
+# while orders wait. Assignments are pushed over /ws/cashier. A cashier whose feed drops keeps
+# their orders for OFFLINE_GRACE seconds, so a page reload reshuffles
+# nothing; after that the orders go back to the front of the queue.
+#
+# Queue and desks are per process: with run.py --workers N each worker
+# assigns the orders created on it to the cashiers connected to it. Who holds
+# an order is also recorded in the shared store (Store.claim_order), so a
+# cashier on another worker cannot open an order already handed out, and an
+# order claimed elsewhere leaves this worker's queue instead of going out twice.
+
+CASHIER_CAPACITY = int(os.environ.get("CASHIER_CAPACITY", 2))              # orders a cashier handles at once
+AFFINITY_WAIT = float(os.environ.get("AFFINITY_WAIT_SECONDS", 20))
+OFFLINE_GRACE = float(os.environ.get("CASHIER_OFFLINE_GRACE_SECONDS", 10))
+
+wait_seconds = metrics.Histogram(
+    "drive_thru_cashier_wait_seconds", "Time from order creation to cashier assignment.", (),
+    (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+
+class Desk:
+    __slots__ = ("cashier_id", "lanes", "capacity", "orders", "online", "free_since")
+
+    def __init__(self, cashier_id: str, lanes: frozenset, capacity: int, now: float) -> None:
+        self.cashier_id = cashier_id
+        self.lanes = lanes        # empty: no preference
+        self.capacity = capacity
+        self.orders: Dict[str, str] = {}  # order_id -> lane_id
+        self.online = True
+        self.free_since = now     # ties between equally loaded cashiers go to the longest idle
+
+
+class Waiting:
+    __slots__ = ("order_id", "lane_id", "since")
+
+    def __init__(self, order_id: str, lane_id: str, since: float) -> None:
+        self.order_id = order_id
+        self.lane_id = lane_id
+        self.since = since
+
+
+class CashierScheduler:
+    def __init__(
+        self, send: Callable[[str, dict], None], recheck: Callable[[str, str, float], None],
+        take: Callable[[str, str, bool], bool] = lambda order_id, cashier_id, force: True,
+        drop: Callable[[str], None] = lambda order_id: None, clock: Callable[[], float] = time.time, affinity_wait: float = AFFINITY_WAIT, offline_grace: float = OFFLINE_GRACE,
+    ) -> None:
+        self.send = send          # (cashier_id, frame)
+        self.recheck = recheck    # (timer kind, key, when): call expire_desk() then
+        self.take = take          # (order_id, cashier_id, force): record the holder; False if another has it
+        self.drop = drop          # (order_id): forget the holder
+        self.clock = clock
+        self.affinity_wait = affinity_wait
+        self.offline_grace = offline_grace
+        self.desks: Dict[str, Desk] = {}
+        self.queue: "OrderedDict[str, Waiting]" = OrderedDict()
+        self.assigned: Dict[str, Tuple[str, str]] = {}  # order_id -> (cashier_id, lane_id)
+
+    def sign_in(self, cashier_id: str, lanes: Iterable[str] = (), capacity: int = CASHIER_CAPACITY) -> None:
+        d = self.desks.get(cashier_id)
+        if d is None:
+            d = self.desks[cashier_id] = Desk(cashier_id, frozenset(lanes), max(1, capacity), self.clock())
+        else:
+            d.online, d.lanes, d.capacity = True, frozenset(lanes), max(1, capacity)
+        for order_id, lane_id in d.orders.items():
+            self.send(cashier_id, {"type": "order_assigned", "order_id": order_id, "lane_id": lane_id})
+        self.dispatch()
+
+    def sign_out(self, cashier_id: str) -> None:
+        d = self.desks.get(cashier_id)
+        if d is not None:
+            d.online = False
+            self.recheck("cashier_offline", cashier_id, self.clock() + self.offline_grace)
+
+    def expire_desk(self, cashier_id: str) -> None:
+        d = self.desks.get(cashier_id)
+        if d is None or d.online:
+            return
+        del self.desks[cashier_id]
+        aged = self.clock() - self.affinity_wait
+        for order_id, lane_id in reversed(list(d.orders.items())):
+            del self.assigned[order_id]
+            self.drop(order_id)
+            self.queue[order_id] = Waiting(order_id, lane_id, aged)
+            self.queue.move_to_end(order_id, last=False)
+        self.dispatch()
+
+    def enqueue(self, order_id: str, lane_id: str) -> None:
+        if order_id in self.queue or order_id in self.assigned:
+            return
+        self.queue[order_id] = Waiting(order_id, lane_id, self.clock())
+        self.dispatch()
+
+    def claim(self, order_id: str, cashier_id: str) -> bool:
+        # A cashier opening an order by hand: refused while another online
+        # cashier holds it, otherwise the order becomes theirs. Cashiers
+        # without a feed socket can claim but never hold an order against others.
+        if order_id in self.assigned:
+            holder, lane_id = self.assigned[order_id]
+            if holder == cashier_id:
+                return True
+            d = self.desks.get(holder)
+            if d is not None:
+                if d.online:
+                    return False
+                del d.orders[order_id]
+            self.take(order_id, cashier_id, True)
+        elif order_id in self.queue:
+            if not self.take(order_id, cashier_id, False):
+                del self.queue[order_id]  # claimed through another worker
+                return False
+            w = self.queue.pop(order_id)
+            lane_id = w.lane_id
+            wait_seconds.observe(self.clock() - w.since)
+        else:
+            # Not queued here: served already, or scheduled by another worker.
+            return self.take(order_id, cashier_id, False)
+        self.assigned[order_id] = (cashier_id, lane_id)
+        mine = self.desks.get(cashier_id)
+        if mine is not None:
+            mine.orders[order_id] = lane_id
+        return True
+
+    def release(self, order_id: str) -> None:
+        self.drop(order_id)
+        self.queue.pop(order_id, None)
+        cashier_id, _ = self.assigned.pop(order_id, (None, None))
+        d = self.desks.get(cashier_id)
+        if d is not None and d.orders.pop(order_id, None) is not None:
+            d.free_since = self.clock()
+            self.dispatch()
+
+    def dispatch(self) -> List[str]:
+        free = [d for d in self.desks.values() if d.online and len(d.orders) < d.capacity]
+        if not free or not self.queue:
+            return []
+        now = self.clock()
+        behind = Counter(w.lane_id for w in self.queue.values())  # lanes of the orders not yet looked at
+        done: List[str] = []
+        skipped = []
+        for w in list(self.queue.values()):
+            behind[w.lane_id] -= 1
+            pool = [d for d in free if w.lane_id in d.lanes]
+            if not pool:
+                pool = free
+                if now - w.since < self.affinity_wait:
+                    pool = [d for d in free if not any(behind[lane] for lane in d.lanes)]
+            if not pool:
+                skipped.append(w)
+                continue
+            self._assign(w, pool, free, now, done)
+            if not free:
+                return done
+        for w in skipped:  # cashiers still free after their own lanes were served
+            self._assign(w, free, free, now, done)
+            if not free:
+                break
+        return done
+
+    def _assign(self, w: Waiting, pool: List[Desk], free: List[Desk], now: float, done: List[str]) -> None:
+        d = min(pool, key=lambda d: (len(d.orders) / d.capacity, d.free_since))
+        del self.queue[w.order_id]
+        if not self.take(w.order_id, d.cashier_id, False):
+            return  # claimed through another worker meanwhile
+        self.assigned[w.order_id] = (d.cashier_id, w.lane_id)
+        d.orders[w.order_id] = w.lane_id
+        wait_seconds.observe(now - w.since)
+        self.send(d.cashier_id, {"type": "order_assigned", "order_id": w.order_id, "lane_id": w.lane_id, "waited_ms": int((now - w.since) * 1000)})
+        done.append(w.order_id)
+        if len(d.orders) >= d.capacity:
+            free.remove(d)
+
+def drop_feed(cashier_id: str, conn) -> None:
+    # Every way a feed leaves state.cashier_feed_ws (disconnect, overflow,
+    # failed send) signs the cashier out, so the offline grace timer runs.
+    if state.cashier_feed_ws.get(cashier_id) is conn:
+        del state.cashier_feed_ws[cashier_id]
+        scheduler.sign_out(cashier_id)
+
+
+def _send(cashier_id: str, msg: dict) -> None:
+    conn = state.cashier_feed_ws.get(cashier_id)
+    if conn is not None and not conn.send(msg):
+        drop_feed(cashier_id, conn)
+
+
+def _recheck(kind: str, key: str, when: float) -> None:
+    timers.wheel.schedule(kind, key, when)
+
+
+def _take(order_id: str, cashier_id: str, force: bool) -> bool:
+    return state.store.claim_order(order_id, cashier_id, force)
+
+
+def _drop(order_id: str) -> None:
+    state.store.unclaim_order(order_id)
+
+
+scheduler = CashierScheduler(_send, _recheck, _take, _drop)
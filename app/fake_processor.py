@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import random
+from typing import Dict
+from uuid import uuid4
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+# Stand-in card processor for PAYMENT_GATEWAY_URL=http://... (see gateway.py).
+# POST /authorize waits latency_ms (+ up to jitter_ms), then answers 503 with
+# probability fail_rate, DECLINED with probability decline_rate, else
+# APPROVED. Answers are remembered per reference, so a retried authorization
+# gets the same result. POST /void marks an approval VOIDED.
+#
+#   python -m app.fake_processor --port 9100 --latency-ms 200 --fail-rate 0.01
+
+
+def create_app(latency_ms: float = 200, jitter_ms: float = 0, fail_rate: float = 0.0, decline_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake card processor")
+    results: Dict[str, dict] = {}
+
+    @app.post("/authorize")
+    async def authorize(payload: dict):
+        await asyncio.sleep((latency_ms + random.uniform(0, jitter_ms)) / 1000)
+        reference = str(payload.get("reference", ""))
+        if reference in results:
+            return results[reference]
+        if random.random() < fail_rate:
+            return JSONResponse({"error": "processor unavailable"}, status_code=503)
+        if random.random() < decline_rate:
+            result = {"status": "DECLINED", "reason": "do_not_honor"}
+        else:
+            result = {"status": "APPROVED", "authorization_id": f"auth_{uuid4().hex[:12]}"}
+        results[reference] = result
+        return result
+
+    @app.post("/void")
+    async def void(payload: dict):
+        result = results.get(str(payload.get("reference", "")))
+        if not result or result.get("authorization_id") != payload.get("authorization_id"):
+            return JSONResponse({"error": "unknown authorization"}, status_code=404)
+        result["status"] = "VOIDED"
+        return result
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency-ms", type=float, default=200)
+    ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--decline-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.fail_rate, args.decline_rate),
+        host=args.host, port=args.port, log_level="warning",
+    )
@@ -0,0 +1,85 @@
+import json
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json without it
+    orjson = None
+
+# Outgoing WebSocket messages. A Frame is encoded the first time a writer
+# needs it and the same text goes to every connection it was queued on.
+# Several events sent together become one {"type": "batch", "events": [...]}
+# frame; the page scripts unpack it (see messages() in the templates).
+# On a multiplexed socket (/ws/mux) frames also carry their channel.
+
+
+def dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+class Frame:
+    __slots__ = ("payload", "_text")
+    label: Optional[str] = None  # metrics channel, when not the connection's own
+
+    def __init__(self, payload: dict) -> None:
+        self.payload = payload
+        self._text: Optional[str] = None
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.payload.get("type")
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self.payload)
+        return self._text
+
+    @property
+    def stream(self) -> tuple:
+        return ()
+
+    def merge(self, newer: "Frame") -> "Frame":
+        return Frame({**self.payload, **newer.payload})
+
+
+class TaggedFrame(Frame):
+    # A frame on one channel of a multiplexed socket: {"channel": ..., ...}.
+    # The tag is spliced in front of the inner frame's text, so a frame
+    # fanned out to plain and multiplexed sockets is still encoded once.
+    __slots__ = ("inner", "tag", "label")
+
+    def __init__(self, inner: Frame, tag: dict, label: Optional[str] = None) -> None:
+        self.inner = inner
+        self.tag = tag
+        self.label = label
+        self._text = None
+
+    @property
+    def payload(self) -> dict:
+        return {**self.tag, **self.inner.payload}
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.inner.type
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self.tag)[:-1] + "," + self.inner.text[1:]
+        return self._text
+
+    @property
+    def stream(self) -> tuple:
+        return tuple(self.tag.values())
+
+    def merge(self, newer: Frame) -> Frame:
+        return TaggedFrame(self.inner.merge(newer.inner), self.tag, self.label)
+
+
+def frame(*payloads: dict) -> Frame:
+    if len(payloads) == 1:
+        return Frame(payloads[0])
+    return Frame({"type": "batch", "events": list(payloads)})
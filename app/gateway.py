@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import time
+from typing import Optional
+from urllib.parse import parse_qsl
+from uuid import uuid4
+
+try:
+    import httpx
+except ImportError:  # optional: only the http:// gateway needs it
+    httpx = None
+
+from . import metrics
+
+# Card authorization. payment_api asks state.gateway to authorize a payment
+# session before approving it:
+#   PAYMENT_GATEWAY_URL=local (default)   approve inline, as the demo always has
+#   PAYMENT_GATEWAY_URL=http://host:port[?timeout=5&max_connections=100&max_concurrency=100]
+#                                         POST {url}/authorize (see fake_processor.py)
+# A processor that cannot be reached, times out or answers 5xx raises
+# GatewayError; the session stays PENDING so the customer can try again.
+# void() releases an approval the app could not record (payment_api._pay).
+
+gateway_seconds = metrics.Histogram(
+    "drive_thru_gateway_seconds", "Payment authorization time by outcome.", ("outcome",),
+)
+
+
+class GatewayError(Exception):
+    pass
+
+
+class Authorization:
+    __slots__ = ("approved", "authorization_id", "reason")
+
+    def __init__(self, approved: bool, authorization_id: Optional[str] = None, reason: Optional[str] = None) -> None:
+        self.approved = approved
+        self.authorization_id = authorization_id
+        self.reason = reason
+
+
+class PaymentGateway:
+    async def authorize(self, pay_session_id: str, amount_cents: int, currency: str, method: str) -> Authorization:
+        # pay_session_id doubles as the processor's idempotency key.
+        raise NotImplementedError
+
+    async def void(self, pay_session_id: str, authorization_id: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalGateway(PaymentGateway):
+    async def authorize(self, pay_session_id: str, amount_cents: int, currency: str, method: str) -> Authorization:
+        return Authorization(True, f"auth_local_{uuid4().hex[:12]}")
+
+    async def void(self, pay_session_id: str, authorization_id: str) -> None:
+        pass  # nothing was held
+
+
+class HttpGateway(PaymentGateway):
+    # Keep-alive connections shared by every request in the process.
+    # max_concurrency bounds in-flight authorizations; callers past it queue
+    # here rather than in the pool, so the timeout only counts the processor.
+    # httpx's pool rescans all of its connections on every request, which
+    # gets quadratic past a few dozen, so the connections are split over
+    # several small clients used in turn (benchmarks/gateway_latency.py).
+    def __init__(
+        self, base_url: str, timeout: float = 5.0, max_connections: int = 100, max_concurrency: int = 100,
+        shard_size: int = 8,
+    ) -> None:
+        if httpx is None:
+            raise RuntimeError("PAYMENT_GATEWAY_URL=http://... needs httpx (pip install httpx)")
+        shards = -(-max_connections // shard_size)
+        per_shard = -(-max_connections // shards)
+        self.clients = [
+            httpx.AsyncClient(
+                base_url=base_url,
+                timeout=httpx.Timeout(timeout, connect=min(timeout, 2.0)),
+                limits=httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard),
+            )
+            for _ in range(shards)
+        ]
+        self.next_client = itertools.cycle(self.clients)
+        self.slots = asyncio.Semaphore(max_concurrency)
+
+    async def authorize(self, pay_session_id: str, amount_cents: int, currency: str, method: str) -> Authorization:
+        body = {"reference": pay_session_id, "amount_cents": amount_cents, "currency": currency, "method": method}
+        async with self.slots:
+            started = time.perf_counter()
+            try:
+                r = await next(self.next_client).post("/authorize", json=body, headers={"Idempotency-Key": pay_session_id})
+            except httpx.HTTPError as e:
+                gateway_seconds.observe(time.perf_counter() - started, "error")
+                raise GatewayError(f"processor unreachable: {type(e).__name__}") from e
+        if r.status_code >= 500:
+            gateway_seconds.observe(time.perf_counter() - started, "error")
+            raise GatewayError(f"processor error {r.status_code}")
+        result = r.json()
+        approved = result.get("status") == "APPROVED"
+        gateway_seconds.observe(time.perf_counter() - started, "approved" if approved else "declined")
+        return Authorization(approved, result.get("authorization_id"), result.get("reason"))
+
+    async def void(self, pay_session_id: str, authorization_id: str) -> None:
+        body = {"reference": pay_session_id, "authorization_id": authorization_id}
+        async with self.slots:
+            try:
+                r = await next(self.next_client).post("/void", json=body, headers={"Idempotency-Key": f"void:{pay_session_id}"})
+            except httpx.HTTPError as e:
+                raise GatewayError(f"processor unreachable: {type(e).__name__}") from e
+        if r.status_code >= 400:
+            raise GatewayError(f"void refused: {r.status_code}")
+
+    async def close(self) -> None:
+        for client in self.clients:
+            await client.aclose()
+
+
+def create_gateway(url: str) -> PaymentGateway:
+    url = (url or "local").strip()
+    if url == "local":
+        return LocalGateway()
+    if url.startswith(("http://", "https://")):
+        base, _, query = url.partition("?")
+        params = dict(parse_qsl(query))
+        return HttpGateway(
+            base,
+            timeout=float(params.get("timeout", 5.0)),
+            max_connections=int(params.get("max_connections", 100)),
+            max_concurrency=int(params.get("max_concurrency", 100)),
+        )
+    raise ValueError(f"unsupported PAYMENT_GATEWAY_URL: {url}")
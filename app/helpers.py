@@ -1,6 +1,25 @@
-from datetime import datetime, timedelta
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
 from uuid import uuid4
-from . import state
+from . import cards, dispatch, state, timers, relay
+from .connections import Connection
+from .frames import Frame, frame
+from .records import LaneCode, Order, OrderStatus, PaymentSession, PaymentStatus, epoch
+
+# Orders still in the lane (not yet paid)
+ACTIVE_STATUSES = (
+    OrderStatus.CONNECTED_WAITING_CASHIER, OrderStatus.CASHIER_CONNECTED,
+    OrderStatus.TOTAL_CONFIRMED_WAITING_PAYMENT, OrderStatus.PAYMENT_DECLINED,
+)
+COMPLETED_STATUSES = (OrderStatus.PAID_READY_FOR_PICKUP,)
+# Orders that no longer hold a cashier slot (dispatch.py): paid, or declined
+# and sent to pay at the window
+RELEASED_STATUSES = (OrderStatus.PAID_READY_FOR_PICKUP, OrderStatus.PAYMENT_DECLINED)
+LANE_CODE_TTL = 10 * 60
+
+CHAT_RING = int(os.environ.get("CHAT_RING", 25))  # chat messages kept on the order itself
 
 def utcnow() -> datetime:
     return datetime.utcnow()
@@ -8,44 +27,181 @@ def utcnow() -> datetime:
 def money(cents: int) -> str:
     return f"{cents/100:.2f}"
 
-def ensure_demo_cards(customer_id: str) -> None:
-    if customer_id in state.customer_cards:
-        return
-    state.customer_cards[customer_id] = [
-        {"card_id": "card_demo_1", "brand": "VISA", "last4": "4242", "exp": "12/29"},
-        {"card_id": "card_demo_2", "brand": "MASTERCARD", "last4": "4444", "exp": "08/28"},
-    ]
-
-def rotate_lane_code(lane_id: str) -> dict:
-    code = f"{uuid4().int % 10000:04d}"
-    rec = {"lane_id": lane_id, "code": code, "expires_at": utcnow() + timedelta(minutes=10)}
-    state.lane_codes[lane_id] = rec
+# ULID-style ids: 48-bit millisecond timestamp + 80 random bits, Crockford
+# base32, so ids sort by creation time. Within one millisecond the random
+# part is incremented to keep ids from this process strictly increasing.
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_last_ms = 0
+_last_rand = 0
+
+def new_id(prefix: str) -> str:
+    global _last_ms, _last_rand
+    ms = int(time.time() * 1000)
+    if ms <= _last_ms:
+        ms, rand = _last_ms, _last_rand + 1
+    else:
+        rand = int.from_bytes(os.urandom(10), "big")
+    _last_ms, _last_rand = ms, rand
+    value = (ms << 80) | (rand & ((1 << 80) - 1))
+    chars = []
+    for _ in range(26):
+        chars.append(_CROCKFORD[value & 31])
+        value >>= 5
+    return f"{prefix}_{''.join(reversed(chars))}"
+
+def rotate_lane_code(lane_id: str) -> LaneCode:
+    rec = LaneCode(lane_id, f"{uuid4().int % 10000:04d}", epoch() + LANE_CODE_TTL)
+    state.store.save_lane_code(rec)
+    timers.wheel.schedule("lane", lane_id, rec.expires_at)
+    publish_lane_code(rec)
     return rec
 
-def current_lane_code(lane_id: str) -> dict:
-    rec = state.lane_codes.get(lane_id)
-    if rec and utcnow() < rec["expires_at"]:
+def lane_code_message(rec: LaneCode) -> dict:
+    return {"type": "lane_code", "lane_id": rec.lane_id, "code": rec.code, "expires_at": rec.expires_iso()}
+
+def publish_lane_code(rec: LaneCode) -> None:
+    msg = lane_code_message(rec)
+    _send_lane(rec.lane_id, msg)
+    relay.link.publish(f"lane:{rec.lane_id}", [msg])
+
+def _send_lane(lane_id: str, msg: dict) -> None:
+    screens = state.lane_ws.get(lane_id)
+    if not screens:
+        return
+    msg = Frame(msg)
+    for conn in list(screens):
+        if not conn.send(msg):
+            screens.discard(conn)
+
+def current_lane_code(lane_id: str) -> LaneCode:
+    rec = state.store.get_lane_code(lane_id)
+    if rec and time.time() < rec.expires_at:
         return rec
     return rotate_lane_code(lane_id)
 
-async def push_customer(customer_id: str, payload: dict) -> bool:
-    ws = state.customer_home_ws.get(customer_id)
-    if not ws:
+def fan_out(peers: Dict[str, Connection], *payloads: dict) -> List[str]:
+    # Queues the payloads as one frame (a batch if there are several) on each
+    # peer's connection; it is encoded once, and no socket write happens
+    # here. Returns the keys of peers that are closed or overflowed and got
+    # disconnected.
+    msg = frame(*payloads)
+    failed = []
+    for key, conn in peers.items():
+        if conn is None:
+            continue
+        if not conn.send(msg):
+            failed.append(key)
+    return failed
+
+def _drop(registry: Dict[str, Connection], key: str, conn: Connection) -> None:
+    if registry.get(key) is conn:
+        del registry[key]
+
+def _send_local(registry: Dict[str, Connection], key: str, payloads) -> Optional[bool]:
+    # None if this worker does not hold the socket, else whether it took the payloads.
+    conn = registry.get(key)
+    if not conn:
+        return None
+    if fan_out({key: conn}, *payloads):
+        _drop(registry, key, conn)
         return False
-    await ws.send_json(payload)
     return True
 
-async def relay_order(order_id: str, payload: dict) -> None:
-    cws = state.order_customer_ws.get(order_id)
-    pws = state.order_cashier_ws.get(order_id)
-    if cws:
-        await cws.send_json(payload)
-    if pws:
-        await pws.send_json(payload)
+def _route(registry: Dict[str, Connection], key: str, topic: str, payloads) -> bool:
+    # Local socket if this worker holds it, otherwise via the relay hub.
+    sent = _send_local(registry, key, payloads)
+    if sent is None:
+        return relay.link.publish(topic, payloads)
+    return sent
+
+async def push_customer(customer_id: str, payload: dict) -> bool:
+    return _route(state.customer_home_ws, customer_id, f"customer:{customer_id}", (payload,))
+
+async def relay_order(order_id: str, *payloads: dict) -> None:
+    # Order events carry a per-order seq and stay in the store's ring buffer,
+    # so a reconnecting socket can ask for ?since=<seq> (see order_ws.py).
+    payloads = state.store.append_order_events(order_id, payloads)
+    _route(state.order_customer_ws, order_id, f"order:{order_id}:customer", payloads)
+    _route(state.order_cashier_ws, order_id, f"order:{order_id}:cashier", payloads)
 
 async def relay_call(order_id: str, sender_role: str, payload: dict) -> None:
-    peers = state.call_ws.get(order_id) or {}
     target_role = "cashier" if sender_role == "customer" else "customer"
-    target_ws = peers.get(target_role)
-    if target_ws:
-        await target_ws.send_json(payload)
+    _route(state.call_ws.get(order_id) or {}, target_role, f"call:{order_id}:{target_role}", (payload,))
+
+def deliver(topic: str, payloads: List[dict]) -> None:
+    # Frames relayed from another worker; delivered locally, never re-published.
+    kind, _, key = topic.partition(":")
+    if kind == "customer":
+        _send_local(state.customer_home_ws, key, payloads)
+    elif kind == "order":
+        order_id, _, role = key.rpartition(":")
+        _send_local(state.order_customer_ws if role == "customer" else state.order_cashier_ws, order_id, payloads)
+    elif kind == "call":
+        order_id, _, role = key.rpartition(":")
+        _send_local(state.call_ws.get(order_id) or {}, role, payloads)
+    elif kind == "lane":
+        for msg in payloads:
+            _send_lane(key, msg)
+    elif kind == "cards":
+        cards.vault.forget(key)
+    elif kind == "feed":
+        for delta in payloads:
+            # The publishing worker holds the fresh eviction timer for this order;
+            # the worker that created it may hold its cashier assignment.
+            order = delta["order"]
+            timers.wheel.cancel("order", order["order_id"])
+            _send_feed(delta)
+            if delta["op"] == "remove" or order.get("status") in RELEASED_STATUSES:
+                dispatch.scheduler.release(order["order_id"])
+
+def retire_payment(pay_session_id: str) -> None:
+    # Settled sessions no longer need the expiry timer, only eviction.
+    timers.wheel.cancel("payment", pay_session_id)
+    timers.wheel.schedule("payment_evict", pay_session_id, timers.after(timers.ORDER_RETENTION))
+
+async def expire_payment(s: PaymentSession) -> None:
+    # From the sweeper, or a pay call that finds the session past its expiry.
+    s.status = PaymentStatus.EXPIRED
+    state.store.save_payment(s)
+    retire_payment(s.pay_session_id)
+    await relay_order(s.order_id, {"type": "payment_status", "status": s.status, "payment_method": None})
+
+def record_chat(o: Order, sender: str, text: str) -> dict:
+    # Numbers the message, keeps the last CHAT_RING on the order and archives
+    # it; the full transcript is paged from the archive (cashier_api.py).
+    o.chat_count += 1
+    msg = {"n": o.chat_count, "from": sender, "text": text, "ts": utcnow().isoformat()}
+    o.messages = [*o.messages, msg][-CHAT_RING:]
+    state.chat_archive.append(o.order_id, msg)
+    return msg
+
+def order_summary(o: Order) -> dict:
+    return {
+        "order_id": o.order_id,
+        "lane_id": o.lane_id,
+        "status": o.status,
+        "total_cents": o.total_cents or 0,
+    }
+
+async def publish_order(o: Order, op: str = "update") -> None:
+    # Runs after every order transition. Cashier console feed: one delta per
+    # add/update/remove, independent of how many orders exist. Also re-arms
+    # the order's eviction timer (see sweeper.py) and queues new orders for,
+    # or frees them from, a cashier (dispatch.py).
+    if op == "remove":
+        timers.wheel.cancel("order", o.order_id)
+        delta = {"type": "order_delta", "op": op, "order": {"order_id": o.order_id}}
+    else:
+        retention = timers.ORDER_RETENTION if o.status in COMPLETED_STATUSES else timers.STALE_ORDER_RETENTION
+        timers.wheel.schedule("order", o.order_id, timers.after(retention))
+        delta = {"type": "order_delta", "op": op, "order": order_summary(o)}
+    _send_feed(delta)
+    relay.link.publish("feed", [delta])
+    if op == "add" and o.status == OrderStatus.CONNECTED_WAITING_CASHIER:
+        dispatch.scheduler.enqueue(o.order_id, o.lane_id)
+    elif op == "remove" or o.status in RELEASED_STATUSES:
+        dispatch.scheduler.release(o.order_id)
+
+def _send_feed(delta: dict) -> None:
+    for cashier_id in fan_out(state.cashier_feed_ws, delta):
+        dispatch.drop_feed(cashier_id, state.cashier_feed_ws[cashier_id])
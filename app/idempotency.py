@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, Optional, Tuple
+
+# Retried payment calls (double taps, client retries after a timeout). A
+# request carrying an Idempotency-Key gets the response of the first request
+# with that key, for IDEMPOTENCY_TTL_SECONDS, from a bounded in-process LRU.
+# Calls for the same pay session also run one at a time (SessionLocks), so a
+# retry waits for the first attempt instead of racing it.
+
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10_000))
+
+
+class CachedResponse:
+    __slots__ = ("fingerprint", "status_code", "body", "expires")
+
+    def __init__(self, fingerprint: str, status_code: int, body: dict, expires: float) -> None:
+        self.fingerprint = fingerprint  # digest of the request it answered; a reused key with another body is refused
+        self.status_code = status_code
+        self.body = body
+        self.expires = expires
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = IDEMPOTENCY_MAX_ENTRIES, ttl: float = IDEMPOTENCY_TTL) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, fingerprint: str, status_code: int, body: dict) -> None:
+        self.entries[key] = CachedResponse(fingerprint, status_code, body, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+class SessionLocks:
+    # One asyncio.Lock per key, dropped once nobody holds or waits on it.
+    def __init__(self) -> None:
+        self.locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.locks)
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        lock, users = self.locks.get(key) or (asyncio.Lock(), 0)
+        self.locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self.locks[key]
+            if users == 1:
+                del self.locks[key]
+            else:
+                self.locks[key] = (lock, users - 1)
+
+
+responses = ResponseCache()
+sessions = SessionLocks()
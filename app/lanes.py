@@ -0,0 +1,99 @@
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+from .frames import dumps
+
+# Stores and their drive-thru lanes, loaded once from LANES_FILE (JSON):
+#
+#   {"default_store": "MAIN",
+#    "stores": [{"store_id": "MAIN", "name": "Main St", "lanes": ["L1", "L2"]},
+#               {"store_id": "AIRPORT", "lanes": 40}]}
+#
+# "lanes" is a list of lane ids or a count (L1..Ln). A lane's key is what
+# orders, lane codes, sockets and /lane/{key} use: the bare lane id in the
+# default store (so "L1" keeps working) and "STORE/LANE" elsewhere. Lookups
+# are one dict probe; ids are upper-cased like the request models do.
+# Without LANES_FILE there is one store with lanes L1 and L2.
+
+DEFAULT_CONFIG = {"default_store": "MAIN", "stores": [{"store_id": "MAIN", "lanes": ["L1", "L2"]}]}
+
+_ID = re.compile(r"[A-Z0-9_-]{1,32}")
+
+
+class Lane:
+    __slots__ = ("key", "store_id", "lane_id")
+
+    def __init__(self, key: str, store_id: str, lane_id: str) -> None:
+        self.key = key
+        self.store_id = store_id
+        self.lane_id = lane_id
+
+
+class StoreLanes:
+    __slots__ = ("store_id", "name", "lanes")
+
+    def __init__(self, store_id: str, name: str, lanes: Tuple[Lane, ...]) -> None:
+        self.store_id = store_id
+        self.name = name
+        self.lanes = lanes
+
+
+class LaneRegistry:
+    def __init__(self, config: dict) -> None:
+        self.default_store = _check_id(config.get("default_store") or config["stores"][0]["store_id"], "store_id")
+        self.stores: Dict[str, StoreLanes] = {}
+        self.lanes: Dict[str, Lane] = {}  # every accepted spelling -> lane
+        for entry in config["stores"]:
+            store_id = _check_id(entry["store_id"], "store_id")
+            if store_id in self.stores:
+                raise ValueError(f"duplicate store_id {store_id}")
+            lane_ids = entry.get("lanes", ())
+            if isinstance(lane_ids, int):
+                lane_ids = [f"L{i}" for i in range(1, lane_ids + 1)]
+            lanes = []
+            for lane_id in lane_ids:
+                lane_id = _check_id(lane_id, "lane_id")
+                qualified = f"{store_id}/{lane_id}"
+                if qualified in self.lanes:
+                    raise ValueError(f"duplicate lane {qualified}")
+                lane = Lane(lane_id if store_id == self.default_store else qualified, store_id, lane_id)
+                self.lanes[qualified] = self.lanes[lane.key] = lane
+                lanes.append(lane)
+            self.stores[store_id] = StoreLanes(store_id, entry.get("name") or store_id, tuple(lanes))
+        if self.default_store not in self.stores:
+            raise ValueError(f"default_store {self.default_store} is not listed")
+        self._listing = dumps({
+            "default_store": self.default_store,
+            "stores": [self._store_json(s) for s in self.stores.values()],
+        }).encode()
+        self._store_listings = {s.store_id: dumps(self._store_json(s)).encode() for s in self.stores.values()}
+
+    def get(self, name: str) -> Optional[Lane]:
+        return self.lanes.get(name.strip().upper())
+
+    def listing(self, store_id: Optional[str] = None) -> Optional[bytes]:
+        # Pre-encoded GET /lanes bodies; the registry never changes at runtime.
+        return self._listing if store_id is None else self._store_listings.get(store_id.upper())
+
+    @staticmethod
+    def _store_json(s: StoreLanes) -> dict:
+        return {"store_id": s.store_id, "name": s.name, "lanes": [lane.key for lane in s.lanes]}
+
+
+def _check_id(value, field: str) -> str:
+    value = str(value).strip().upper()
+    if not _ID.fullmatch(value):
+        raise ValueError(f"bad {field} {value!r}: use letters, digits, _ or -")
+    return value
+
+
+def load_registry(path: Optional[str]) -> LaneRegistry:
+    if not path:
+        return LaneRegistry(DEFAULT_CONFIG)
+    with open(path) as f:
+        return LaneRegistry(json.load(f))
+
+
+registry = load_registry(os.environ.get("LANES_FILE"))
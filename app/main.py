@@ -1,33 +1,121 @@
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 
+from . import dispatch, state, metrics, models, relay
+from .assets import AssetStaticFiles
+from .helpers import deliver
+from .sweeper import rearm_timers, run_sweeper
 from .routes.pages import router as pages_router
 from .routes.customer_api import router as customer_router
 from .routes.cashier_api import router as cashier_router
 from .routes.payment_api import router as payment_router
+from .routes.lanes_api import router as lanes_router
 
 from .websockets.customer_ws import router as customer_ws_router
 from .websockets.order_ws import router as order_ws_router
 from .websockets.call_ws import router as call_ws_router
+from .websockets.cashier_ws import router as cashier_ws_router
+from .websockets.lane_ws import router as lane_ws_router
+from .websockets.mux_ws import router as mux_ws_router
+
+STORE_FLUSH_INTERVAL = 0.02  # seconds between group commits of the state store
+
+async def _flush_store_forever() -> None:
+    while True:
+        await asyncio.sleep(STORE_FLUSH_INTERVAL)
+        state.store.flush()
+        state.chat_archive.flush()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if relay.lead():  # with several workers, re-arming once is enough
+        rearm_timers()
+    tasks = [asyncio.create_task(_flush_store_forever()), asyncio.create_task(run_sweeper())]
+    if relay.RELAY_SOCKET:  # one of several workers (run.py --workers N)
+        tasks.append(asyncio.create_task(relay.link.run(relay.RELAY_SOCKET, deliver)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        state.store.flush()
+        state.chat_archive.flush()
+        await state.gateway.close()
 
 app = FastAPI(
-    title="Smart Drive-Thru Ordering Platform (Real-Time Voice Ordering, Secure Lane Connection & Mobile Payment)"
+    title="Smart Drive-Thru Ordering Platform (Real-Time Voice Ordering, Secure Lane Connection & Mobile Payment)",
+    lifespan=lifespan,
+)
+
+# Metrics: scrape-time gauges over the socket registries and the store
+def _open_sockets() -> dict:
+    return {
+        ("customer",): len(state.customer_home_ws),
+        ("order_customer",): len(state.order_customer_ws),
+        ("order_cashier",): len(state.order_cashier_ws),
+        ("call",): sum(len(peers) for peers in state.call_ws.values()),
+        ("cashier",): len(state.cashier_feed_ws),
+        ("lane",): sum(len(screens) for screens in state.lane_ws.values()),
+        ("mux",): len(state.mux_ws),
+    }
+
+metrics.Gauge(
+    "drive_thru_open_sockets", "Open WebSocket connections by registry (mux channels count in theirs).", ("registry",), _open_sockets,
+)
+metrics.Gauge(
+    "drive_thru_orders", "Orders currently held, by status.", ("status",),
+    lambda: {(status,): n for status, n in state.store.count_orders_by_status().items()},
 )
+metrics.Gauge(
+    "drive_thru_cashier_queue", "Orders waiting for a cashier to be assigned.", (),
+    lambda: {(): len(dispatch.scheduler.queue)},
+)
+metrics.Gauge(
+    "drive_thru_pending_payments", "Payment sessions waiting for the customer.", (),
+    lambda: {(): state.store.count_payments_by_status().get("PENDING", 0)},
+)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Malformed bodies get the same {"error": ...} 400 as the handlers' own checks
+@app.exception_handler(RequestValidationError)
+async def _invalid_request(request: Request, exc: RequestValidationError) -> JSONResponse:
+    err = exc.errors()[0]
+    field = ".".join(str(part) for part in err["loc"] if part not in ("body", "query", "path"))
+    return JSONResponse({"error": f"{field}: {err['msg']}" if field else err["msg"]}, status_code=400)
+
+# OpenAPI: the HTTP models come from the routes; add the socket messages
+_route_openapi = app.openapi
+
+def _openapi() -> dict:
+    if app.openapi_schema is None:
+        schema = _route_openapi()
+        schema.setdefault("components", {}).setdefault("schemas", {}).update(models.socket_schemas())
+    return app.openapi_schema
+
+app.openapi = _openapi
 
 # Static
 BASE_DIR = Path(__file__).resolve().parent.parent
 STATIC_DIR = BASE_DIR / "static"
 STATIC_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+app.mount("/static", AssetStaticFiles(directory=str(STATIC_DIR)), name="static")
 
 # Routers
 app.include_router(pages_router)
 app.include_router(customer_router)
 app.include_router(cashier_router)
 app.include_router(payment_router)
+app.include_router(lanes_router)
+app.include_router(metrics.router)
 
 # WebSocket routers
 app.include_router(customer_ws_router)
 app.include_router(order_ws_router)
 app.include_router(call_ws_router)
+app.include_router(cashier_ws_router)
+app.include_router(lane_ws_router)
+app.include_router(mux_ws_router)
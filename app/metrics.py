@@ -0,0 +1,144 @@
+import bisect
+import time
+from typing import Callable, Dict, List, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+# Minimal Prometheus text-format metrics. Observations are a dict lookup and
+# a bisect, so they stay on in production; gauges are computed at scrape time.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[str, ...]
+
+_registry: List["_Metric"] = []
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in self.values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], collect: Callable[[], Dict[Labels, float]]) -> None:
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in self.collect().items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self.series: Dict[Labels, List[float]] = {}  # per-bucket counts (+Inf last), then sum, count
+
+    def observe(self, value: float, *labels: str) -> None:
+        s = self.series.get(labels)
+        if s is None:
+            s = self.series[labels] = [0] * (len(self.buckets) + 3)
+        s[bisect.bisect_left(self.buckets, value)] += 1
+        s[-2] += value
+        s[-1] += 1
+
+    def _samples(self) -> List[str]:
+        out = []
+        for k, s in self.series.items():
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), s):
+                running += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, k, le)} {running}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, k)} {s[-2]}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, k)} {s[-1]}")
+        return out
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_request_seconds = Histogram(
+    "drive_thru_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+)
+ws_messages = Counter("drive_thru_ws_messages_total", "WebSocket messages by channel and direction.", ("channel", "direction"))
+ws_send_seconds = Histogram("drive_thru_ws_send_duration_seconds", "Time to write one WebSocket frame, by channel.", ("channel",))
+lane_orders = Counter("drive_thru_lane_orders_total", "Orders created per lane; use rate()[1m] for orders per minute.", ("lane",))
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware (no BaseHTTPMiddleware overhead). The route
+    # template is read from the scope after routing, so /payment/{id}/pay is
+    # one series no matter how many sessions exist.
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_seconds.observe(time.perf_counter() - started, scope["method"], route, str(status[0]))
+
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics_endpoint() -> Response:
+    return Response(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
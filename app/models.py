@@ -0,0 +1,133 @@
+from typing import Annotated, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, TypeAdapter
+
+# Request bodies and inbound WebSocket messages. Routes take these as body
+# parameters, so they are validated by FastAPI and published in the OpenAPI
+# schema; sockets decode frames straight from the raw text with the
+# *_MESSAGE adapters. Strings are stripped and numbers accepted where the
+# old handlers did str(payload.get(...)).strip().
+
+
+class Inbound(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, coerce_numbers_to_str=True)
+
+
+LaneId = Annotated[str, StringConstraints(to_upper=True), Field(description="Lane key from GET /lanes: L1 in the default store, STORE/L1 elsewhere")]
+
+
+class CheckinRequest(Inbound):
+    customer_id: str = ""
+    lane_id: LaneId = ""
+
+
+class ConnectRequest(Inbound):
+    customer_id: str = ""
+    lane_id: LaneId = ""
+    code: str = Field("", description="Code shown on the lane display")
+
+
+class ConfirmTotalRequest(Inbound):
+    items_text: str = ""
+    total_cents: int = 0
+
+
+class NewCard(Inbound):
+    number: str = ""
+    exp: str = ""
+    cvv: str = ""
+    name: str = ""
+
+
+class PayRequest(Inbound):
+    customer_id: str = ""
+    mode: Literal["saved_card", "new_card", "google_pay", "paypal", "other_wallet"]
+    card_id: str = Field("", description="mode=saved_card")
+    new_card: Optional[NewCard] = Field(None, description="mode=new_card")
+
+
+# Order sockets (/ws/order/{order_id}/customer|cashier)
+class ChatMessage(Inbound):
+    type: Literal["chat"]
+    text: str = ""
+
+
+ORDER_MESSAGE = TypeAdapter(ChatMessage)
+
+
+# Cashier feed (/ws/cashier)
+class SnapshotRequest(Inbound):
+    type: Literal["snapshot"]
+
+
+CASHIER_MESSAGE = TypeAdapter(SnapshotRequest)
+
+
+# Call signaling (/ws/call/{order_id}/{role}); relayed to the other side as-is
+class CallControl(BaseModel):
+    type: Literal["call_request", "call_accept", "call_reject", "hangup"]
+
+
+class CallQueue(BaseModel):
+    type: Literal["call_queue"]
+    message: str = ""
+
+
+class WebrtcOffer(BaseModel):
+    type: Literal["webrtc_offer"]
+    offer: dict
+
+
+class WebrtcAnswer(BaseModel):
+    type: Literal["webrtc_answer"]
+    answer: dict
+
+
+class WebrtcIce(BaseModel):
+    type: Literal["webrtc_ice"]
+    candidate: dict
+
+
+CALL_MESSAGE = TypeAdapter(Annotated[
+    Union[CallControl, CallQueue, WebrtcOffer, WebrtcAnswer, WebrtcIce], Field(discriminator="type"),
+])
+
+
+# Multiplexed socket (/ws/mux): one socket per phone or console carrying the
+# home (customer) or feed (cashier) channel and the order and call channels
+# of any number of orders. Control frames open and close channels; every
+# other frame names its channel (and order) next to that channel's message.
+MuxChannel = Literal["home", "feed", "order", "call"]
+
+
+class MuxControl(Inbound):
+    type: Literal["subscribe", "unsubscribe"]
+    channel: MuxChannel
+    order_id: str = Field("", description="order and call channels")
+    since: Optional[int] = Field(None, description="order channel: resume after this event seq")
+    lanes: str = Field("", description="feed channel: preferred lanes, comma-separated")
+    capacity: Optional[int] = Field(None, description="feed channel: orders handled at once")
+
+
+class MuxFrame(Inbound):
+    channel: MuxChannel
+    order_id: str = ""
+
+
+MUX_CONTROL = TypeAdapter(MuxControl)
+MUX_FRAME = TypeAdapter(MuxFrame)
+
+
+def socket_schemas() -> dict:
+    # OpenAPI has no WebSocket operations; main.py lists these under
+    # components.schemas so clients can still generate the message types.
+    out = {}
+    ref = "#/components/schemas/{model}"
+    for name, adapter in (
+        ("OrderSocketMessage", ORDER_MESSAGE), ("CashierSocketMessage", CASHIER_MESSAGE),
+        ("CallSocketMessage", CALL_MESSAGE), ("MuxSocketControl", MUX_CONTROL),
+    ):
+        schema = adapter.json_schema(ref_template=ref)
+        out.update(schema.pop("$defs", {}))
+        out.setdefault(name, schema)
+    return out
@@ -0,0 +1,58 @@
+import gzip
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+# HTML pages are encoded and compressed once, then served by Accept-Encoding
+# with a strong ETag per representation and If-None-Match -> 304.
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    out = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            out[name.strip().lower()] = q
+    return out
+
+
+class CompressedPage:
+    def __init__(self, html: str, best: bool = True) -> None:
+        body = html.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # best=False is for pages rebuilt at runtime (lane codes): faster levels.
+        self.variants: Dict[str, bytes] = {"identity": body, "gzip": gzip.compress(body, 9 if best else 6, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11 if best else 5)
+        self.etags = {enc: f'"{digest}-{enc}"' for enc in self.variants}
+
+    def choose(self, accept_encoding: Optional[str]) -> str:
+        accepted = _accepted(accept_encoding or "")
+        for enc in ("br", "gzip"):
+            if enc in self.variants and accepted.get(enc, accepted.get("*", 0.0)) > 0:
+                return enc
+        return "identity"
+
+    def response(self, request: Request, status_code: int = 200) -> Response:
+        enc = self.choose(request.headers.get("accept-encoding"))
+        headers = {"ETag": self.etags[enc], "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        inm = request.headers.get("if-none-match")
+        if inm and (inm.strip() == "*" or self.etags[enc] in [t.strip() for t in inm.split(",")]):
+            return Response(status_code=304, headers=headers)
+        if enc != "identity":
+            headers["Content-Encoding"] = enc
+        return Response(self.variants[enc], status_code=status_code, media_type="text/html; charset=utf-8", headers=headers)
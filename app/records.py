@@ -0,0 +1,162 @@
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Optional, Sequence
+
+# Stored records. Slotted classes rather than dicts: an order or payment
+# session is held for its whole retention period, and per-record dict
+# overhead dominated memory (benchmarks/record_memory.py). Statuses are
+# enum members (shared singletons that still compare, hash and serialize
+# as their string value); times are integer epoch seconds, the clock the
+# timer wheel runs on. to_dict()/from_dict() give the JSON form the
+# persistent stores write; restore() is the same as from_dict() without the
+# constructor's defaults and enum calls, for log replay.
+
+
+class _Status(str, Enum):
+    __str__ = str.__str__
+    __format__ = str.__format__
+    __hash__ = str.__hash__
+
+
+class OrderStatus(_Status):
+    CONNECTED_WAITING_CASHIER = "CONNECTED_WAITING_CASHIER"
+    CASHIER_CONNECTED = "CASHIER_CONNECTED"
+    TOTAL_CONFIRMED_WAITING_PAYMENT = "TOTAL_CONFIRMED_WAITING_PAYMENT"
+    PAYMENT_DECLINED = "PAYMENT_DECLINED"
+    PAID_READY_FOR_PICKUP = "PAID_READY_FOR_PICKUP"
+
+
+class PaymentStatus(_Status):
+    PENDING = "PENDING"
+    APPROVED = "APPROVED"
+    DECLINED = "DECLINED"
+    EXPIRED = "EXPIRED"
+
+
+def epoch() -> int:
+    return int(time.time())
+
+
+_EMPTY: Sequence[dict] = ()
+
+
+class Record:
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(**d)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)})"
+
+
+_ORDER_STATUSES = {s.value: s for s in OrderStatus}
+_PAYMENT_STATUSES = {s.value: s for s in PaymentStatus}
+
+
+class Order(Record):
+    __slots__ = (
+        "order_id", "customer_id", "lane_id", "status", "created_at",
+        "items_text", "total_cents", "pay_session_id", "messages", "chat_count",
+    )
+
+    def __init__(
+        self, order_id: str, customer_id: str, lane_id: str,
+        status: OrderStatus = OrderStatus.CONNECTED_WAITING_CASHIER, created_at: Optional[int] = None,
+        items_text: str = "", total_cents: Optional[int] = None, pay_session_id: Optional[str] = None,
+        messages: Sequence[dict] = _EMPTY, chat_count: int = 0,
+    ) -> None:
+        self.order_id = order_id
+        self.customer_id = customer_id
+        self.lane_id = lane_id
+        self.status = OrderStatus(status)
+        self.created_at = epoch() if created_at is None else created_at
+        self.items_text = items_text
+        self.total_cents = total_cents
+        self.pay_session_id = pay_session_id
+        self.messages: Sequence[dict] = messages or _EMPTY  # last CHAT_RING chat messages (helpers.record_chat)
+        self.chat_count = chat_count
+
+    def to_dict(self) -> dict:
+        d = super().to_dict()
+        d["messages"] = list(self.messages)
+        return d
+
+    @classmethod
+    def restore(cls, d: dict) -> "Order":
+        o = cls.__new__(cls)
+        o.order_id = d["order_id"]
+        o.customer_id = d["customer_id"]
+        o.lane_id = d["lane_id"]
+        o.status = _ORDER_STATUSES[d["status"]]
+        o.created_at = d["created_at"]
+        o.items_text = d["items_text"]
+        o.total_cents = d["total_cents"]
+        o.pay_session_id = d["pay_session_id"]
+        o.messages = d["messages"] or _EMPTY
+        o.chat_count = d["chat_count"]
+        return o
+
+
+class PaymentSession(Record):
+    __slots__ = (
+        "pay_session_id", "order_id", "customer_id", "amount_cents", "currency", "merchant_name",
+        "status", "payment_method", "expires_at", "authorization_id",
+    )
+
+    def __init__(
+        self, pay_session_id: str, order_id: str, customer_id: str, amount_cents: int, expires_at: int,
+        currency: str = "USD", merchant_name: str = "DriveThru Demo", status: PaymentStatus = PaymentStatus.PENDING,
+        payment_method: Optional[str] = None, authorization_id: Optional[str] = None,
+    ) -> None:
+        self.pay_session_id = pay_session_id
+        self.order_id = order_id
+        self.customer_id = customer_id
+        self.amount_cents = amount_cents
+        self.currency = currency
+        self.merchant_name = merchant_name
+        self.status = PaymentStatus(status)
+        self.payment_method = payment_method
+        self.expires_at = expires_at
+        self.authorization_id = authorization_id
+
+    @classmethod
+    def restore(cls, d: dict) -> "PaymentSession":
+        p = cls.__new__(cls)
+        p.pay_session_id = d["pay_session_id"]
+        p.order_id = d["order_id"]
+        p.customer_id = d["customer_id"]
+        p.amount_cents = d["amount_cents"]
+        p.currency = d["currency"]
+        p.merchant_name = d["merchant_name"]
+        p.status = _PAYMENT_STATUSES[d["status"]]
+        p.payment_method = d["payment_method"]
+        p.expires_at = d["expires_at"]
+        p.authorization_id = d["authorization_id"]
+        return p
+
+
+class LaneCode(Record):
+    __slots__ = ("lane_id", "code", "expires_at")
+
+    def __init__(self, lane_id: str, code: str, expires_at: int) -> None:
+        self.lane_id = lane_id
+        self.code = code
+        self.expires_at = expires_at
+
+    def expires_iso(self) -> str:
+        return datetime.utcfromtimestamp(self.expires_at).isoformat() + "Z"
+
+
+class Checkin(Record):
+    __slots__ = ("customer_id", "lane_id", "ts")
+
+    def __init__(self, customer_id: str, lane_id: str, ts: Optional[int] = None) -> None:
+        self.customer_id = customer_id
+        self.lane_id = lane_id
+        self.ts = epoch() if ts is None else ts
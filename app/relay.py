@@ -0,0 +1,121 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import sys
+from typing import Callable, List, Optional, Set
+
+from . import metrics
+from .frames import dumps
+
+# Cross-worker delivery for multi-worker runs (run.py --workers N). Sockets
+# live in the worker that accepted them, so a frame for a socket this worker
+# does not hold is handed to a small hub over a Unix socket, which forwards
+# it to every other worker; whichever holds the socket delivers it (see
+# helpers.deliver). Frames are one JSON object per line:
+#   {"topic": "order:<order_id>:customer", "payloads": [...]}
+# With RELAY_SOCKET unset there is a single worker and nothing is relayed.
+
+RELAY_SOCKET = os.environ.get("RELAY_SOCKET")
+LINE_LIMIT = 1 << 20  # bytes per frame
+RECONNECT_DELAY = 0.5
+
+log = logging.getLogger(__name__)
+
+relay_frames = metrics.Counter("drive_thru_relay_frames_total", "Frames exchanged with the relay hub.", ("direction",))
+
+
+class Hub:
+    # Fan-out only: the hub never parses frames. Broadcasting to every worker
+    # keeps it stateless; with a handful of workers the extra lookups on the
+    # receiving side are cheaper than tracking subscriptions.
+    def __init__(self) -> None:
+        self.workers: Set[asyncio.StreamWriter] = set()
+
+    async def serve(self, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._handle, path, limit=LINE_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.workers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for other in self.workers:
+                    if other is not writer and not other.is_closing():
+                        other.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.workers.discard(writer)
+            writer.close()
+
+
+class Link:
+    # A worker's connection to the hub; reconnects if the hub goes away.
+    def __init__(self) -> None:
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    def publish(self, topic: str, payloads: List[dict]) -> bool:
+        if self.writer is None or self.writer.is_closing():
+            return False
+        self.writer.write(dumps({"topic": topic, "payloads": list(payloads)}).encode() + b"\n")
+        relay_frames.inc("out")
+        return True
+
+    async def run(self, path: str, deliver: Callable[[str, List[dict]], None]) -> None:
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    relay_frames.inc("in")
+                    frame = json.loads(line)
+                    try:
+                        deliver(frame["topic"], frame["payloads"])
+                    except Exception:
+                        log.exception("relay: delivering %s failed", frame.get("topic"))
+            except (OSError, ValueError):
+                log.warning("relay: hub at %s unavailable, retrying", path)
+            finally:
+                if self.writer is not None:
+                    self.writer.close()
+                    self.writer = None
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+link = Link()
+_lead_lock = None
+
+
+def lead() -> bool:
+    # True in exactly one worker at a time: the first to take the lock file
+    # next to the hub socket keeps it until it exits. Work that must happen
+    # once per start, not once per worker, runs there. A lone worker leads.
+    global _lead_lock
+    if not RELAY_SOCKET or _lead_lock is not None:
+        return True
+    f = open(RELAY_SOCKET + ".lock", "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return False
+    _lead_lock = f
+    return True
+
+
+def serve_hub(path: str) -> None:
+    asyncio.run(Hub().serve(path))
+
+
+if __name__ == "__main__":
+    serve_hub(sys.argv[1] if len(sys.argv) > 1 else RELAY_SOCKET)
@@ -1,70 +1,96 @@
-from fastapi import APIRouter
+import asyncio
+
+from fastapi import APIRouter, Query
 from fastapi.responses import JSONResponse
-from uuid import uuid4
-from datetime import timedelta
+from typing import Optional
 
-from .. import state
-from ..helpers import utcnow, relay_order, push_customer, money
+from .. import state, timers
+from ..lanes import registry
+from ..models import ConfirmTotalRequest
+from ..records import OrderStatus, PaymentSession, epoch
+from ..helpers import new_id, relay_order, push_customer, publish_order, order_summary, money, ACTIVE_STATUSES
 
 router = APIRouter(prefix="/cashier", tags=["cashier"])
 
+PAYMENT_TTL = 5 * 60  # seconds a payment session stays payable
+
 @router.get("/orders")
-async def cashier_orders():
-    out = []
-    for o in state.orders.values():
-        out.append(
-            {
-                "order_id": o["order_id"],
-                "lane_id": o["lane_id"],
-                "status": o["status"],
-                "total_cents": o["total_cents"] or 0,
-            }
-        )
-    out.sort(key=lambda x: x["order_id"], reverse=True)
-    return {"orders": out}
+async def cashier_orders(
+    status: Optional[str] = Query(None, description="Comma-separated statuses, or 'active'"),
+    lane: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    after: Optional[str] = Query(None, description="Cursor: return orders older than this order_id"),
+):
+    statuses = None
+    if status:
+        statuses = set()
+        for s in status.upper().split(","):
+            s = s.strip()
+            if s == "ACTIVE":
+                statuses.update(ACTIVE_STATUSES)
+            elif s:
+                statuses.add(s)
+    lane_id = None
+    if lane:
+        found = registry.get(lane)
+        if found is None:
+            return JSONResponse({"error": "Unknown lane"}, status_code=404)
+        lane_id = found.key
+    out = [order_summary(o) for o in state.store.find_orders(statuses, lane_id, limit=limit, after=after)]
+    next_after = out[-1]["order_id"] if limit is not None and len(out) == limit else None
+    return {"orders": out, "next_after": next_after}
+
+@router.get("/order/{order_id}/transcript")
+async def cashier_order_transcript(
+    order_id: str,
+    after: int = Query(0, ge=0, description="Cursor: return messages numbered above this"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    # Read from the chat archive, so it still works after the order is evicted.
+    # Buffered messages are written on the loop; the file reads run in a thread.
+    state.chat_archive.flush()
+    messages = await asyncio.to_thread(state.chat_archive.transcript, order_id, after, limit)
+    next_after = messages[-1]["n"] if len(messages) == limit else None
+    return {"order_id": order_id, "messages": messages, "next_after": next_after}
 
 @router.post("/order/{order_id}/confirm_total")
-async def cashier_confirm_total(order_id: str, payload: dict):
-    o = state.orders.get(order_id)
+async def cashier_confirm_total(order_id: str, payload: ConfirmTotalRequest):
+    o = state.store.get_order(order_id)
     if not o:
         return JSONResponse({"error": "order not found"}, status_code=404)
 
-    items_text = str(payload.get("items_text", "")).strip()
-    total_cents = int(payload.get("total_cents", 0))
+    items_text, total_cents = payload.items_text, payload.total_cents
 
     if total_cents <= 0:
         return JSONResponse({"error": "total_cents must be > 0"}, status_code=400)
 
-    o["items_text"] = items_text
-    o["total_cents"] = total_cents
-    o["status"] = "TOTAL_CONFIRMED_WAITING_PAYMENT"
+    o.items_text = items_text
+    o.total_cents = total_cents
+    o.status = OrderStatus.TOTAL_CONFIRMED_WAITING_PAYMENT
+    state.store.save_order(o)
+    await publish_order(o)
 
-    await relay_order(order_id, {"type": "order_state", "status": o["status"], "items_text": items_text, "total_cents": total_cents})
-    await relay_order(order_id, {"type": "chat", "from": "CASHIER", "text": f"Total confirmed: ${money(total_cents)}. Please pay in the app."})
+    await relay_order(
+        order_id,
+        {"type": "order_state", "status": o.status, "items_text": items_text, "total_cents": total_cents},
+        {"type": "chat", "from": "CASHIER", "text": f"Total confirmed: ${money(total_cents)}. Please pay in the app."},
+    )
 
-    pay_session_id = f"pay_{uuid4().hex[:8]}"
-    state.payments[pay_session_id] = {
-        "pay_session_id": pay_session_id,
-        "order_id": order_id,
-        "customer_id": o["customer_id"],
-        "amount_cents": total_cents,
-        "currency": "USD",
-        "merchant_name": "DriveThru Demo",
-        "status": "PENDING",
-        "payment_method": None,
-        "expires_at": utcnow() + timedelta(minutes=5),
-    }
-    o["pay_session_id"] = pay_session_id
+    s = PaymentSession(new_id("pay"), order_id, o.customer_id, total_cents, expires_at=epoch() + PAYMENT_TTL)
+    state.store.save_payment(s)
+    o.pay_session_id = pay_session_id = s.pay_session_id
+    state.store.save_order(o)
+    timers.wheel.schedule("payment", pay_session_id, s.expires_at)
 
     await push_customer(
-        o["customer_id"],
+        o.customer_id,
         {
             "type": "payment_request",
             "pay_session_id": pay_session_id,
             "order_id": order_id,
-            "merchant_name": "DriveThru Demo",
+            "merchant_name": s.merchant_name,
             "amount_cents": total_cents,
-            "currency": "USD",
+            "currency": s.currency,
         },
     )
 
@@ -1,64 +1,67 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
-from uuid import uuid4
+import time
+from typing import Optional
 
-from .. import state
-from ..helpers import utcnow, push_customer, current_lane_code, rotate_lane_code, ensure_demo_cards
+from fastapi import APIRouter, Header
+from fastapi.responses import JSONResponse, Response
+
+from .. import cards, state, timers, metrics
+from ..lanes import registry
+from ..models import CheckinRequest, ConnectRequest
+from ..records import Checkin, Order
+from ..helpers import new_id, push_customer, publish_order, current_lane_code, rotate_lane_code
 
 router = APIRouter(prefix="/customer", tags=["customer"])
 
 @router.post("/checkin")
-async def customer_checkin(payload: dict):
-    customer_id = str(payload.get("customer_id", "")).strip()
-    lane_id = str(payload.get("lane_id", "")).strip().upper()
+async def customer_checkin(payload: CheckinRequest):
+    customer_id, lane = payload.customer_id, registry.get(payload.lane_id)
 
     if not customer_id:
         return JSONResponse({"error": "customer_id required"}, status_code=400)
-    if lane_id not in ("L1", "L2"):
-        return JSONResponse({"error": "lane_id must be L1 or L2"}, status_code=400)
+    if lane is None:
+        return JSONResponse({"error": "Unknown lane_id"}, status_code=400)
+    lane_id = lane.key
 
-    state.checkins[customer_id] = {"customer_id": customer_id, "lane_id": lane_id, "ts": utcnow().isoformat()}
+    state.store.save_checkin(Checkin(customer_id, lane_id))
+    timers.wheel.schedule("checkin", customer_id, timers.after(timers.CHECKIN_TTL))
     await push_customer(customer_id, {"type": "info", "text": f"Checked in to {lane_id}. Enter station code to connect."})
     return {"customer_id": customer_id, "lane_id": lane_id, "status": "CHECKED_IN"}
 
 @router.post("/connect")
-async def customer_connect(payload: dict):
-    customer_id = str(payload.get("customer_id", "")).strip()
-    lane_id = str(payload.get("lane_id", "")).strip().upper()
-    code = str(payload.get("code", "")).strip()
+async def customer_connect(payload: ConnectRequest):
+    customer_id, lane, code = payload.customer_id, registry.get(payload.lane_id), payload.code
 
-    if not customer_id or lane_id not in ("L1", "L2") or not code:
+    if not customer_id or lane is None or not code:
         return JSONResponse({"error": "customer_id, lane_id, and code required"}, status_code=400)
+    lane_id = lane.key
 
-    ci = state.checkins.get(customer_id)
-    if not ci or ci["lane_id"] != lane_id:
+    ci = state.store.get_checkin(customer_id)
+    if not ci or ci.lane_id != lane_id:
         return JSONResponse({"error": "Please click ‘I’m Here’ for this lane first."}, status_code=400)
 
     rec = current_lane_code(lane_id)
-    if utcnow() >= rec["expires_at"]:
+    if time.time() >= rec.expires_at:
         return JSONResponse({"error": "Code expired. Enter the new code shown."}, status_code=400)
-    if code != rec["code"]:
+    if code != rec.code:
         return JSONResponse({"error": "Invalid code. Check the lane display and try again."}, status_code=400)
 
-    order_id = f"ord_{uuid4().hex[:8]}"
-    state.orders[order_id] = {
-        "order_id": order_id,
-        "customer_id": customer_id,
-        "lane_id": lane_id,
-        "status": "CONNECTED_WAITING_CASHIER",
-        "messages": [],
-        "items_text": "",
-        "total_cents": None,
-        "created_at": utcnow().isoformat(),
-        "pay_session_id": None,
-    }
+    order_id = new_id("ord")
+    o = Order(order_id, customer_id, lane_id)
+    state.store.save_order(o)
+    metrics.lane_orders.inc(lane_id)
+    await publish_order(o, "add")
 
     rotate_lane_code(lane_id)
 
     await push_customer(customer_id, {"type": "info", "text": f"Connected. Order {order_id} created. Start ordering."})
-    return {"order_id": order_id, "status": state.orders[order_id]["status"]}
+    return {"order_id": order_id, "status": o.status}
 
 @router.get("/{customer_id}/cards")
-async def cards(customer_id: str):
-    ensure_demo_cards(customer_id)
-    return {"customer_id": customer_id, "cards": state.customer_cards.get(customer_id, [])}
+async def customer_cards(customer_id: str, if_none_match: Optional[str] = Header(None)):
+    # Served from the vault's pre-encoded body; "no-cache" lets the browser
+    # keep it and revalidate with If-None-Match.
+    w = cards.vault.wallet(customer_id)
+    headers = {"ETag": w.etag, "Cache-Control": "private, no-cache"}
+    if if_none_match == w.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(w.body, media_type="application/json", headers=headers)
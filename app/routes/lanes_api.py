@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, Response
+
+from ..lanes import registry
+
+router = APIRouter(prefix="/lanes", tags=["lanes"])
+
+@router.get("")
+async def list_lanes():
+    return Response(registry.listing(), media_type="application/json")
+
+@router.get("/{store_id}")
+async def store_lanes(store_id: str):
+    body = registry.listing(store_id)
+    if body is None:
+        return JSONResponse({"error": "Unknown store"}, status_code=404)
+    return Response(body, media_type="application/json")
@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+import re
+from typing import Dict, List, Tuple
+from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 
+from ..assets import render_assets
 from ..helpers import current_lane_code
+from ..lanes import registry
+from ..page_cache import CompressedPage
 from ..templates.home import HOME_HTML
 from ..templates.lane import LANE_HTML_TEMPLATE
 from ..templates.cashier import CASHIER_HTML
@@ -9,31 +14,50 @@ from ..templates.customer import CUSTOMER_HTML
 
 router = APIRouter()
 
-@router.get("/", response_class=HTMLResponse)
-def home() -> HTMLResponse:
-    return HTMLResponse(HOME_HTML)
+# Static pages: compressed once at import
+HOME_PAGE = CompressedPage(render_assets(HOME_HTML))
+CASHIER_PAGE = CompressedPage(CASHIER_HTML)
+CUSTOMER_PAGE = CompressedPage(CUSTOMER_HTML)
 
-@router.get("/lane/{lane_id}", response_class=HTMLResponse)
-def lane(lane_id: str) -> HTMLResponse:
-    lane_id = lane_id.upper()
-    if lane_id not in ("L1", "L2"):
-        return HTMLResponse("Use L1 or L2", status_code=400)
+# Lane page: the template is split per lane once into static segments and
+# field names, so a new code only splices in the code and expiry. One
+# compressed page is kept per lane, keyed on its current code.
+_LANE_FIELDS = re.compile(r"__(CODE|EXPIRES_AT)__")
+_lane_parts: Dict[str, List[str]] = {}                            # lane_id -> [static, field, static, ...]
+_lane_pages: Dict[str, Tuple[Tuple[str, str], CompressedPage]] = {}  # lane_id -> ((code, expires), page)
 
+def _lane_page(lane_id: str) -> CompressedPage:
     rec = current_lane_code(lane_id)
-    expires_iso = rec["expires_at"].isoformat() + "Z"
+    key = (rec.code, rec.expires_iso())
+    cached = _lane_pages.get(lane_id)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    parts = _lane_parts.get(lane_id)
+    if parts is None:
+        parts = _lane_parts[lane_id] = _LANE_FIELDS.split(LANE_HTML_TEMPLATE.replace("__LANE_ID__", lane_id))
+    fields = {"CODE": key[0], "EXPIRES_AT": key[1]}
+    page = CompressedPage("".join(fields[p] if i % 2 else p for i, p in enumerate(parts)), best=False)
+    _lane_pages[lane_id] = (key, page)
+    return page
 
-    html = (
-        LANE_HTML_TEMPLATE
-        .replace("__LANE_ID__", lane_id)
-        .replace("__EXPIRES_AT__", expires_iso)
-        .replace("__CODE__", rec["code"])
-    )
-    return HTMLResponse(html)
+@router.get("/", response_class=HTMLResponse)
+def home(request: Request):
+    return HOME_PAGE.response(request)
+
+# async: an expired code is rotated here, which pushes to sockets and arms a
+# timer, so it has to run on the event loop rather than in the threadpool.
+@router.get("/lane/{lane_id:path}", response_class=HTMLResponse)
+async def lane(lane_id: str, request: Request):
+    found = registry.get(lane_id)
+    if found is None:
+        return HTMLResponse("Unknown lane", status_code=400)
+    return _lane_page(found.key).response(request)
 
 @router.get("/cashier", response_class=HTMLResponse)
-def cashier_page() -> HTMLResponse:
-    return HTMLResponse(CASHIER_HTML)
+def cashier_page(request: Request):
+    return CASHIER_PAGE.response(request)
 
 @router.get("/customer", response_class=HTMLResponse)
-def customer_page() -> HTMLResponse:
-    return HTMLResponse(CUSTOMER_HTML)
+def customer_page(request: Request):
+    return CUSTOMER_PAGE.response(request)
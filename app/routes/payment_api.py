@@ -1,88 +1,167 @@
-from fastapi import APIRouter
+import hashlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Union
+
+from fastapi import APIRouter, Header
 from fastapi.responses import JSONResponse
-from uuid import uuid4
 
-from .. import state
-from ..helpers import utcnow, relay_order, ensure_demo_cards
+from .. import cards, idempotency, state
+from ..gateway import GatewayError
+from ..helpers import expire_payment, relay_order, publish_order, retire_payment
+from ..models import NewCard, PayRequest
+from ..records import OrderStatus, PaymentSession, PaymentStatus
 
 router = APIRouter(prefix="/payment", tags=["payment"])
+log = logging.getLogger(__name__)
+
+async def _once(
+    action: str, pay_session_id: str, key: Optional[str], payload: Optional[PayRequest],
+    run: Callable[[], Awaitable[Union[dict, JSONResponse]]],
+):
+    # Serialize calls per pay session; with an Idempotency-Key, replay the
+    # first response for that key instead of running the call again.
+    async with idempotency.sessions.hold(pay_session_id):
+        if not key:
+            return await run()
+        cache_key = (action, pay_session_id, key)
+        # A digest only: new_card bodies carry the card number and CVV.
+        fingerprint = hashlib.sha256(payload.model_dump_json().encode()).hexdigest() if payload else ""
+        hit = idempotency.responses.get(cache_key)
+        if hit is not None:
+            if hit.fingerprint != fingerprint:
+                return JSONResponse({"error": "Idempotency-Key reused with a different request"}, status_code=422)
+            return JSONResponse(hit.body, status_code=hit.status_code, headers={"Idempotent-Replayed": "true"})
+        result = await run()
+        if isinstance(result, JSONResponse):
+            if result.status_code >= 500:  # not an answer; a retry should run again
+                return result
+            idempotency.responses.put(cache_key, fingerprint, result.status_code, json.loads(result.body))
+        else:
+            idempotency.responses.put(cache_key, fingerprint, 200, result)
+        return result
 
 @router.post("/{pay_session_id}/decline")
-async def payment_decline(pay_session_id: str):
-    s = state.payments.get(pay_session_id)
-    if not s:
-        return JSONResponse({"error": "payment session not found"}, status_code=404)
+async def payment_decline(pay_session_id: str, idempotency_key: Optional[str] = Header(None)):
+    return await _once("decline", pay_session_id, idempotency_key, None, lambda: _decline(pay_session_id))
 
-    if s["status"] != "PENDING":
-        return {"pay_session_id": pay_session_id, "status": s["status"]}
+@router.post("/{pay_session_id}/pay")
+async def payment_pay(pay_session_id: str, payload: PayRequest, idempotency_key: Optional[str] = Header(None)):
+    return await _once("pay", pay_session_id, idempotency_key, payload, lambda: _pay(pay_session_id, payload))
 
-    s["status"] = "DECLINED"
+async def _decline(pay_session_id: str):
+    s = state.store.get_payment(pay_session_id)
+    if not s:
+        return JSONResponse({"error": "payment session not found"}, status_code=404)
 
-    o = state.orders.get(s["order_id"])
-    if o:
-        o["status"] = "PAYMENT_DECLINED"
-        await relay_order(o["order_id"], {"type": "order_state", "status": o["status"]})
-        await relay_order(o["order_id"], {"type": "chat", "from": "SYSTEM", "text": "Payment declined. You can try again or pay at window."})
+    if s.status != PaymentStatus.PENDING:
+        return {"pay_session_id": pay_session_id, "status": s.status}
 
-    await relay_order(s["order_id"], {"type": "payment_status", "status": "DECLINED", "payment_method": None})
+    await _declined(s)
     return {"pay_session_id": pay_session_id, "status": "DECLINED"}
 
-@router.post("/{pay_session_id}/pay")
-async def payment_pay(pay_session_id: str, payload: dict):
-    s = state.payments.get(pay_session_id)
+async def _declined(s: PaymentSession) -> None:
+    s.status = PaymentStatus.DECLINED
+    state.store.save_payment(s)
+    retire_payment(s.pay_session_id)
+
+    events = []
+    o = state.store.get_order(s.order_id)
+    if o:
+        o.status = OrderStatus.PAYMENT_DECLINED
+        state.store.save_order(o)
+        await publish_order(o)
+        events.append({"type": "order_state", "status": o.status})
+        events.append({"type": "chat", "from": "SYSTEM", "text": "Payment declined. You can try again or pay at window."})
+
+    events.append({"type": "payment_status", "status": "DECLINED", "payment_method": s.payment_method})
+    await relay_order(s.order_id, *events)
+
+async def _void(pay_session_id: str, authorization_id: str) -> None:
+    try:
+        await state.gateway.void(pay_session_id, authorization_id)
+    except GatewayError:
+        log.error("could not void authorization %s for %s", authorization_id, pay_session_id)
+
+async def _pay(pay_session_id: str, payload: PayRequest):
+    s = state.store.get_payment(pay_session_id)
     if not s:
         return JSONResponse({"error": "payment session not found"}, status_code=404)
 
-    customer_id = str(payload.get("customer_id", "")).strip()
-    mode = str(payload.get("mode", "")).strip()
+    customer_id, mode = payload.customer_id, payload.mode
 
-    if s["customer_id"] != customer_id:
+    if s.customer_id != customer_id:
         return JSONResponse({"error": "customer mismatch"}, status_code=403)
 
-    if s["status"] != "PENDING":
-        return {"pay_session_id": pay_session_id, "status": s["status"], "payment_method": s.get("payment_method")}
+    if s.status != PaymentStatus.PENDING:
+        return {"pay_session_id": pay_session_id, "status": s.status, "payment_method": s.payment_method}
 
-    if utcnow() > s["expires_at"]:
-        s["status"] = "EXPIRED"
+    if time.time() > s.expires_at:
+        await expire_payment(s)
         return {"pay_session_id": pay_session_id, "status": "EXPIRED"}
 
-    ensure_demo_cards(customer_id)
+    new_card = None
 
     if mode == "saved_card":
-        card_id = str(payload.get("card_id", "")).strip()
-        card = next((c for c in state.customer_cards.get(customer_id, []) if c["card_id"] == card_id), None)
+        card = cards.vault.get(customer_id, payload.card_id)
         if not card:
             return JSONResponse({"error": "invalid saved card"}, status_code=400)
-        s["payment_method"] = f"saved_card:{card['brand']}:{card['last4']}"
+        method = f"saved_card:{card['brand']}:{card['last4']}"
 
     elif mode == "new_card":
-        nc = payload.get("new_card") or {}
-        number = str(nc.get("number", "")).replace(" ", "")
-        exp = str(nc.get("exp", "")).strip()
-        cvv = str(nc.get("cvv", "")).strip()
+        nc = payload.new_card or NewCard()
+        number, exp, cvv = nc.number.replace(" ", ""), nc.exp, nc.cvv
 
         if len(number) < 12 or not exp or not cvv:
             return JSONResponse({"error": "new_card requires number, exp, cvv"}, status_code=400)
 
         last4 = number[-4:]
         brand = "VISA" if number.startswith("4") else "CARD"
-        state.customer_cards[customer_id].append(
-            {"card_id": f"card_{uuid4().hex[:8]}", "brand": brand, "last4": last4, "exp": exp}
-        )
-        s["payment_method"] = f"new_card:{brand}:{last4}"
-
-    elif mode in ("google_pay", "paypal", "other_wallet"):
-        s["payment_method"] = mode
-    else:
-        return JSONResponse({"error": "unsupported mode"}, status_code=400)
-
-    s["status"] = "APPROVED"
-
-    o = state.orders.get(s["order_id"])
+        new_card = (brand, last4, exp)
+        method = f"new_card:{brand}:{last4}"
+
+    else:  # google_pay, paypal, other_wallet
+        method = mode
+
+    try:
+        auth = await state.gateway.authorize(pay_session_id, s.amount_cents, s.currency, method)
+    except GatewayError:
+        return JSONResponse({"error": "payment processor unavailable, please try again"}, status_code=502)
+
+    # The sweeper may have expired or evicted the session while the processor
+    # answered. The session was payable when the call began, so an approval
+    # still stands if it expired meanwhile; one that can no longer be
+    # recorded (evicted, or settled by another worker) is voided, not kept.
+    s = state.store.get_payment(pay_session_id)
+    expired = s is not None and s.status == PaymentStatus.EXPIRED
+    if not s or (s.status != PaymentStatus.PENDING and not (expired and auth.approved)):
+        if auth.approved:
+            await _void(pay_session_id, auth.authorization_id)
+        return JSONResponse({"error": "payment session is no longer pending"}, status_code=409)
+
+    s.payment_method = method
+    if not auth.approved:
+        await _declined(s)
+        return {"pay_session_id": pay_session_id, "status": "DECLINED", "payment_method": method}
+
+    if new_card:
+        cards.vault.add(customer_id, *new_card)
+
+    s.status = PaymentStatus.APPROVED
+    s.authorization_id = auth.authorization_id
+    state.store.save_payment(s)
+    retire_payment(pay_session_id)
+
+    events = []
+    o = state.store.get_order(s.order_id)
     if o:
-        o["status"] = "PAID_READY_FOR_PICKUP"
-        await relay_order(o["order_id"], {"type": "order_state", "status": o["status"]})
-        await relay_order(o["order_id"], {"type": "chat", "from": "SYSTEM", "text": "✅ Payment approved. Move forward to pickup window."})
-
-    await relay_order(s["order_id"], {"type": "payment_status", "status": "APPROVED", "payment_method": s["payment_method"]})
-    return {"pay_session_id": pay_session_id, "status": "APPROVED", "payment_method": s["payment_method"]}
+        o.status = OrderStatus.PAID_READY_FOR_PICKUP
+        state.store.save_order(o)
+        await publish_order(o)
+        events.append({"type": "order_state", "status": o.status})
+        events.append({"type": "chat", "from": "SYSTEM", "text": "✅ Payment approved. Move forward to pickup window."})
+
+    events.append({"type": "payment_status", "status": "APPROVED", "payment_method": s.payment_method})
+    await relay_order(s.order_id, *events)
+    return {"pay_session_id": pay_session_id, "status": "APPROVED", "payment_method": s.payment_method}
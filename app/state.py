@@ -1,17 +1,29 @@
-from typing import Dict, List
-from fastapi import WebSocket
+import os
+from typing import Dict, Set
 
-# In-memory stores (demo only)
-customer_home_ws: Dict[str, WebSocket] = {}      # customer_id -> ws
-order_customer_ws: Dict[str, WebSocket] = {}     # order_id -> ws
-order_cashier_ws: Dict[str, WebSocket] = {}      # order_id -> ws
+from .chat_archive import ChatArchive
+from .connections import Connection, Sink
+from .gateway import PaymentGateway, create_gateway
+from .storage import Store, create_store
 
-lane_codes: Dict[str, dict] = {}                 # lane_id -> {code, expires_at}
-checkins: Dict[str, dict] = {}                   # customer_id -> {lane_id, ts}
+# Orders, payments, checkins, lane codes and saved cards (see storage.py).
+# STORE_URL=memory (default, demo only) or sqlite:///path/to/easypay.db
+store: Store = create_store(os.environ.get("STORE_URL", "memory"))
 
-orders: Dict[str, dict] = {}                     # order_id -> order
-payments: Dict[str, dict] = {}                   # pay_session_id -> payment session
+# Card authorization: PAYMENT_GATEWAY_URL=local (default, approves inline)
+# or http://host:port of a processor speaking POST /authorize (see gateway.py)
+gateway: PaymentGateway = create_gateway(os.environ.get("PAYMENT_GATEWAY_URL", "local"))
 
-customer_cards: Dict[str, List[dict]] = {}       # customer_id -> list[card]
+# Full chat transcripts; orders themselves keep only the last CHAT_RING messages.
+chat_archive = ChatArchive(os.environ.get("CHAT_ARCHIVE_DIR", "chat_archive"))
 
-call_ws: Dict[str, Dict[str, WebSocket]] = {}    # order_id -> {"customer": ws, "cashier": ws}
+# Live sockets (always per-process), each wrapped in a Connection or, for
+# clients on /ws/mux, a Channel of one
+customer_home_ws: Dict[str, Sink] = {}           # customer_id -> conn
+order_customer_ws: Dict[str, Sink] = {}          # order_id -> conn
+order_cashier_ws: Dict[str, Sink] = {}           # order_id -> conn
+
+call_ws: Dict[str, Dict[str, Sink]] = {}         # order_id -> {"customer": conn, "cashier": conn}
+cashier_feed_ws: Dict[str, Sink] = {}            # cashier_id -> conn (order list feed)
+lane_ws: Dict[str, Set[Connection]] = {}         # lane_id -> lane display conns
+mux_ws: Set[Connection] = set()                  # /ws/mux sockets; their channels sit in the registries above
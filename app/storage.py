@@ -0,0 +1,801 @@
+import bisect
+import gc
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json without it (slower log replay)
+    orjson = None
+
+from .records import Checkin, LaneCode, Order, PaymentSession
+
+# Storage backends for orders, payments, checkins, lane codes and saved cards.
+# Routes always go through state.store; records (records.py) must be handed
+# back with save_*() after mutation so persistent backends see them. Saved
+# cards are plain dicts (cards.py).
+
+ORDER_EVENT_RING = 128  # recent events kept per order for ?since= replay
+
+
+class Store:
+    def get_order(self, order_id: str) -> Optional[Order]:
+        raise NotImplementedError
+
+    def save_order(self, order: Order) -> None:
+        raise NotImplementedError
+
+    def delete_order(self, order_id: str) -> None:
+        raise NotImplementedError
+
+    def list_orders(self) -> List[Order]:
+        raise NotImplementedError
+
+    def find_orders(
+        self,
+        statuses: Optional[Iterable[str]] = None,
+        lane_id: Optional[str] = None,
+        customer_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> List[Order]:
+        # Newest order_id first (ids are time-sortable), starting strictly
+        # below the `after` cursor; every filter is answered from an index.
+        raise NotImplementedError
+
+    def count_orders_by_status(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def claim_order(self, order_id: str, cashier_id: str, force: bool = False) -> bool:
+        # Records which cashier holds the order (dispatch.py): False when
+        # another cashier already does, unless `force` takes it over. Workers
+        # sharing a store race here, so only one of them hands an order out.
+        raise NotImplementedError
+
+    def unclaim_order(self, order_id: str) -> None:
+        raise NotImplementedError
+
+    def append_order_events(self, order_id: str, payloads: Iterable[dict]) -> List[dict]:
+        # Stamps each payload with the order's next sequence number, keeps the
+        # last ORDER_EVENT_RING of them and returns the stamped copies.
+        raise NotImplementedError
+
+    def order_events_since(self, order_id: str, since: int) -> Tuple[int, Optional[List[dict]]]:
+        # (last seq, events after `since`), or (last seq, None) when part of
+        # the gap has already left the ring and the client must resync.
+        raise NotImplementedError
+
+    def get_payment(self, pay_session_id: str) -> Optional[PaymentSession]:
+        raise NotImplementedError
+
+    def list_payments(self) -> List[PaymentSession]:
+        raise NotImplementedError
+
+    def count_payments_by_status(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def save_payment(self, payment: PaymentSession) -> None:
+        raise NotImplementedError
+
+    def delete_payment(self, pay_session_id: str) -> None:
+        raise NotImplementedError
+
+    def get_checkin(self, customer_id: str) -> Optional[Checkin]:
+        raise NotImplementedError
+
+    def save_checkin(self, checkin: Checkin) -> None:
+        raise NotImplementedError
+
+    def delete_checkin(self, customer_id: str) -> None:
+        raise NotImplementedError
+
+    def get_lane_code(self, lane_id: str) -> Optional[LaneCode]:
+        raise NotImplementedError
+
+    def save_lane_code(self, rec: LaneCode) -> None:
+        raise NotImplementedError
+
+    def get_cards(self, customer_id: str) -> Optional[List[dict]]:
+        raise NotImplementedError
+
+    def save_cards(self, customer_id: str, cards: List[dict]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class MemoryStore(Store):
+    # Demo default: everything lives in process memory and is lost on restart.
+    def __init__(self) -> None:
+        self.orders: Dict[str, Order] = {}
+        self.payments: Dict[str, PaymentSession] = {}    # by pay_session_id
+        self.checkins: Dict[str, Checkin] = {}           # by customer_id
+        self.lane_codes: Dict[str, LaneCode] = {}        # by lane_id
+        self.customer_cards: Dict[str, List[dict]] = {}  # customer_id -> list[card]
+
+        # Secondary indexes over orders, kept in sync by save_order: sorted
+        # order_id lists, so a page is read from the cursor down. The key
+        # each order was last indexed under is remembered because callers
+        # mutate the live record before saving it.
+        self.by_status: Dict[str, List[str]] = {}
+        self.by_lane: Dict[str, List[str]] = {}
+        self.by_customer: Dict[str, List[str]] = {}
+        self._index_keys: Dict[str, Tuple[str, str, str]] = {}
+        self._order_ids: List[str] = []              # sorted; new ids append at the end
+        self.payments_by_status: Dict[str, Set[str]] = {}
+        self._payment_status: Dict[str, str] = {}
+        self.order_events: Dict[str, Deque[dict]] = {}  # order_id -> recent events, oldest first
+        self.order_seq: Dict[str, int] = {}
+        self.order_cashiers: Dict[str, str] = {}        # order_id -> cashier holding it (not logged)
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        return self.orders.get(order_id)
+
+    def save_order(self, order: Order) -> None:
+        order_id = order.order_id
+        self.orders[order_id] = order
+        keys = (order.status, order.lane_id, order.customer_id)
+        old = self._index_keys.get(order_id)
+        if old == keys:
+            return
+        if old is None:
+            if not self._order_ids or order_id > self._order_ids[-1]:
+                self._order_ids.append(order_id)
+            else:
+                bisect.insort(self._order_ids, order_id)
+        for index, old_key, new_key in zip((self.by_status, self.by_lane, self.by_customer), old or (None,) * 3, keys):
+            if old_key == new_key:
+                continue
+            if old_key is not None:
+                _remove_sorted(index, old_key, order_id)
+            _add_sorted(index, new_key, order_id)
+        self._index_keys[order_id] = keys
+
+    def delete_order(self, order_id: str) -> None:
+        self.orders.pop(order_id, None)
+        self.order_events.pop(order_id, None)
+        self.order_seq.pop(order_id, None)
+        self.order_cashiers.pop(order_id, None)
+        old = self._index_keys.pop(order_id, None)
+        if old is None:
+            return
+        for index, key in zip((self.by_status, self.by_lane, self.by_customer), old):
+            _remove_sorted(index, key, order_id)
+        i = bisect.bisect_left(self._order_ids, order_id)
+        if i < len(self._order_ids) and self._order_ids[i] == order_id:
+            del self._order_ids[i]
+
+    def list_orders(self) -> List[Order]:
+        return list(self.orders.values())
+
+    def find_orders(self, statuses=None, lane_id=None, customer_id=None, limit=None, after=None) -> List[Order]:
+        # Walks the narrowest matching index newest first from the cursor and
+        # checks the other filters per order, stopping after `limit`: with
+        # one filter, O(log n + page).
+        if limit == 0:
+            return []
+        sources: List[List[List[str]]] = [[self._order_ids]]
+        if statuses is not None:
+            statuses = set(statuses)
+            sources.append([self.by_status[s] for s in statuses if s in self.by_status])
+        if lane_id is not None:
+            sources.append([self.by_lane.get(lane_id, [])])
+        if customer_id is not None:
+            sources.append([self.by_customer.get(customer_id, [])])
+        lists = min(sources, key=lambda lists: sum(map(len, lists)))
+        walks = [_newest_first(ids, after) for ids in lists]
+        ids = walks[0] if len(walks) == 1 else heapq.merge(*walks, reverse=True)
+        out: List[Order] = []
+        for order_id in ids:
+            status, lane, customer = self._index_keys[order_id]
+            if (
+                (statuses is None or status in statuses)
+                and (lane_id is None or lane == lane_id)
+                and (customer_id is None or customer == customer_id)
+            ):
+                out.append(self.orders[order_id])
+                if len(out) == limit:
+                    break
+        return out
+
+    def count_orders_by_status(self) -> Dict[str, int]:
+        return {status: len(ids) for status, ids in self.by_status.items()}
+
+    def claim_order(self, order_id: str, cashier_id: str, force: bool = False) -> bool:
+        if force:
+            self.order_cashiers[order_id] = cashier_id
+            return True
+        return self.order_cashiers.setdefault(order_id, cashier_id) == cashier_id
+
+    def unclaim_order(self, order_id: str) -> None:
+        self.order_cashiers.pop(order_id, None)
+
+    def append_order_events(self, order_id: str, payloads: Iterable[dict]) -> List[dict]:
+        ring = self.order_events.get(order_id)
+        if ring is None:
+            ring = self.order_events[order_id] = deque(maxlen=ORDER_EVENT_RING)
+        seq = self.order_seq.get(order_id, 0)
+        out = []
+        for payload in payloads:
+            seq += 1
+            event = {**payload, "seq": seq}
+            ring.append(event)
+            out.append(event)
+        self.order_seq[order_id] = seq
+        return out
+
+    def order_events_since(self, order_id: str, since: int) -> Tuple[int, Optional[List[dict]]]:
+        last = self.order_seq.get(order_id, 0)
+        if since == last:
+            return last, []
+        ring = self.order_events.get(order_id)
+        if since > last or not ring or ring[0]["seq"] > since + 1:
+            return last, None
+        return last, [event for event in ring if event["seq"] > since]
+
+    def get_payment(self, pay_session_id: str) -> Optional[PaymentSession]:
+        return self.payments.get(pay_session_id)
+
+    def list_payments(self) -> List[PaymentSession]:
+        return list(self.payments.values())
+
+    def save_payment(self, payment: PaymentSession) -> None:
+        pay_session_id = payment.pay_session_id
+        self.payments[pay_session_id] = payment
+        old = self._payment_status.get(pay_session_id)
+        if old != payment.status:
+            if old is not None:
+                _unindex(self.payments_by_status, old, pay_session_id)
+            self.payments_by_status.setdefault(payment.status, set()).add(pay_session_id)
+            self._payment_status[pay_session_id] = payment.status
+
+    def delete_payment(self, pay_session_id: str) -> None:
+        self.payments.pop(pay_session_id, None)
+        old = self._payment_status.pop(pay_session_id, None)
+        if old is not None:
+            _unindex(self.payments_by_status, old, pay_session_id)
+
+    def count_payments_by_status(self) -> Dict[str, int]:
+        return {status: len(ids) for status, ids in self.payments_by_status.items()}
+
+    def get_checkin(self, customer_id: str) -> Optional[Checkin]:
+        return self.checkins.get(customer_id)
+
+    def save_checkin(self, checkin: Checkin) -> None:
+        self.checkins[checkin.customer_id] = checkin
+
+    def delete_checkin(self, customer_id: str) -> None:
+        self.checkins.pop(customer_id, None)
+
+    def get_lane_code(self, lane_id: str) -> Optional[LaneCode]:
+        return self.lane_codes.get(lane_id)
+
+    def save_lane_code(self, rec: LaneCode) -> None:
+        self.lane_codes[rec.lane_id] = rec
+
+    def get_cards(self, customer_id: str) -> Optional[List[dict]]:
+        return self.customer_cards.get(customer_id)
+
+    def save_cards(self, customer_id: str, cards: List[dict]) -> None:
+        self.customer_cards[customer_id] = cards
+
+
+def _newest_first(ids: List[str], after: Optional[str]) -> Iterator[str]:
+    end = bisect.bisect_left(ids, after) if after is not None else len(ids)
+    for i in range(end - 1, -1, -1):
+        yield ids[i]
+
+
+def _add_sorted(index: Dict[str, List[str]], key: str, order_id: str) -> None:
+    ids = index.get(key)
+    if ids is None:
+        index[key] = [order_id]
+    elif order_id > ids[-1]:
+        ids.append(order_id)  # new orders have the highest ids
+    else:
+        bisect.insort(ids, order_id)
+
+
+def _remove_sorted(index: Dict[str, List[str]], key: str, order_id: str) -> None:
+    ids = index.get(key)
+    if ids is not None:
+        i = bisect.bisect_left(ids, order_id)
+        if i < len(ids) and ids[i] == order_id:
+            del ids[i]
+        if not ids:
+            del index[key]
+
+
+def _unindex(index: Dict[str, Set[str]], key: str, order_id: str) -> None:
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(order_id)
+        if not ids:
+            del index[key]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    lane_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_by_status ON orders (status, order_id);
+CREATE INDEX IF NOT EXISTS orders_by_lane ON orders (lane_id, order_id);
+CREATE INDEX IF NOT EXISTS orders_by_customer ON orders (customer_id, order_id);
+CREATE TABLE IF NOT EXISTS payments (
+    pay_session_id TEXT PRIMARY KEY,
+    order_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payments_by_status ON payments (status);
+CREATE TABLE IF NOT EXISTS order_events (
+    order_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (order_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checkins (customer_id TEXT PRIMARY KEY, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS lane_codes (lane_id TEXT PRIMARY KEY, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS customer_cards (customer_id TEXT PRIMARY KEY, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS order_claims (order_id TEXT PRIMARY KEY, cashier_id TEXT NOT NULL);
+"""
+
+# Statement text is constant so sqlite3's per-connection statement cache
+# prepares each one once and reuses it.
+_UPSERT_ORDER = "INSERT OR REPLACE INTO orders (order_id, customer_id, lane_id, status, body) VALUES (?, ?, ?, ?, ?)"
+_SELECT_ORDER = "SELECT body FROM orders WHERE order_id = ?"
+_SELECT_ORDERS = "SELECT body FROM orders"
+_DELETE_ORDER = "DELETE FROM orders WHERE order_id = ?"
+_COUNT_ORDERS = "SELECT status, COUNT(*) FROM orders GROUP BY status"
+# One statement picks the next seq and inserts it, so workers sharing the
+# file cannot hand out the same number.
+_APPEND_EVENT = (
+    "INSERT INTO order_events (order_id, seq, body) "
+    "SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM order_events WHERE order_id = ? RETURNING seq"
+)
+_TRIM_EVENTS = "DELETE FROM order_events WHERE order_id = ? AND seq <= ?"
+_SELECT_EVENTS = "SELECT seq, body FROM order_events WHERE order_id = ? AND seq > ? ORDER BY seq"
+_EVENT_RANGE = "SELECT MIN(seq), MAX(seq) FROM order_events WHERE order_id = ?"
+_DELETE_EVENTS = "DELETE FROM order_events WHERE order_id = ?"
+# Keeps an existing holder and returns whoever holds the order afterwards.
+_CLAIM_ORDER = (
+    "INSERT INTO order_claims (order_id, cashier_id) VALUES (?, ?) "
+    "ON CONFLICT (order_id) DO UPDATE SET cashier_id = order_claims.cashier_id RETURNING cashier_id"
+)
+_FORCE_CLAIM = "INSERT OR REPLACE INTO order_claims (order_id, cashier_id) VALUES (?, ?)"
+_DELETE_CLAIM = "DELETE FROM order_claims WHERE order_id = ?"
+_UPSERT_PAYMENT = "INSERT OR REPLACE INTO payments (pay_session_id, order_id, status, body) VALUES (?, ?, ?, ?)"
+_SELECT_PAYMENT = "SELECT body FROM payments WHERE pay_session_id = ?"
+_SELECT_PAYMENTS = "SELECT body FROM payments"
+_DELETE_PAYMENT = "DELETE FROM payments WHERE pay_session_id = ?"
+_COUNT_PAYMENTS = "SELECT status, COUNT(*) FROM payments GROUP BY status"
+_UPSERT_CHECKIN = "INSERT OR REPLACE INTO checkins (customer_id, body) VALUES (?, ?)"
+_SELECT_CHECKIN = "SELECT body FROM checkins WHERE customer_id = ?"
+_DELETE_CHECKIN = "DELETE FROM checkins WHERE customer_id = ?"
+_UPSERT_LANE_CODE = "INSERT OR REPLACE INTO lane_codes (lane_id, body) VALUES (?, ?)"
+_SELECT_LANE_CODE = "SELECT body FROM lane_codes WHERE lane_id = ?"
+_UPSERT_CARDS = "INSERT OR REPLACE INTO customer_cards (customer_id, body) VALUES (?, ?)"
+_SELECT_CARDS = "SELECT body FROM customer_cards WHERE customer_id = ?"
+
+
+def _encode(rec) -> str:
+    return json.dumps(rec)
+
+
+class SqliteStore(Store):
+    # WAL-mode SQLite on one reused connection. Writes are grouped: they are
+    # committed every `batch_size` statements or when flush() runs (main.py
+    # flushes on a short interval and at shutdown). Reads on the same
+    # connection see uncommitted writes, so a single worker is always consistent.
+    def __init__(self, path: str, batch_size: int = 256) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=64, isolation_level="DEFERRED")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def _write(self, sql: str, params: tuple) -> None:
+        self.conn.execute(sql, params)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def _one(self, sql: str, key: str):
+        row = self.conn.execute(sql, (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        d = self._one(_SELECT_ORDER, order_id)
+        return Order.from_dict(d) if d else None
+
+    def save_order(self, order: Order) -> None:
+        self._write(_UPSERT_ORDER, (order.order_id, order.customer_id, order.lane_id, order.status, _encode(order.to_dict())))
+
+    def delete_order(self, order_id: str) -> None:
+        self._write(_DELETE_ORDER, (order_id,))
+        self._write(_DELETE_EVENTS, (order_id,))
+        self._write(_DELETE_CLAIM, (order_id,))
+
+    def list_orders(self) -> List[Order]:
+        return [Order.from_dict(json.loads(row[0])) for row in self.conn.execute(_SELECT_ORDERS)]
+
+    def find_orders(self, statuses=None, lane_id=None, customer_id=None, limit=None, after=None) -> List[Order]:
+        where, params = [], []
+        if statuses is not None:
+            statuses = list(statuses)
+            if not statuses:
+                return []
+            where.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if lane_id is not None:
+            where.append("lane_id = ?")
+            params.append(lane_id)
+        if customer_id is not None:
+            where.append("customer_id = ?")
+            params.append(customer_id)
+        if after is not None:
+            where.append("order_id < ?")
+            params.append(after)
+        sql = _SELECT_ORDERS
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY order_id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [Order.from_dict(json.loads(row[0])) for row in self.conn.execute(sql, params)]
+
+    def count_orders_by_status(self) -> Dict[str, int]:
+        return dict(self.conn.execute(_COUNT_ORDERS).fetchall())
+
+    def claim_order(self, order_id: str, cashier_id: str, force: bool = False) -> bool:
+        if force:
+            self._write(_FORCE_CLAIM, (order_id, cashier_id))
+            return True
+        holder = self.conn.execute(_CLAIM_ORDER, (order_id, cashier_id)).fetchone()[0]
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+        return holder == cashier_id
+
+    def unclaim_order(self, order_id: str) -> None:
+        self._write(_DELETE_CLAIM, (order_id,))
+
+    def append_order_events(self, order_id: str, payloads: Iterable[dict]) -> List[dict]:
+        out = []
+        for payload in payloads:
+            seq = self.conn.execute(_APPEND_EVENT, (order_id, json.dumps(payload), order_id)).fetchone()[0]
+            out.append({**payload, "seq": seq})
+            self._pending += 1
+        if out and out[-1]["seq"] > ORDER_EVENT_RING:
+            self._write(_TRIM_EVENTS, (order_id, out[-1]["seq"] - ORDER_EVENT_RING))
+        elif self._pending >= self.batch_size:
+            self.flush()
+        return out
+
+    def order_events_since(self, order_id: str, since: int) -> Tuple[int, Optional[List[dict]]]:
+        first, last = self.conn.execute(_EVENT_RANGE, (order_id,)).fetchone()
+        last = last or 0
+        if since == last:
+            return last, []
+        if since > last or first > since + 1:
+            return last, None
+        return last, [{**json.loads(body), "seq": seq} for seq, body in self.conn.execute(_SELECT_EVENTS, (order_id, since))]
+
+    def get_payment(self, pay_session_id: str) -> Optional[PaymentSession]:
+        d = self._one(_SELECT_PAYMENT, pay_session_id)
+        return PaymentSession.from_dict(d) if d else None
+
+    def list_payments(self) -> List[PaymentSession]:
+        return [PaymentSession.from_dict(json.loads(row[0])) for row in self.conn.execute(_SELECT_PAYMENTS)]
+
+    def count_payments_by_status(self) -> Dict[str, int]:
+        return dict(self.conn.execute(_COUNT_PAYMENTS).fetchall())
+
+    def save_payment(self, payment: PaymentSession) -> None:
+        self._write(_UPSERT_PAYMENT, (payment.pay_session_id, payment.order_id, payment.status, _encode(payment.to_dict())))
+
+    def delete_payment(self, pay_session_id: str) -> None:
+        self._write(_DELETE_PAYMENT, (pay_session_id,))
+
+    def get_checkin(self, customer_id: str) -> Optional[Checkin]:
+        d = self._one(_SELECT_CHECKIN, customer_id)
+        return Checkin.from_dict(d) if d else None
+
+    def save_checkin(self, checkin: Checkin) -> None:
+        self._write(_UPSERT_CHECKIN, (checkin.customer_id, _encode(checkin.to_dict())))
+
+    def delete_checkin(self, customer_id: str) -> None:
+        self._write(_DELETE_CHECKIN, (customer_id,))
+
+    def get_lane_code(self, lane_id: str) -> Optional[LaneCode]:
+        d = self._one(_SELECT_LANE_CODE, lane_id)
+        return LaneCode.from_dict(d) if d else None
+
+    def save_lane_code(self, rec: LaneCode) -> None:
+        self._write(_UPSERT_LANE_CODE, (rec.lane_id, _encode(rec.to_dict())))
+
+    def get_cards(self, customer_id: str) -> Optional[List[dict]]:
+        return self._one(_SELECT_CARDS, customer_id)
+
+    def save_cards(self, customer_id: str, cards: List[dict]) -> None:
+        self._write(_UPSERT_CARDS, (customer_id, _encode(cards)))
+
+    def flush(self) -> None:
+        if self._pending:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+
+def _dumps_line(rec) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(rec) + b"\n"
+    return _encode(rec).encode() + b"\n"
+
+
+def _loads_line(line: bytes):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+class LogStore(MemoryStore):
+    # MemoryStore made durable by an append-only event log. Every save/delete
+    # appends one JSON line ({"e": kind, "k": key, "r": record}); flush() writes
+    # the batch and fsyncs it once (main.py flushes on a short interval), so
+    # a crash loses at most one interval. Once snapshot_every events have
+    # accumulated, a new log segment is started and the whole state is written
+    # to a snapshot in the same line format by a background thread, which
+    # then removes the older segments. Opening the directory replays the
+    # snapshot, then the segments after it.
+    def __init__(self, directory: str, snapshot_every: int = 50_000) -> None:
+        super().__init__()
+        self.dir = directory
+        self.snapshot_every = snapshot_every
+        self._buffer: List[bytes] = []
+        self._since_snapshot = 0
+        self._snapshot_thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+        # Replay only allocates, so the cyclic GC would rescan the growing
+        # heap over and over without ever finding garbage.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.segment = self._recover()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self._log = open(self._segment_path(self.segment), "ab")
+
+    def _segment_path(self, n: int) -> str:
+        return os.path.join(self.dir, f"log-{n:06d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(int(name[4:10]) for name in os.listdir(self.dir) if name.startswith("log-") and name.endswith(".log"))
+
+    # Recovery
+    def _recover(self) -> int:
+        first = 0
+        snapshot = os.path.join(self.dir, "snapshot.log")
+        if os.path.exists(snapshot):
+            with open(snapshot, "rb") as f:
+                first = _loads_line(f.readline())["log"]
+                for line in f:
+                    event = _loads_line(line)
+                    kind = event["e"]
+                    if kind == "order":
+                        self._load_order(Order.restore(event["r"]))
+                    elif kind == "payment":
+                        MemoryStore.save_payment(self, PaymentSession.restore(event["r"]))
+                    else:
+                        self._apply(event)
+        segments = [n for n in self._segments() if n >= first]
+        for n in segments:
+            good = 0
+            with open(self._segment_path(n), "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError
+                        event = _loads_line(line)
+                    except ValueError:
+                        break
+                    self._apply(event)
+                    self._since_snapshot += 1
+                    good += len(line)
+            if good < os.path.getsize(self._segment_path(n)):
+                os.truncate(self._segment_path(n), good)  # torn write from a crash mid-flush
+        return segments[-1] if segments else first
+
+    def _load_order(self, order: Order) -> None:
+        # Snapshot fast path: orders are written in id order and each appears
+        # once, so indexing needs no lookups of previous keys or bisects.
+        order_id = order.order_id
+        keys = (order.status, order.lane_id, order.customer_id)
+        self.orders[order_id] = order
+        self._order_ids.append(order_id)
+        self._index_keys[order_id] = keys
+        for index, key in zip((self.by_status, self.by_lane, self.by_customer), keys):
+            ids = index.get(key)
+            if ids is None:
+                ids = index[key] = []
+            ids.append(order_id)
+
+    def _apply(self, event: dict) -> None:
+        kind, key, rec = event["e"], event.get("k"), event.get("r")
+        if kind == "order":
+            MemoryStore.save_order(self, Order.restore(rec))
+        elif kind == "order_delete":
+            MemoryStore.delete_order(self, key)
+        elif kind == "payment":
+            MemoryStore.save_payment(self, PaymentSession.restore(rec))
+        elif kind == "payment_delete":
+            MemoryStore.delete_payment(self, key)
+        elif kind == "checkin":
+            MemoryStore.save_checkin(self, Checkin.from_dict(rec))
+        elif kind == "checkin_delete":
+            MemoryStore.delete_checkin(self, key)
+        elif kind == "lane_code":
+            MemoryStore.save_lane_code(self, LaneCode.from_dict(rec))
+        elif kind == "cards":
+            MemoryStore.save_cards(self, key, rec)
+        elif kind == "order_seq":
+            self.order_seq[key] = rec
+
+    # Logging writes
+    def _append(self, kind: str, key: Optional[str] = None, rec=None) -> None:
+        event = {"e": kind}
+        if key is not None:
+            event["k"] = key
+        if rec is not None:
+            event["r"] = rec
+        self._buffer.append(_dumps_line(event))
+
+    def save_order(self, order: Order) -> None:
+        super().save_order(order)
+        self._append("order", rec=order.to_dict())
+
+    def delete_order(self, order_id: str) -> None:
+        super().delete_order(order_id)
+        self._append("order_delete", order_id)
+
+    def append_order_events(self, order_id: str, payloads: Iterable[dict]) -> List[dict]:
+        # Only the last seq is logged, not the events: after a restart the
+        # ring is empty, so a ?since= cursor from before it either matches
+        # the last seq or forces a full sync, never a replay of the wrong gap.
+        out = super().append_order_events(order_id, payloads)
+        if out:
+            self._append("order_seq", order_id, out[-1]["seq"])
+        return out
+
+    def save_payment(self, payment: PaymentSession) -> None:
+        super().save_payment(payment)
+        self._append("payment", rec=payment.to_dict())
+
+    def delete_payment(self, pay_session_id: str) -> None:
+        super().delete_payment(pay_session_id)
+        self._append("payment_delete", pay_session_id)
+
+    def save_checkin(self, checkin: Checkin) -> None:
+        super().save_checkin(checkin)
+        self._append("checkin", rec=checkin.to_dict())
+
+    def delete_checkin(self, customer_id: str) -> None:
+        super().delete_checkin(customer_id)
+        self._append("checkin_delete", customer_id)
+
+    def save_lane_code(self, rec: LaneCode) -> None:
+        super().save_lane_code(rec)
+        self._append("lane_code", rec=rec.to_dict())
+
+    def save_cards(self, customer_id: str, cards: List[dict]) -> None:
+        super().save_cards(customer_id, cards)
+        self._append("cards", customer_id, cards)
+
+    # Group commit and snapshots
+    def _commit(self) -> None:
+        if self._buffer:
+            self._log.write(b"".join(self._buffer))
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._since_snapshot += len(self._buffer)
+            self._buffer = []
+
+    def flush(self) -> None:
+        self._commit()
+        if self._since_snapshot >= self.snapshot_every and not self._snapshotting():
+            # Off the event loop: at 100k orders encoding and fsyncing a
+            # snapshot takes about half a second.
+            self._snapshot_thread = threading.Thread(target=self._write_snapshot, args=self._rotate(), daemon=True)
+            self._snapshot_thread.start()
+
+    def snapshot(self) -> None:
+        self._wait_snapshot()
+        self._write_snapshot(*self._rotate())
+
+    def _snapshotting(self) -> bool:
+        return self._snapshot_thread is not None and self._snapshot_thread.is_alive()
+
+    def _wait_snapshot(self) -> None:
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+
+    def _rotate(self) -> tuple:
+        # Starts a new segment and takes the record lists for the snapshot.
+        # Records may still change while they are encoded; every change from
+        # here on is also in the new segment, which replay applies on top.
+        self._commit()
+        self._log.close()
+        self.segment += 1
+        self._log = open(self._segment_path(self.segment), "ab")
+        self._since_snapshot = 0
+        return (
+            self.segment, [self.orders[i] for i in self._order_ids], list(self.payments.values()),
+            list(self.checkins.values()), list(self.lane_codes.values()), list(self.customer_cards.items()),
+            list(self.order_seq.items()),
+        )
+
+    def _write_snapshot(self, segment: int, orders, payments, checkins, lane_codes, cards, seqs) -> None:
+        path = os.path.join(self.dir, "snapshot.log")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_dumps_line({"log": segment}))
+            lines = []
+            lines.extend(_dumps_line({"e": "order", "r": o.to_dict()}) for o in orders)
+            lines.extend(_dumps_line({"e": "payment", "r": p.to_dict()}) for p in payments)
+            lines.extend(_dumps_line({"e": "checkin", "r": c.to_dict()}) for c in checkins)
+            lines.extend(_dumps_line({"e": "lane_code", "r": r.to_dict()}) for r in lane_codes)
+            lines.extend(_dumps_line({"e": "cards", "k": k, "r": v}) for k, v in cards)
+            lines.extend(_dumps_line({"e": "order_seq", "k": k, "r": v}) for k, v in seqs)
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        for n in self._segments():
+            if n < segment:
+                os.remove(self._segment_path(n))
+
+    def close(self) -> None:
+        self._wait_snapshot()
+        self._commit()
+        self._log.close()
+
+
+def create_store(url: str) -> Store:
+    # "memory" (default), "sqlite:///path/to/file.db[?batch_size=N]" or
+    # "log:///path/to/dir[?snapshot_every=N]". With several workers sharing
+    # a SQLite file use batch_size=1, so every write is committed (and
+    # visible to the other workers) before the request returns.
+    url = (url or "memory").strip()
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        path, _, query = url[len("sqlite:///"):].partition("?")
+        params = dict(parse_qsl(query))
+        return SqliteStore(path, batch_size=int(params.get("batch_size", 256)))
+    if url.startswith("log:///"):
+        path, _, query = url[len("log:///"):].partition("?")
+        params = dict(parse_qsl(query))
+        return LogStore(path, snapshot_every=int(params.get("snapshot_every", 50_000)))
+    raise ValueError(f"unsupported STORE_URL: {url}")
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+
+from . import dispatch, state, timers
+from .helpers import expire_payment, rotate_lane_code, publish_order, COMPLETED_STATUSES
+from .records import OrderStatus, PaymentStatus
+
+# Background expiry driven by timers.wheel. Timers are armed where records
+# change (rotate_lane_code, confirm_total, checkin, publish_order); each
+# handler re-reads the record, so a timer that went stale is harmless.
+
+log = logging.getLogger(__name__)
+
+async def _expire_payment(pay_session_id: str) -> None:
+    s = state.store.get_payment(pay_session_id)
+    if not s:
+        return
+    if s.status == PaymentStatus.PENDING:
+        if time.time() < s.expires_at:
+            timers.wheel.schedule("payment", pay_session_id, s.expires_at)
+            return
+        await expire_payment(s)
+        return
+    timers.wheel.schedule("payment_evict", pay_session_id, timers.after(timers.ORDER_RETENTION))
+
+async def _evict_payment(pay_session_id: str) -> None:
+    state.store.delete_payment(pay_session_id)
+
+async def _rotate_lane(lane_id: str) -> None:
+    rec = state.store.get_lane_code(lane_id)
+    if rec and time.time() < rec.expires_at:
+        timers.wheel.schedule("lane", lane_id, rec.expires_at)
+        return
+    rotate_lane_code(lane_id)
+
+async def _evict_order(order_id: str) -> None:
+    o = state.store.get_order(order_id)
+    if not o:
+        return
+    state.store.delete_order(order_id)
+    await publish_order(o, "remove")
+
+async def _evict_checkin(customer_id: str) -> None:
+    state.store.delete_checkin(customer_id)
+
+async def _expire_desk(cashier_id: str) -> None:
+    dispatch.scheduler.expire_desk(cashier_id)
+
+HANDLERS = {
+    "payment": _expire_payment,
+    "payment_evict": _evict_payment,
+    "lane": _rotate_lane,
+    "order": _evict_order,
+    "checkin": _evict_checkin,
+    "cashier_offline": _expire_desk,
+}
+
+def rearm_timers() -> None:
+    # The wheel starts empty; after a restart with a persistent store, arm
+    # timers for what was recovered, and queue orders still waiting for a
+    # cashier (their old holders went with the restart). Retention and
+    # waiting count from now. Runs in one worker only (main.py).
+    for o in state.store.list_orders():
+        retention = timers.ORDER_RETENTION if o.status in COMPLETED_STATUSES else timers.STALE_ORDER_RETENTION
+        timers.wheel.schedule("order", o.order_id, timers.after(retention))
+        if o.status == OrderStatus.CONNECTED_WAITING_CASHIER:
+            state.store.unclaim_order(o.order_id)
+            dispatch.scheduler.enqueue(o.order_id, o.lane_id)
+    for s in state.store.list_payments():
+        if s.status == PaymentStatus.PENDING:
+            timers.wheel.schedule("payment", s.pay_session_id, s.expires_at)
+        else:
+            timers.wheel.schedule("payment_evict", s.pay_session_id, timers.after(timers.ORDER_RETENTION))
+
+async def run_sweeper() -> None:
+    while True:
+        await asyncio.sleep(timers.wheel.tick)
+        for kind, key in timers.wheel.advance(time.time()):
+            try:
+                await HANDLERS[kind](key)
+            except Exception:
+                log.exception("sweeper: %s %s failed", kind, key)
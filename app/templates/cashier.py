@@ -415,6 +415,72 @@ CASHIER_HTML = r"""
 
 <script>
 const WS_PROTO = location.protocol === "https:" ? "wss" : "ws";
+// The server may send several events as one {type:"batch", events:[...]} frame.
+const messages = (ev) => { const msg = JSON.parse(ev.data); return msg.type === "batch" ? msg.events : [msg]; };
+
+// One multiplexed socket (/ws/mux) carries all of this page's channels.
+// mux.open(channel, params) returns a WebSocket-like object (onopen,
+// onmessage, onclose, send, close, readyState) for one subscription. Every
+// channel stays open until closed: when the socket drops, each one gets
+// onclose({reopening: true}) and is subscribed again on reconnect, those
+// opened with a `since` param resuming after the last event they saw. An
+// onclose without `reopening` means the server ended the subscription.
+class Mux {
+  constructor(query){
+    this.url = `${WS_PROTO}://${location.host}/ws/mux?${query}`;
+    this.subs = new Map();   // Mux.key(channel, order_id) -> subscription
+    this.connect();
+  }
+  connect(){
+    this.ws = new WebSocket(this.url);
+    this.ws.onopen = () => this.subs.forEach((sub) => this.ws.send(JSON.stringify(sub.request())));
+    this.ws.onmessage = (ev) => {
+      const msg = JSON.parse(ev.data);
+      const sub = this.subs.get(Mux.key(msg.channel, msg.order_id));
+      if (!sub) return;
+      if (msg.type === "subscribed") { sub.readyState = 1; sub.onopen?.(); return; }
+      if (msg.type === "unsubscribed") { this.drop(sub); return; }
+      const last = msg.type === "batch" ? msg.events[msg.events.length - 1] : msg;
+      if (last?.seq != null && "since" in sub.params) sub.params.since = last.seq;
+      sub.onmessage?.({ data: ev.data });
+    };
+    this.ws.onclose = (ev) => {
+      const code = ev.code === 1000 ? 1006 : ev.code;
+      this.subs.forEach((sub) => { sub.readyState = 0; sub.onclose?.({ code, reopening: true }); });
+      setTimeout(() => this.connect(), 1000);
+    };
+  }
+  static key(channel, orderId){
+    // order_id names order and call channels only; home and feed frames
+    // (payment_request, order_assigned, ...) carry an order_id of their own.
+    return (channel === "order" || channel === "call") ? `${channel}|${orderId}` : channel;
+  }
+  drop(sub){
+    if (this.subs.get(sub.key) === sub) this.subs.delete(sub.key);
+    sub.readyState = 3;
+    sub.onclose?.({ code: 1000 });
+  }
+  open(channel, params = {}){
+    const tag = { channel, order_id: params.order_id };
+    const sub = {
+      key: Mux.key(channel, params.order_id),
+      params: { ...params },
+      request: () => ({ type: "subscribe", channel, ...sub.params }),
+      readyState: 0, onopen: null, onmessage: null, onclose: null, onerror: null,
+      send: (text) => { if (sub.readyState === 1) this.ws.send(JSON.stringify({ ...JSON.parse(text), ...tag })); },
+      close: () => {
+        if (this.subs.get(sub.key) === sub){
+          this.subs.delete(sub.key);
+          if (this.ws.readyState === 1) this.ws.send(JSON.stringify({ type: "unsubscribe", ...tag }));
+        }
+        sub.readyState = 3;
+      },
+    };
+    this.subs.set(sub.key, sub);
+    if (this.ws.readyState === 1) this.ws.send(JSON.stringify(sub.request()));
+    return sub;
+  }
+}
 
 const wsStateEl = document.getElementById("wsState");
 const wsDot = document.getElementById("wsDot");
@@ -497,7 +563,12 @@ function escapeHtml(s){
 }
 
 // Ephemeral cashier id
-const cashierId = "cashier_" + (crypto.randomUUID ? crypto.randomUUID().slice(0,8) : Math.random().toString(36).slice(2,10));
+// Kept for the tab's lifetime so a reload gets this cashier's assigned orders back.
+const cashierId = sessionStorage.getItem("cashierId") || "cashier_" + (crypto.randomUUID ? crypto.randomUUID().slice(0,8) : Math.random().toString(36).slice(2,10));
+sessionStorage.setItem("cashierId", cashierId);
+// /cashier?lanes=L1,L2 prefers orders from those lanes
+const cashierLanes = new URLSearchParams(location.search).get("lanes") || "";
+const mux = new Mux(`cashier_id=${encodeURIComponent(cashierId)}`);
 document.getElementById("cashier").textContent = cashierId;
 
 let orderWs = null;
@@ -505,34 +576,95 @@ let callSigWs = null;
 let pc = null;
 let currentOrderId = null;
 
-async function refreshOrders(){
-  const res = await fetch("/cashier/orders");
-  const data = await res.json();
-
-  orderSelect.innerHTML = "";
-  (data.orders || []).forEach(o => {
-    const opt = document.createElement("option");
+/* --------------------
+   Live order list (/ws/cashier): one snapshot on connect, then a delta
+   per order change, applied in place.
+---------------------*/
+let feedWs = null;
+const orderOptions = new Map();   // order_id -> <option>
+const emptyOpt = document.createElement("option");
+emptyOpt.value = "";
+emptyOpt.textContent = "No orders yet";
+
+function upsertOrderOption(o, isNew){
+  let opt = orderOptions.get(o.order_id);
+  if (!opt){
+    opt = document.createElement("option");
     opt.value = o.order_id;
-    opt.textContent = `Order ${o.order_id} | lane=${o.lane_id} | status=${o.status} | total=$${(o.total_cents/100).toFixed(2)}`;
-    opt.dataset.lane = o.lane_id ?? "";
-    opt.dataset.status = o.status ?? "";
-    opt.dataset.total = o.total_cents ?? 0;
-    orderSelect.appendChild(opt);
-  });
-
-  if (!data.orders?.length){
-    const opt = document.createElement("option");
-    opt.value = "";
-    opt.textContent = "No orders yet";
-    orderSelect.appendChild(opt);
+    orderOptions.set(o.order_id, opt);
+    if (isNew) orderSelect.insertBefore(opt, orderSelect.firstChild);
+    else orderSelect.appendChild(opt);
   }
+  const cents = o.total_cents || 0;
+  opt.textContent = `${opt.dataset.assigned ? "★ " : ""}Order ${o.order_id} | lane=${o.lane_id} | status=${o.status} | total=$${(cents/100).toFixed(2)}`;
+  opt.dataset.lane = o.lane_id ?? "";
+  opt.dataset.status = o.status ?? "";
+  opt.dataset.total = cents;
+}
+
+function removeOrderOption(oid){
+  const opt = orderOptions.get(oid);
+  if (!opt) return;
+  opt.remove();
+  orderOptions.delete(oid);
+}
+
+function syncEmptyOption(){
+  if (orderOptions.size && emptyOpt.parentNode) emptyOpt.remove();
+  if (!orderOptions.size && !emptyOpt.parentNode) orderSelect.appendChild(emptyOpt);
+}
 
+function applySnapshot(orders){
+  const selected = orderSelect.value;
+  orderSelect.innerHTML = "";
+  orderOptions.clear();
+  (orders || []).forEach(o => upsertOrderOption(o, false));
+  if (orderOptions.has(selected)) orderSelect.value = selected;
+  syncEmptyOption();
   updateSummaryFromSelected();
 
   // ✅ progress
   setStepDone("refresh", "Click Refresh, select an order, and then click ‘Join”.");
 }
-refreshOrders();
+
+function applyDelta(msg){
+  if (msg.op === "remove") removeOrderOption(msg.order.order_id);
+  else upsertOrderOption(msg.order, msg.op === "add");
+  syncEmptyOption();
+  if (orderSelect.value === msg.order.order_id || !orderSelect.value) updateSummaryFromSelected();
+}
+
+function applyAssignment(msg){
+  // The scheduler handed this cashier an order: select it unless busy in another.
+  const opt = orderOptions.get(msg.order_id);
+  if (opt && !opt.dataset.assigned){
+    opt.dataset.assigned = "1";
+    opt.textContent = "★ " + opt.textContent;
+  }
+  log(`Assigned order ${msg.order_id} (lane ${msg.lane_id})`);
+  if (!currentOrderId && opt){
+    orderSelect.value = msg.order_id;
+    updateSummaryFromSelected();
+  }
+}
+
+function connectFeed(){
+  feedWs = mux.open("feed", { lanes: cashierLanes });
+  feedWs.onopen = () => log("Order feed connected");
+  feedWs.onclose = (ev) => { log("Order feed closed, reconnecting…"); if (!ev.reopening) setTimeout(connectFeed, 2000); };
+  feedWs.onmessage = (ev) => {
+    const msg = JSON.parse(ev.data);
+    if (msg.type === "orders_snapshot") applySnapshot(msg.orders);
+    if (msg.type === "order_delta") applyDelta(msg);
+    if (msg.type === "order_assigned") applyAssignment(msg);
+  };
+}
+
+function refreshOrders(){
+  // A closed feed reconnects by itself and gets a fresh snapshot then.
+  if (feedWs?.readyState === 1) feedWs.send(JSON.stringify({ type:"snapshot" }));
+}
+connectFeed();
 
 orderSelect.addEventListener("change", updateSummaryFromSelected);
 
@@ -557,7 +689,6 @@ function joinSelected(){
 }
 
 function joinOrder(oid){
-  if (orderWs) { try { orderWs.close(); } catch(e){} }
   if (callSigWs) { try { callSigWs.close(); } catch(e){} }
   cleanupCallUI(true);
 
@@ -566,47 +697,14 @@ function joinOrder(oid){
   // ✅ progress
   setStepDone("join", "Connected. Confirm total to send payment.");
 
-  chatEl.innerHTML = "";
   joinedPill.textContent = `Joined: ${oid}`;
-  setWsState("WS: connecting…", "warn");
   log(`Joining order ${oid}...`);
-
-  // Order chat WS
-  orderWs = new WebSocket(`${WS_PROTO}://${location.host}/ws/order/${oid}/cashier?cashier_id=${encodeURIComponent(cashierId)}`);
-
-  orderWs.onopen = () => { setWsState("WS: connected", "good"); log("Order WS connected"); };
-  orderWs.onerror = () => { setWsState("WS: error", "bad"); log("Order WS error"); };
-  orderWs.onclose = () => { setWsState("WS: closed", "bad"); log("Order WS closed"); };
-
-  orderWs.onmessage = (ev) => {
-    const msg = JSON.parse(ev.data);
-
-    if (msg.type === "chat") bubble(msg.from, msg.text);
-
-    if (msg.type === "order_state") {
-      statusLine.textContent = msg.status || "—";
-      sumStatus.textContent = msg.status || "—";
-      if (msg.lane_id != null) sumLane.textContent = msg.lane_id;
-
-      if (msg.items_text != null) document.getElementById("items").value = msg.items_text;
-      if (msg.total_cents != null){
-        document.getElementById("total").value = (msg.total_cents/100).toFixed(2);
-        sumTotal.textContent = `$${(msg.total_cents/100).toFixed(2)}`;
-      }
-      log(JSON.stringify(msg));
-    }
-
-    if (msg.type === "payment_status") {
-      statusLine.textContent = `PAYMENT: ${msg.status} (${msg.payment_method || "n/a"})`;
-      bubble("SYSTEM", `Payment ${msg.status}. Method: ${msg.payment_method || "n/a"}`);
-      log(JSON.stringify(msg));
-    }
-  };
+  connectOrderWs(oid);
 
   // Call signaling WS
-  callSigWs = new WebSocket(`${WS_PROTO}://${location.host}/ws/call/${oid}/cashier`);
+  callSigWs = mux.open("call", { order_id: oid });
   callSigWs.onopen = () => log("Call signaling WS connected");
-  callSigWs.onclose = () => log("Call signaling WS closed");
+  callSigWs.onclose = (ev) => log(ev.reopening ? "Call signaling WS dropped, reconnecting…" : "Call signaling WS closed");
   callSigWs.onerror = () => log("Call signaling WS error");
 
   callSigWs.onmessage = async (ev) => {
@@ -643,6 +741,45 @@ function joinOrder(oid){
   };
 }
 
+function connectOrderWs(oid){
+  if (orderWs) { orderWs.onclose = null; try { orderWs.close(); } catch(e){} }
+  chatEl.innerHTML = "";
+  setWsState("WS: connecting…", "warn");
+
+  // since: after a dropped socket the mux resubscribes and replays only what was missed.
+  orderWs = mux.open("order", { order_id: oid, since: null });
+
+  orderWs.onopen = () => { setWsState("WS: connected", "good"); log("Order WS connected"); };
+  orderWs.onerror = () => { setWsState("WS: error", "bad"); log("Order WS error"); };
+  orderWs.onclose = (ev) => {
+    if (ev.reopening) { setWsState("WS: reconnecting…", "warn"); log("Order WS dropped, reconnecting…"); return; }
+    setWsState("WS: closed", "bad"); log("Order WS closed");
+  };
+
+  orderWs.onmessage = (ev) => messages(ev).forEach((msg) => {
+    if (msg.type === "chat") bubble(msg.from, msg.text);
+
+    if (msg.type === "order_state") {
+      statusLine.textContent = msg.status || "—";
+      sumStatus.textContent = msg.status || "—";
+      if (msg.lane_id != null) sumLane.textContent = msg.lane_id;
+
+      if (msg.items_text != null) document.getElementById("items").value = msg.items_text;
+      if (msg.total_cents != null){
+        document.getElementById("total").value = (msg.total_cents/100).toFixed(2);
+        sumTotal.textContent = `$${(msg.total_cents/100).toFixed(2)}`;
+      }
+      log(JSON.stringify(msg));
+    }
+
+    if (msg.type === "payment_status") {
+      statusLine.textContent = `PAYMENT: ${msg.status} (${msg.payment_method || "n/a"})`;
+      bubble("SYSTEM", `Payment ${msg.status}. Method: ${msg.payment_method || "n/a"}`);
+      log(JSON.stringify(msg));
+    }
+  });
+}
+
 function sendCashierMsg(){
   if (!orderWs || !currentOrderId) return;
   const inp = document.getElementById("cashierMsg");
@@ -687,8 +824,6 @@ async function confirmTotal(){
 
   // ✅ progress
   setStepDone("pay", "Payment request sent. Wait for customer approval.");
-
-  refreshOrders();
 }
 
 /* --------------------
@@ -542,7 +542,7 @@ CUSTOMER_HTML = r"""
                   <button class="btn btnOk btnWide" onclick="connect()">Connect</button>
                 </div>
               </div>
-              <div class="help">Lane display: <span class="mono">/lane/L1</span> or <span class="mono">/lane/L2</span> (code valid 10 minutes; rotates after successful connect)</div>
+              <div class="help">Lane display: <span class="mono" id="laneHint">/lane/L1</span> (code valid 10 minutes; rotates after successful connect)</div>
             </div>
           </div>
 
@@ -647,6 +647,72 @@ CUSTOMER_HTML = r"""
 
 <script>
 const WS_PROTO = location.protocol === "https:" ? "wss" : "ws";
+// The server may send several events as one {type:"batch", events:[...]} frame.
+const messages = (ev) => { const msg = JSON.parse(ev.data); return msg.type === "batch" ? msg.events : [msg]; };
+
+// One multiplexed socket (/ws/mux) carries all of this page's channels.
+// mux.open(channel, params) returns a WebSocket-like object (onopen,
+// onmessage, onclose, send, close, readyState) for one subscription. Every
+// channel stays open until closed: when the socket drops, each one gets
+// onclose({reopening: true}) and is subscribed again on reconnect, those
+// opened with a `since` param resuming after the last event they saw. An
+// onclose without `reopening` means the server ended the subscription.
+class Mux {
+  constructor(query){
+    this.url = `${WS_PROTO}://${location.host}/ws/mux?${query}`;
+    this.subs = new Map();   // Mux.key(channel, order_id) -> subscription
+    this.connect();
+  }
+  connect(){
+    this.ws = new WebSocket(this.url);
+    this.ws.onopen = () => this.subs.forEach((sub) => this.ws.send(JSON.stringify(sub.request())));
+    this.ws.onmessage = (ev) => {
+      const msg = JSON.parse(ev.data);
+      const sub = this.subs.get(Mux.key(msg.channel, msg.order_id));
+      if (!sub) return;
+      if (msg.type === "subscribed") { sub.readyState = 1; sub.onopen?.(); return; }
+      if (msg.type === "unsubscribed") { this.drop(sub); return; }
+      const last = msg.type === "batch" ? msg.events[msg.events.length - 1] : msg;
+      if (last?.seq != null && "since" in sub.params) sub.params.since = last.seq;
+      sub.onmessage?.({ data: ev.data });
+    };
+    this.ws.onclose = (ev) => {
+      const code = ev.code === 1000 ? 1006 : ev.code;
+      this.subs.forEach((sub) => { sub.readyState = 0; sub.onclose?.({ code, reopening: true }); });
+      setTimeout(() => this.connect(), 1000);
+    };
+  }
+  static key(channel, orderId){
+    // order_id names order and call channels only; home and feed frames
+    // (payment_request, order_assigned, ...) carry an order_id of their own.
+    return (channel === "order" || channel === "call") ? `${channel}|${orderId}` : channel;
+  }
+  drop(sub){
+    if (this.subs.get(sub.key) === sub) this.subs.delete(sub.key);
+    sub.readyState = 3;
+    sub.onclose?.({ code: 1000 });
+  }
+  open(channel, params = {}){
+    const tag = { channel, order_id: params.order_id };
+    const sub = {
+      key: Mux.key(channel, params.order_id),
+      params: { ...params },
+      request: () => ({ type: "subscribe", channel, ...sub.params }),
+      readyState: 0, onopen: null, onmessage: null, onclose: null, onerror: null,
+      send: (text) => { if (sub.readyState === 1) this.ws.send(JSON.stringify({ ...JSON.parse(text), ...tag })); },
+      close: () => {
+        if (this.subs.get(sub.key) === sub){
+          this.subs.delete(sub.key);
+          if (this.ws.readyState === 1) this.ws.send(JSON.stringify({ type: "unsubscribe", ...tag }));
+        }
+        sub.readyState = 3;
+      },
+    };
+    this.subs.set(sub.key, sub);
+    if (this.ws.readyState === 1) this.ws.send(JSON.stringify(sub.request()));
+    return sub;
+  }
+}
 
 const custEl = document.getElementById("cust");
 const wsStateEl = document.getElementById("wsState");
@@ -791,8 +857,11 @@ let pc = null;         // RTCPeerConnection
 let currentOrderId = null;
 let paySessionId = null;
 
-// Connect “home” websocket (push notifications like payment requests)
-homeWs = new WebSocket(`${WS_PROTO}://${location.host}/ws/customer/${customerId}`);
+const mux = new Mux(`customer_id=${encodeURIComponent(customerId)}`);
+
+// “Home” channel (push notifications like payment requests)
+function connectHome(){
+homeWs = mux.open("home");
 
 homeWs.onopen = () => {
   wsStateEl.textContent = "WS: connected";
@@ -807,10 +876,10 @@ homeWs.onerror = () => {
   wsDot.classList.remove("ok");
   toast("WebSocket error.");
 };
-homeWs.onclose = () => {
-  wsStateEl.textContent = "WS: closed";
+homeWs.onclose = (ev) => {
+  wsStateEl.textContent = "WS: reconnecting…";
   wsDot.classList.remove("ok","err");
-  toast("Disconnected. Refresh.");
+  if (!ev.reopening) setTimeout(connectHome, 1500);
 };
 
 homeWs.onmessage = (ev) => {
@@ -823,6 +892,19 @@ homeWs.onmessage = (ev) => {
     renderPaymentUI(msg);
   }
 };
+}
+connectHome();
+
+// Lanes from the server's registry; the two options in the markup are the default deployment.
+const laneSelect = document.getElementById("lane");
+const laneHint = document.getElementById("laneHint");
+laneSelect.onchange = () => { laneHint.textContent = `/lane/${laneSelect.value}`; };
+fetch("/lanes").then(r => r.json()).then(data => {
+  const keys = data.stores.flatMap(s => s.lanes.map(key => [key, data.stores.length > 1 ? `${s.name} · ${key}` : `Lane ${key}`]));
+  if (!keys.length) return;
+  laneSelect.replaceChildren(...keys.map(([key, label]) => new Option(label, key)));
+  laneSelect.onchange();
+}).catch(() => {});
 
 async function checkIn(){
   clearBanners();
@@ -871,14 +953,14 @@ function joinOrderWs(orderId){
   if (orderWs) { try { orderWs.close(); } catch(e){} }
   chatEl.innerHTML = "";
 
-  orderWs = new WebSocket(`${WS_PROTO}://${location.host}/ws/order/${orderId}/customer?customer_id=${encodeURIComponent(customerId)}`);
+  // since: after a dropped socket the mux resubscribes and replays only what was missed.
+  orderWs = mux.open("order", { order_id: orderId, since: null });
 
-  orderWs.onopen = () => chat("SYSTEM","Connected. Place your order.");
+  let greeted = false;
+  orderWs.onopen = () => { if (!greeted) chat("SYSTEM","Connected. Place your order."); greeted = true; };
   orderWs.onerror = () => showError("Order connection error. Try reconnecting.");
 
-  orderWs.onmessage = (ev) => {
-    const msg = JSON.parse(ev.data);
-
+  orderWs.onmessage = (ev) => messages(ev).forEach((msg) => {
     if (msg.type === "chat") chat(msg.from, msg.text);
     if (msg.type === "order_state") statusEl.textContent = msg.status || statusEl.textContent;
 
@@ -886,7 +968,7 @@ function joinOrderWs(orderId){
       statusEl.textContent = "PAYMENT: " + msg.status;
       chat("SYSTEM", `Payment ${msg.status}. Method: ${msg.payment_method || "n/a"}`);
     }
-  };
+  });
 }
 
 function sendText(){
@@ -906,7 +988,7 @@ function joinCallWs(orderId){
   if (callSigWs) { try { callSigWs.close(); } catch(e){} }
   cleanupCallUI();
 
-  callSigWs = new WebSocket(`${WS_PROTO}://${location.host}/ws/call/${orderId}/customer`);
+  callSigWs = mux.open("call", { order_id: orderId });
 
   callSigWs.onopen = () => chat("SYSTEM", "Call channel ready.");
   callSigWs.onerror = () => chat("SYSTEM", "❌ Call channel error.");
@@ -1077,18 +1159,28 @@ async function payNew(){
 
 async function payWallet(mode){ await doPay({ mode }); }
 
+// Same key for the same request, so a double tap or retry is answered once
+const idemKeys = {};
+function idemKey(request){
+  return idemKeys[request] || (idemKeys[request] = Date.now().toString(36) + Math.random().toString(36).slice(2));
+}
+
 async function declinePay(){
-  const res = await fetch(`/payment/${paySessionId}/decline`, { method:"POST" });
+  const res = await fetch(`/payment/${paySessionId}/decline`, {
+    method:"POST",
+    headers:{"Idempotency-Key": idemKey(`${paySessionId}/decline`)}
+  });
   const data = await res.json();
   if (data.error) return showError(data.error);
   toast("Declined: " + data.status);
 }
 
 async function doPay(payload){
+  const body = JSON.stringify({ customer_id: customerId, ...payload });
   const res = await fetch(`/payment/${paySessionId}/pay`, {
     method:"POST",
-    headers:{"Content-Type":"application/json"},
-    body: JSON.stringify({ customer_id: customerId, ...payload })
+    headers:{"Content-Type":"application/json", "Idempotency-Key": idemKey(`${paySessionId}/pay ${body}`)},
+    body
   });
   const data = await res.json();
   if (data.error) return showError(data.error);
@@ -24,22 +24,41 @@ HOME_HTML = """
     *{ box-sizing:border-box; margin:0; padding:0; }
     html, body{ height:100%; font-family: ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Arial, sans-serif; }
 
+    /* Backgrounds: hashed AVIF/WebP/JPEG variants (see app/assets.py);
+       the plain url() line is the fallback for browsers without image-set() */
     body{
       background-color:#0b1220;
       background-image:
         linear-gradient(rgba(0,0,0,0.12), rgba(0,0,0,0.24)),
-        url('/static/BG-desktop.png');
+        __IMAGE_URL(BG-desktop@1536)__;
+      background-image:
+        linear-gradient(rgba(0,0,0,0.12), rgba(0,0,0,0.24)),
+        __IMAGE_SET(BG-desktop@1536)__;
       background-repeat:no-repeat;
       background-size: contain;
       background-position: center center;
     }
 
+    @media (max-width: 1100px){
+      body{
+        background-image:
+          linear-gradient(rgba(0,0,0,0.12), rgba(0,0,0,0.24)),
+          __IMAGE_URL(BG-desktop@1024)__;
+        background-image:
+          linear-gradient(rgba(0,0,0,0.12), rgba(0,0,0,0.24)),
+          __IMAGE_SET(BG-desktop@1024)__;
+      }
+    }
+
     /* Mobile background */
     @media (max-width: 768px){
       body{
         background-image:
           linear-gradient(rgba(0,0,0,0.14), rgba(0,0,0,0.30)),
-          url('/static/BG-mobile.png');
+          __IMAGE_URL(BG-mobile@722)__;
+        background-image:
+          linear-gradient(rgba(0,0,0,0.14), rgba(0,0,0,0.30)),
+          __IMAGE_SET(BG-mobile@722)__;
         background-size: contain;
         background-position: center top;
       }
@@ -472,8 +472,8 @@ LANE_HTML_TEMPLATE = """
     tickClock(); setInterval(tickClock, 1000);
 
     // Expiry (local time + countdown)
-    const expiresIsoUtc = "__EXPIRES_AT__"; // ISO UTC like 2026-01-20T04:17:02Z
-    const expiresDate = new Date(expiresIsoUtc);
+    let expiresIsoUtc = "__EXPIRES_AT__"; // ISO UTC like 2026-01-20T04:17:02Z
+    let expiresDate = new Date(expiresIsoUtc);
 
     const expiresLocalEl = document.getElementById("expiresLocal");
     const expiresInEl = document.getElementById("expiresIn");
@@ -495,15 +495,24 @@ LANE_HTML_TEMPLATE = """
       expiresLocalEl.textContent = expiresDate.toLocaleTimeString([], {hour:"2-digit", minute:"2-digit", second:"2-digit"});
       const diffSec = (expiresDate.getTime() - Date.now()) / 1000;
       expiresInEl.textContent = formatMMSS(diffSec);
-
-      if (diffSec <= 0) setTimeout(()=>location.reload(), 800);
     }
 
     updateExpiry();
     setInterval(updateExpiry, 1000);
 
-    // Refresh for rotation updates
-    setTimeout(()=>location.reload(), 5000);
+    // Live code updates: the server pushes every rotation over /ws/lane.
+    // The page only reloads if that connection is lost.
+    const WS_PROTO = location.protocol === "https:" ? "wss" : "ws";
+    const laneWs = new WebSocket(`${WS_PROTO}://${location.host}/ws/lane/__LANE_ID__`);
+    laneWs.onmessage = (ev) => {
+      const msg = JSON.parse(ev.data);
+      if (msg.type !== "lane_code") return;
+      document.getElementById("codeText").textContent = msg.code;
+      expiresIsoUtc = msg.expires_at;
+      expiresDate = new Date(expiresIsoUtc);
+      updateExpiry();
+    };
+    laneWs.onclose = () => setTimeout(()=>location.reload(), 3000);
 
     // Open customer UI
     function openCustomer(){
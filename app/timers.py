@@ -0,0 +1,64 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Retention settings (seconds) for the background sweeper (see sweeper.py)
+ORDER_RETENTION = float(os.environ.get("ORDER_RETENTION_SECONDS", 30 * 60))       # paid orders, spent payment sessions
+STALE_ORDER_RETENTION = float(os.environ.get("STALE_ORDER_SECONDS", 2 * 60 * 60))  # unpaid orders since last change
+CHECKIN_TTL = float(os.environ.get("CHECKIN_TTL_SECONDS", 15 * 60))
+
+TimerKey = Tuple[str, str]  # (kind, id), e.g. ("payment", "pay_01H...")
+
+
+class TimerWheel:
+    # Hashed timer wheel: schedule/cancel are O(1) and each tick only looks at
+    # one slot. Entries more than a revolution away stay in their slot until
+    # their deadline comes round. Scheduling an existing key moves it.
+    def __init__(self, tick: float = 1.0, slots: int = 512) -> None:
+        self.tick = tick
+        self.slots: List[Dict[TimerKey, float]] = [{} for _ in range(slots)]
+        self.where: Dict[TimerKey, int] = {}
+        self.cursor: Optional[int] = None  # last tick fully processed
+
+    def __len__(self) -> int:
+        return len(self.where)
+
+    def schedule(self, kind: str, key: str, when: float) -> None:
+        k = (kind, key)
+        self.cancel(kind, key)
+        tick_no = int(when / self.tick)
+        if self.cursor is not None:
+            tick_no = max(tick_no, self.cursor + 1)
+        slot = tick_no % len(self.slots)
+        self.slots[slot][k] = when
+        self.where[k] = slot
+
+    def cancel(self, kind: str, key: str) -> None:
+        slot = self.where.pop((kind, key), None)
+        if slot is not None:
+            self.slots[slot].pop((kind, key), None)
+
+    def advance(self, now: float) -> List[TimerKey]:
+        now_tick = int(now / self.tick)
+        start = now_tick - len(self.slots) + 1  # visit each slot at most once
+        if self.cursor is not None:
+            start = max(start, self.cursor + 1)
+        due = []
+        for t in range(start, now_tick + 1):
+            slot = self.slots[t % len(self.slots)]
+            for k in [k for k, when in slot.items() if when <= now]:
+                del slot[k]
+                del self.where[k]
+                due.append(k)
+        # The current tick may still hold entries due later in it, so it is
+        # visited again on the next call.
+        if self.cursor is None or now_tick - 1 > self.cursor:
+            self.cursor = now_tick - 1
+        return due
+
+
+wheel = TimerWheel()
+
+
+def after(seconds: float) -> float:
+    return time.time() + seconds
@@ -1,9 +1,29 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from .. import state
+from pydantic import ValidationError
+from .. import state, metrics
+from ..connections import Connection, LOSSLESS_POLICY, Sink
 from ..helpers import relay_call
+from ..models import CALL_MESSAGE
 
 router = APIRouter()
 
+# WebRTC signaling between the two sides of an order; also the call channel
+# of /ws/mux (mux_ws.py).
+
+def open_call(conn: Sink, order_id: str, role: str) -> None:
+    state.call_ws.setdefault(order_id, {})[role] = conn
+
+async def call_message(order_id: str, role: str, msg) -> None:
+    await relay_call(order_id, role, msg.model_dump())
+
+def close_call(conn: Sink, order_id: str, role: str) -> None:
+    conn.close()
+    peers = state.call_ws.get(order_id) or {}
+    if peers.get(role) is conn:
+        del peers[role]
+    if not peers:
+        state.call_ws.pop(order_id, None)
+
 @router.websocket("/ws/call/{order_id}/{role}")
 async def ws_call_signaling(ws: WebSocket, order_id: str, role: str):
     role = role.strip().lower()
@@ -12,17 +32,17 @@ async def ws_call_signaling(ws: WebSocket, order_id: str, role: str):
         return
 
     await ws.accept()
-
-    state.call_ws.setdefault(order_id, {})
-    state.call_ws[order_id][role] = ws
+    conn = Connection(ws, "call", policy=LOSSLESS_POLICY)
+    open_call(conn, order_id, role)
 
     try:
         while True:
-            data = await ws.receive_json()
-            await relay_call(order_id, role, data)
+            raw = await ws.receive_text()
+            metrics.ws_messages.inc("call", "in")
+            try:
+                msg = CALL_MESSAGE.validate_json(raw)
+            except ValidationError:
+                continue
+            await call_message(order_id, role, msg)
     except WebSocketDisconnect:
-        peers = state.call_ws.get(order_id) or {}
-        if peers.get(role) is ws:
-            del peers[role]
-        if not peers:
-            state.call_ws.pop(order_id, None)
+        close_call(conn, order_id, role)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from typing import Optional
+
+from .. import dispatch, state, metrics
+from ..connections import Connection, LOSSLESS_POLICY, Sink
+from ..helpers import order_summary
+from ..lanes import registry
+from ..models import CASHIER_MESSAGE
+
+router = APIRouter()
+
+SNAPSHOT_LIMIT = 100  # the console starts from the newest page; deltas keep it current
+
+# Cashier console feed; also the feed channel of /ws/mux (mux_ws.py).
+
+def snapshot() -> dict:
+    rows = [order_summary(o) for o in state.store.find_orders(limit=SNAPSHOT_LIMIT)]
+    return {"type": "orders_snapshot", "orders": rows}
+
+def open_feed(conn: Sink, cashier_id: str, lanes: str, capacity: Optional[int]) -> None:
+    # lanes: comma-separated lanes this cashier prefers; capacity: orders at once
+    state.cashier_feed_ws[cashier_id] = conn
+    conn.send(snapshot())
+    preferred = [lane.key for lane in map(registry.get, lanes.split(",")) if lane]
+    dispatch.scheduler.sign_in(cashier_id, preferred, capacity or dispatch.CASHIER_CAPACITY)
+
+def close_feed(conn: Sink, cashier_id: str) -> None:
+    conn.close()
+    dispatch.drop_feed(cashier_id, conn)
+
+@router.websocket("/ws/cashier")
+async def ws_cashier_feed(ws: WebSocket, cashier_id: str, lanes: str = "", capacity: Optional[int] = None):
+    await ws.accept()
+    conn = Connection(ws, "cashier", policy=LOSSLESS_POLICY)
+    open_feed(conn, cashier_id, lanes, capacity)
+
+    try:
+        while True:
+            raw = await ws.receive_text()
+            metrics.ws_messages.inc("cashier", "in")
+            try:
+                CASHIER_MESSAGE.validate_json(raw)
+            except ValidationError:
+                continue
+            conn.send(snapshot())
+    except WebSocketDisconnect:
+        close_feed(conn, cashier_id)
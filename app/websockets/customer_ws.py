@@ -1,19 +1,31 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from .. import state
-from ..helpers import ensure_demo_cards
+from .. import cards, state, metrics
+from ..connections import Connection, Sink
 
 router = APIRouter()
 
+# Customer notifications (payment requests, info); also the home channel of
+# /ws/mux (mux_ws.py).
+
+def open_home(conn: Sink, customer_id: str) -> None:
+    state.customer_home_ws[customer_id] = conn
+    cards.vault.wallet(customer_id)  # load (or create the demo) cards before the pay sheet asks
+    conn.send({"type": "info", "text": "Connected. Step 1: Tap ‘I’m Here’."})
+
+def close_home(conn: Sink, customer_id: str) -> None:
+    conn.close()
+    if state.customer_home_ws.get(customer_id) is conn:
+        del state.customer_home_ws[customer_id]
+
 @router.websocket("/ws/customer/{customer_id}")
 async def ws_customer(ws: WebSocket, customer_id: str):
     await ws.accept()
-    state.customer_home_ws[customer_id] = ws
-    ensure_demo_cards(customer_id)
+    conn = Connection(ws, "customer")
+    open_home(conn, customer_id)
 
     try:
-        await ws.send_json({"type": "info", "text": "Connected. Step 1: Tap ‘I’m Here’."})
         while True:
             await ws.receive_text()
+            metrics.ws_messages.inc("customer", "in")
     except WebSocketDisconnect:
-        if state.customer_home_ws.get(customer_id) is ws:
-            del state.customer_home_ws[customer_id]
+        close_home(conn, customer_id)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from .. import state, metrics
+from ..connections import Connection
+from ..helpers import current_lane_code, lane_code_message
+from ..lanes import registry
+
+router = APIRouter()
+
+@router.websocket("/ws/lane/{lane_id:path}")
+async def ws_lane_display(ws: WebSocket, lane_id: str):
+    lane = registry.get(lane_id)
+    if lane is None:
+        await ws.close()
+        return
+    lane_id = lane.key
+
+    await ws.accept()
+    conn = Connection(ws, "lane")
+    conn.send(lane_code_message(current_lane_code(lane_id)))
+    state.lane_ws.setdefault(lane_id, set()).add(conn)
+
+    try:
+        while True:
+            await ws.receive_text()
+            metrics.ws_messages.inc("lane", "in")
+    except WebSocketDisconnect:
+        conn.close()
+        screens = state.lane_ws.get(lane_id)
+        if screens is not None:
+            screens.discard(conn)
+            if not screens:
+                del state.lane_ws[lane_id]
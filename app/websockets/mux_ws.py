@@ -0,0 +1,144 @@
+from typing import Dict, Tuple
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from pydantic_core import from_json
+
+from .. import state, metrics
+from ..connections import Channel, Connection
+from ..models import CALL_MESSAGE, CASHIER_MESSAGE, MUX_CONTROL, MUX_FRAME, ORDER_MESSAGE, MuxControl
+from .call_ws import call_message, close_call, open_call
+from .cashier_ws import close_feed, open_feed, snapshot
+from .customer_ws import close_home, open_home
+from .order_ws import close_order, open_order, order_error, order_message
+
+router = APIRouter()
+
+# One socket per client instead of one per channel (see models.MuxControl):
+#
+#   /ws/mux?customer_id=...   channels: home, order, call
+#   /ws/mux?cashier_id=...    channels: feed, order, call
+#
+#   -> {"type": "subscribe", "channel": "order", "order_id": "ord_...", "since": 12}
+#   <- {"channel": "order", "order_id": "ord_...", "type": "subscribed"}
+#   <- {"channel": "order", "order_id": "ord_...", "type": "order_state", ...}
+#   -> {"channel": "order", "order_id": "ord_...", "type": "chat", "text": "..."}
+#   -> {"type": "unsubscribe", "channel": "order", "order_id": "ord_..."}
+#   <- {"channel": "order", "order_id": "ord_...", "type": "unsubscribed"}
+#
+# Each channel behaves like the single-purpose socket it replaces, which
+# stay available. A refused subscription gets a SYSTEM chat with the reason,
+# then "unsubscribed". Frames share one queue and overflow policy; signaling
+# and feed frames are never dropped, so a client that falls behind is
+# disconnected and resubscribes (order channels with "since").
+
+SubKey = Tuple[str, str]  # (channel, order_id or "")
+# Metrics label per channel: that of the single-purpose socket it replaces,
+# so per-channel message counts and send latencies carry on under mux.
+LABELS = {"home": "customer", "feed": "cashier", "order": "order", "call": "call"}
+
+
+def _key(channel: str, order_id: str) -> SubKey:
+    # Only order and call channels are per order. Home and feed frames may
+    # carry an order_id of their own (payment_request, order_assigned).
+    return (channel, order_id if channel in ("order", "call") else "")
+
+
+class _Mux:
+    def __init__(self, conn: Connection, role: str, who: str) -> None:
+        self.conn = conn
+        self.role = role
+        self.who = who
+        self.subs: Dict[SubKey, Channel] = {}
+
+    async def subscribe(self, ctl: MuxControl) -> None:
+        key = _key(ctl.channel, ctl.order_id)
+        self.unsubscribe(key, ack=False)  # resubscribing (e.g. with since) replaces the channel
+        sub = Channel(self.conn, {"channel": key[0], "order_id": key[1]} if key[1] else {"channel": key[0]}, LABELS[key[0]])
+        if ctl.channel in ("order", "call"):
+            error = order_error(ctl.order_id, self.role, self.who) if ctl.order_id else "order_id required"
+        elif (ctl.channel == "home") != (self.role == "customer"):
+            error = f"No {ctl.channel} channel for a {self.role}"
+        else:
+            error = None
+        if error:
+            sub.send({"type": "chat", "from": "SYSTEM", "text": error})
+            sub.send({"type": "unsubscribed"})
+            return
+
+        self.subs[key] = sub
+        sub.send({"type": "subscribed"})
+        if ctl.channel == "home":
+            open_home(sub, self.who)
+        elif ctl.channel == "feed":
+            open_feed(sub, self.who, ctl.lanes, ctl.capacity)
+        elif ctl.channel == "order":
+            await open_order(sub, ctl.order_id, self.role, ctl.since)
+        else:
+            open_call(sub, ctl.order_id, self.role)
+
+    def unsubscribe(self, key: SubKey, ack: bool = True) -> None:
+        sub = self.subs.pop(key, None)
+        if sub is None:
+            return
+        channel, order_id = key
+        if ack:
+            sub.send({"type": "unsubscribed"})
+        if channel == "home":
+            close_home(sub, self.who)
+        elif channel == "feed":
+            close_feed(sub, self.who)
+        elif channel == "order":
+            close_order(sub, order_id, self.role)
+        else:
+            close_call(sub, order_id, self.role)
+
+    async def receive(self, raw: str) -> None:
+        try:
+            data = from_json(raw)
+            if isinstance(data, dict) and data.get("type") in ("subscribe", "unsubscribe"):
+                metrics.ws_messages.inc("mux", "in")
+                ctl = MUX_CONTROL.validate_python(data)
+                if ctl.type == "subscribe":
+                    await self.subscribe(ctl)
+                else:
+                    self.unsubscribe(_key(ctl.channel, ctl.order_id))
+                return
+            env = MUX_FRAME.validate_python(data)
+            metrics.ws_messages.inc(LABELS[env.channel], "in")
+            sub = self.subs.get(_key(env.channel, env.order_id))
+            if sub is None:
+                return
+            if env.channel == "order":
+                await order_message(env.order_id, self.role, ORDER_MESSAGE.validate_python(data))
+            elif env.channel == "call":
+                await call_message(env.order_id, self.role, CALL_MESSAGE.validate_python(data))
+            elif env.channel == "feed":
+                CASHIER_MESSAGE.validate_python(data)
+                sub.send(snapshot())
+        except (ValueError, ValidationError):
+            return
+
+    def close(self) -> None:
+        for key in list(self.subs):
+            self.unsubscribe(key, ack=False)
+        self.conn.close()
+
+
+@router.websocket("/ws/mux")
+async def ws_mux(ws: WebSocket, customer_id: str = "", cashier_id: str = ""):
+    if bool(customer_id) == bool(cashier_id):
+        await ws.close()
+        return
+
+    await ws.accept()
+    conn = Connection(ws, "mux")
+    state.mux_ws.add(conn)
+    mux = _Mux(conn, "customer" if customer_id else "cashier", customer_id or cashier_id)
+
+    try:
+        while True:
+            await mux.receive(await ws.receive_text())
+    except WebSocketDisconnect:
+        mux.close()
+        state.mux_ws.discard(conn)
@@ -1,71 +1,117 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-import json
+from pydantic import ValidationError
+from typing import Dict, Optional
 
-from .. import state
-from ..helpers import utcnow, relay_order
+from .. import dispatch, state, metrics
+from ..connections import Connection, Sink
+from ..frames import frame
+from ..helpers import relay_order, publish_order, record_chat
+from ..models import ORDER_MESSAGE, ChatMessage
+from ..records import OrderStatus
 
 router = APIRouter()
 
-@router.websocket("/ws/order/{order_id}/customer")
-async def ws_order_customer(ws: WebSocket, order_id: str, customer_id: str):
-    await ws.accept()
+# Order chat for one side of an order. The open/message/close functions are
+# shared by these endpoints and the order channel of /ws/mux (mux_ws.py).
 
-    o = state.orders.get(order_id)
-    if not o or o["customer_id"] != customer_id:
-        await ws.send_json({"type": "chat", "from": "SYSTEM", "text": "Invalid order or customer mismatch."})
-        await ws.close()
-        return
+def _registry(role: str) -> Dict[str, Sink]:
+    return state.order_customer_ws if role == "customer" else state.order_cashier_ws
 
-    state.order_customer_ws[order_id] = ws
-    await ws.send_json({"type": "order_state", "status": o["status"]})
+def _resume(conn: Sink, order_id: str, since: Optional[int]) -> bool:
+    # Replays exactly the events after `since`. False when there is nothing to
+    # resume from, or the gap has left the ring and the socket needs a full sync.
+    if since is None:
+        return False
+    _, missed = state.store.order_events_since(order_id, since)
+    if missed is None:
+        return False
+    if missed:
+        conn.send(frame(*missed))
+    return True
 
-    try:
-        while True:
-            raw = await ws.receive_text()
-            msg = json.loads(raw)
-            if msg.get("type") == "chat":
-                text = str(msg.get("text", "")).strip()
-                if not text:
-                    continue
-                o["messages"].append({"from": "CUSTOMER", "text": text, "ts": utcnow().isoformat()})
-                await relay_order(order_id, {"type": "chat", "from": "CUSTOMER", "text": text})
-    except WebSocketDisconnect:
-        if state.order_customer_ws.get(order_id) is ws:
-            del state.order_customer_ws[order_id]
-
-@router.websocket("/ws/order/{order_id}/cashier")
-async def ws_order_cashier(ws: WebSocket, order_id: str, cashier_id: str):
-    await ws.accept()
-
-    o = state.orders.get(order_id)
+def order_error(order_id: str, role: str, who: str) -> Optional[str]:
+    # Why `who` may not open this order, if they may not. Cashiers claim it.
+    o = state.store.get_order(order_id)
+    if role == "customer":
+        if not o or o.customer_id != who:
+            return "Invalid order or customer mismatch."
+        return None
     if not o:
-        await ws.send_json({"type": "chat", "from": "SYSTEM", "text": "Order not found."})
-        await ws.close()
+        return "Order not found."
+    if not dispatch.scheduler.claim(order_id, who):
+        return "Order is assigned to another cashier."
+    return None
+
+async def open_order(conn: Sink, order_id: str, role: str, since: Optional[int]) -> None:
+    _registry(role)[order_id] = conn
+    if _resume(conn, order_id, since):
+        return
+    o = state.store.get_order(order_id)
+    if role == "customer":
+        conn.send({"type": "order_state", "status": o.status})
         return
 
-    state.order_cashier_ws[order_id] = ws
-    o["status"] = "CASHIER_CONNECTED"
+    o.status = OrderStatus.CASHIER_CONNECTED
+    state.store.save_order(o)
+    await publish_order(o)
 
     await relay_order(order_id, {
         "type": "order_state",
-        "status": o["status"],
-        "items_text": o.get("items_text", ""),
-        "total_cents": o.get("total_cents"),
+        "status": o.status,
+        "items_text": o.items_text,
+        "total_cents": o.total_cents,
     })
 
-    for m in o["messages"][-25:]:
-        await ws.send_json({"type": "chat", "from": m["from"], "text": m["text"]})
+    history = [{"type": "chat", "from": m["from"], "text": m["text"]} for m in o.messages]
+    if history:
+        conn.send(frame(*history))
+
+async def order_message(order_id: str, role: str, msg: ChatMessage) -> None:
+    text = msg.text
+    if not text:
+        return
+    o = state.store.get_order(order_id)
+    if o is None:
+        return
+    sender = role.upper()
+    record_chat(o, sender, text)
+    state.store.save_order(o)
+    await relay_order(order_id, {"type": "chat", "from": sender, "text": text})
+
+def close_order(conn: Sink, order_id: str, role: str) -> None:
+    conn.close()
+    registry = _registry(role)
+    if registry.get(order_id) is conn:
+        del registry[order_id]
+
+async def _serve(ws: WebSocket, order_id: str, role: str, who: str, since: Optional[int]) -> None:
+    await ws.accept()
+
+    error = order_error(order_id, role, who)
+    if error:
+        await ws.send_json({"type": "chat", "from": "SYSTEM", "text": error})
+        await ws.close()
+        return
+
+    conn = Connection(ws, "order")
+    await open_order(conn, order_id, role, since)
 
     try:
         while True:
             raw = await ws.receive_text()
-            msg = json.loads(raw)
-            if msg.get("type") == "chat":
-                text = str(msg.get("text", "")).strip()
-                if not text:
-                    continue
-                o["messages"].append({"from": "CASHIER", "text": text, "ts": utcnow().isoformat()})
-                await relay_order(order_id, {"type": "chat", "from": "CASHIER", "text": text})
+            metrics.ws_messages.inc("order", "in")
+            try:
+                msg = ORDER_MESSAGE.validate_json(raw)
+            except ValidationError:
+                continue
+            await order_message(order_id, role, msg)
     except WebSocketDisconnect:
-        if state.order_cashier_ws.get(order_id) is ws:
-            del state.order_cashier_ws[order_id]
+        close_order(conn, order_id, role)
+
+@router.websocket("/ws/order/{order_id}/customer")
+async def ws_order_customer(ws: WebSocket, order_id: str, customer_id: str, since: Optional[int] = None):
+    await _serve(ws, order_id, "customer", customer_id, since)
+
+@router.websocket("/ws/order/{order_id}/cashier")
+async def ws_order_cashier(ws: WebSocket, order_id: str, cashier_id: str, since: Optional[int] = None):
+    await _serve(ws, order_id, "cashier", cashier_id, since)
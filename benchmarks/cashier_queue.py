@@ -0,0 +1,132 @@
+# Wait-to-cashier time under app/dispatch.py, by simulation: Poisson car
+# arrivals spread over the lanes, exponential service times, one simulated
+# clock driving the real CashierScheduler. Cashier i wears lane i's headset,
+# so serving another lane costs --cross-lane-penalty extra seconds.
+# Policies:
+#   scheduler    the scheduler with each cashier preferring their own lane
+#   least_loaded the scheduler without lane preferences (FIFO, least loaded)
+#   random       no coordination: every car goes to a random cashier and
+#                queues behind them, like cashiers picking from the dropdown
+#
+#   python -m benchmarks.cashier_queue --cashiers 4 --rates 1,2,3,4
+import argparse
+import heapq
+import itertools
+import json
+import random
+from collections import deque
+
+from app.dispatch import CashierScheduler
+
+
+class Sim:
+    def __init__(self, args, rate_per_min: float, seed: int) -> None:
+        self.args = args
+        self.rng = random.Random(seed)
+        self.rate = rate_per_min / 60
+        self.now = 0.0
+        self.events = []
+        self.seq = itertools.count()
+        self.lanes = [f"L{i + 1}" for i in range(args.lanes)]
+        self.home = {f"c{i}": self.lanes[i % args.lanes] for i in range(args.cashiers)}
+        self.arrived = {}  # order_id -> (arrival time, lane)
+        self.waits = []
+
+    def at(self, kind: str, key: str, when: float) -> None:
+        heapq.heappush(self.events, (when, next(self.seq), kind, key))
+
+    def service_time(self, cashier_id: str, order_id: str) -> float:
+        mean = self.args.service
+        if self.arrived[order_id][1] != self.home[cashier_id]:
+            mean += self.args.cross_lane_penalty
+        return self.rng.expovariate(1 / mean)
+
+    def started(self, cashier_id: str, order_id: str) -> None:
+        t, _ = self.arrived[order_id]
+        if int(order_id) >= self.args.cars // 10:  # skip warm-up
+            self.waits.append(self.now - t)
+        self.at("done", order_id, self.now + self.service_time(cashier_id, order_id))
+
+    def arrivals(self) -> None:
+        t = 0.0
+        for n in range(self.args.cars):
+            t += self.rng.expovariate(self.rate)
+            self.arrived[str(n)] = (t, self.rng.choice(self.lanes))
+            self.at("arrive", str(n), t)
+
+    def run_scheduler(self, affinity: bool) -> None:
+        s = CashierScheduler(
+            lambda cashier_id, msg: self.started(cashier_id, msg["order_id"]), self.at, clock=lambda: self.now, affinity_wait=self.args.affinity_wait,
+        )
+        for cashier_id, lane in self.home.items():
+            s.sign_in(cashier_id, [lane] if affinity else [], self.args.capacity)
+        self.arrivals()
+        while self.events:
+            self.now, _, kind, key = heapq.heappop(self.events)
+            if kind == "arrive":
+                s.enqueue(key, self.arrived[key][1])
+            elif kind == "done":
+                s.release(key)
+
+    def run_random(self) -> None:
+        queues = {cashier_id: deque() for cashier_id in self.home}
+        busy = dict.fromkeys(self.home, 0)
+        owner = {}
+        self.arrivals()
+        while self.events:
+            self.now, _, kind, key = heapq.heappop(self.events)
+            if kind == "arrive":
+                cashier_id = owner[key] = self.rng.choice(list(self.home))
+                if busy[cashier_id] < self.args.capacity:
+                    busy[cashier_id] += 1
+                    self.started(cashier_id, key)
+                else:
+                    queues[cashier_id].append(key)
+            elif kind == "done":
+                cashier_id = owner[key]
+                if queues[cashier_id]:
+                    self.started(cashier_id, queues[cashier_id].popleft())
+                else:
+                    busy[cashier_id] -= 1
+
+    def report(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "avg_wait_s": round(sum(waits) / len(waits), 2),
+            "p95_wait_s": round(waits[int(len(waits) * 0.95)], 2),
+            "max_wait_s": round(waits[-1], 2),
+        }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cashiers", type=int, default=4)
+    ap.add_argument("--lanes", type=int, default=4)
+    ap.add_argument("--capacity", type=int, default=1, help="orders a cashier handles at once")
+    ap.add_argument("--service", type=float, default=45.0, help="mean seconds a cashier spends on an order")
+    ap.add_argument("--cross-lane-penalty", type=float, default=10.0)
+    ap.add_argument("--affinity-wait", type=float, default=20.0)
+    ap.add_argument("--rates", default="1,2,3,4", help="car arrivals per minute, comma-separated")
+    ap.add_argument("--cars", type=int, default=20_000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    results = {}
+    for rate in (float(r) for r in args.rates.split(",")):
+        row = {}
+        for policy in ("scheduler", "least_loaded", "random"):
+            sim = Sim(args, rate, args.seed)
+            if policy == "random":
+                sim.run_random()
+            else:
+                sim.run_scheduler(affinity=policy == "scheduler")
+            row[policy] = sim.report()
+        results[f"{rate:g}/min"] = row
+    print(json.dumps({
+        "cashiers": args.cashiers, "lanes": args.lanes, "capacity": args.capacity,
+        "mean_service_s": args.service, "cars": args.cars, "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
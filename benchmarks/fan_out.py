@@ -0,0 +1,95 @@
+# Latency seen by a fast cashier socket, and by the relaying handler itself,
+# when the customer's phone is slow.
+#
+#   python -m benchmarks.fan_out --events 200 --slow-ms 250
+import argparse
+import asyncio
+import json
+import time
+
+from app import connections, state
+from app.connections import Connection
+from app.helpers import relay_order
+
+
+class FakeSocket:
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.latencies = []
+        self.closed = False
+
+    async def send_json(self, payload: dict) -> None:
+        await asyncio.sleep(self.delay)
+        self.latencies.append(time.perf_counter() - payload["sent_at"])
+
+    async def send_text(self, text: str) -> None:
+        await self.send_json(json.loads(text))
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+
+def pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 3)
+
+
+async def run(queued: bool, events: int, slow: float) -> dict:
+    order_id = "ord_bench"
+    fast = FakeSocket(0.0)
+    raw = {"customer": FakeSocket(slow), "cashier": fast}
+
+    async def sequential_relay(payload: dict) -> None:
+        # The original relay_order: customer first, then cashier, awaited inline.
+        for ws in raw.values():
+            await ws.send_json(payload)
+
+    if queued:
+        state.order_cashier_ws[order_id] = Connection(fast, "order")
+
+    handler = []
+    for i in range(events):
+        if queued and order_id not in state.order_customer_ws:
+            # the phone reconnects after being dropped
+            state.order_customer_ws[order_id] = Connection(FakeSocket(slow), "order")
+        started = time.perf_counter()
+        payload = {"type": "chat", "text": f"m{i}", "sent_at": started}
+        if queued:
+            await relay_order(order_id, payload)
+        else:
+            await sequential_relay(payload)
+        handler.append(time.perf_counter() - started)
+        await asyncio.sleep(0.001)  # cars do not chat back-to-back
+
+    while len(fast.latencies) < events:
+        await asyncio.sleep(0.01)
+    for registry in (state.order_customer_ws, state.order_cashier_ws):
+        conn = registry.pop(order_id, None)
+        if conn:
+            conn.close()
+    return {
+        "handler_p50_ms": pct(handler, 0.50),
+        "handler_p99_ms": pct(handler, 0.99),
+        "fast_peer_p50_ms": pct(fast.latencies, 0.50),
+        "fast_peer_p99_ms": pct(fast.latencies, 0.99),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=200)
+    ap.add_argument("--slow-ms", type=float, default=250.0)
+    ap.add_argument("--timeout-ms", type=float, default=100.0)
+    args = ap.parse_args()
+
+    connections.SEND_TIMEOUT = args.timeout_ms / 1000
+    slow = args.slow_ms / 1000
+    results = {
+        "sequential": asyncio.run(run(False, args.events, slow)),
+        "queued_fan_out": asyncio.run(run(True, args.events, slow)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
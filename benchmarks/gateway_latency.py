@@ -0,0 +1,100 @@
+# Pay throughput when authorization goes through the HTTP gateway to the fake
+# processor at several processor latencies. The processor runs in-process
+# behind a real TCP socket, so the pooled keep-alive client is exercised.
+#
+#   python -m benchmarks.gateway_latency --pays 500 --concurrency 100 --latencies 50,200,500
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+import httpx
+import uvicorn
+
+from app import fake_processor, state
+from app.gateway import HttpGateway, LocalGateway
+from app.helpers import current_lane_code
+from app.main import app
+
+
+async def serve(asgi_app):
+    # IPPROTO_TCP so asyncio sets TCP_NODELAY (see benchmarks/load).
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(asgi_app, log_level="warning", backlog=4096))
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}", server, task
+
+
+async def open_sessions(client: httpx.AsyncClient, run: str, n: int) -> list:
+    sessions = []
+    for i in range(n):
+        customer_id = f"{run}_{i}"
+        await client.post("/customer/checkin", json={"customer_id": customer_id, "lane_id": "L1"})
+        code = current_lane_code("L1").code
+        r = await client.post("/customer/connect", json={"customer_id": customer_id, "lane_id": "L1", "code": code})
+        r = await client.post(f"/cashier/order/{r.json()['order_id']}/confirm_total", json={"items_text": "1x combo", "total_cents": 1299})
+        sessions.append((customer_id, r.json()["pay_session_id"]))
+    return sessions
+
+
+def pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 1)
+
+
+async def measure(client: httpx.AsyncClient, run: str, pays: int, concurrency: int) -> dict:
+    sessions = await open_sessions(client, run, pays)
+    gate = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def pay(customer_id: str, pay_session_id: str) -> None:
+        async with gate:
+            started = time.perf_counter()
+            r = await client.post(f"/payment/{pay_session_id}/pay", json={"customer_id": customer_id, "mode": "google_pay"})
+            latencies.append(time.perf_counter() - started)
+            status = r.json().get("status") or r.status_code
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(pay(*s) for s in sessions))
+    wall = time.perf_counter() - started
+    return {
+        "pays_per_second": round(pays / wall, 1),
+        "p50_ms": pct(latencies, 0.50),
+        "p99_ms": pct(latencies, 0.99),
+        "statuses": statuses,
+    }
+
+
+async def main(args) -> None:
+    report = {"pays": args.pays, "concurrency": args.concurrency, "results": {}}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        state.gateway = LocalGateway()
+        report["results"]["local"] = await measure(client, "local", args.pays, args.concurrency)
+
+        for latency in (float(ms) for ms in args.latencies.split(",")):
+            url, server, task = await serve(fake_processor.create_app(latency, fail_rate=args.fail_rate))
+            state.gateway = HttpGateway(url, max_connections=args.concurrency, max_concurrency=args.concurrency)
+            try:
+                report["results"][f"{latency:g}ms"] = await measure(client, f"p{latency:g}", args.pays, args.concurrency)
+            finally:
+                await state.gateway.close()
+                server.should_exit = True
+                await task
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pays", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=100)
+    ap.add_argument("--latencies", default="50,200,500", help="processor latencies in ms")
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    asyncio.run(main(ap.parse_args()))
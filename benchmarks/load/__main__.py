@@ -0,0 +1,124 @@
+# Drive-thru load generator: N simulated cars across M lanes against one
+# instance, reporting throughput and p50/p95/p99 end-to-end and per-step
+# latency as JSON so runs can be diffed across commits.
+#
+#   python -m benchmarks.load --cars 500 --lanes 2 --concurrency 100
+#   LANES_FILE=lanes.json python -m benchmarks.load --cars 5000 --lanes 1000
+#   python -m benchmarks.load --url http://127.0.0.1:8000 --out before.json
+#   python -m benchmarks.load --cars 500 --mux   # phones on one multiplexed socket
+#
+# Without --url the app is started in-process under uvicorn on a free port;
+# the cars then share its event loop, so use --url for absolute numbers and
+# the in-process mode for comparing commits on the same machine. Lane codes
+# are single use, so throughput per lane is bounded by the connect step.
+# --lanes takes the first N lanes the target lists at GET /lanes.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import time
+from typing import Optional
+
+import httpx
+import uvicorn
+
+from app.main import app
+from .drive import STEPS, run_cars
+
+def pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 3)
+
+
+def summary(values: list) -> dict:
+    if not values:
+        return {"n": 0}
+    return {"n": len(values), "p50_ms": pct(values, 0.50), "p95_ms": pct(values, 0.95), "p99_ms": pct(values, 0.99), "max_ms": round(max(values) * 1000, 3)}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def serve_in_process():
+    # proto must be IPPROTO_TCP or asyncio skips TCP_NODELAY on accepted
+    # sockets, and every response then waits ~40 ms on delayed ACKs.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}", server, task
+
+
+async def listed_lanes(base_url: str, n: Optional[int] = None) -> list:
+    # The first n lane keys the target lists at GET /lanes (all with n=None).
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        stores = (await http.get("/lanes")).json()["stores"]
+    lanes = [key for store in stores for key in store["lanes"]][:n]
+    if n is not None and len(lanes) < n:
+        raise SystemExit(f"--lanes {n}: the target lists only {len(lanes)} lanes")
+    return lanes
+
+
+async def bench(args) -> dict:
+    server = None
+    base_url = args.url
+    if not base_url:
+        base_url, server, task = await serve_in_process()
+    try:
+        lanes = args.lane_ids.split(",") if args.lane_ids else await listed_lanes(base_url, args.lanes)
+        result = await run_cars(base_url, args.cars, lanes, args.concurrency, f"car{int(time.time())}_{os.getpid()}", args.mux)
+    finally:
+        if server:
+            server.should_exit = True
+            await task
+
+    timings = result["timings"]
+    completed = len(timings.end_to_end)
+    return {
+        "commit": git_commit(),
+        "target": args.url or "in-process",
+        "cars": args.cars,
+        "lanes": lanes,
+        "concurrency": args.concurrency,
+        "mux": args.mux,
+        "completed": completed,
+        "errors": dict(timings.errors),
+        "wall_seconds": round(result["wall_seconds"], 3),
+        "orders_per_second": round(completed / result["wall_seconds"], 2),
+        "end_to_end": summary(timings.end_to_end),
+        "steps": {step: summary(timings.steps[step]) for step in STEPS},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cars", type=int, default=200)
+    ap.add_argument("--lanes", type=int, default=2)
+    ap.add_argument("--lane-ids", help="comma-separated lanes, instead of the first --lanes")
+    ap.add_argument("--concurrency", type=int, default=100, help="cars in the drive-thru at once")
+    ap.add_argument("--mux", action="store_true", help="one /ws/mux socket per phone instead of home + order sockets")
+    ap.add_argument("--url", help="target a running server instead of starting one in-process")
+    ap.add_argument("--out", help="also write the JSON report to this file")
+    args = ap.parse_args()
+
+    report = asyncio.run(bench(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Simulated cars for the load generator. Each car drives the same path a
+# phone and a cashier screen would: home socket, check-in, lane code,
+# connect, order socket, chat, cashier joins, confirm total, pay. With mux the
+# order channel rides on the home socket (/ws/mux) instead of a socket of its own.
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+from websockets.asyncio.client import connect as ws_connect
+
+STEPS = (
+    "customer_ws", "checkin", "lane_code", "connect", "order_ws", "chat",
+    "cashier_join", "confirm_total", "payment_request", "pay", "paid",
+)
+FRAME_TIMEOUT = 10.0
+CONNECT_ATTEMPTS = 5
+
+
+def frames(raw) -> List[dict]:
+    msg = json.loads(raw)
+    return msg["events"] if msg.get("type") == "batch" else [msg]
+
+
+async def expect(ws, match: Callable[[dict], bool], timeout: float = FRAME_TIMEOUT) -> dict:
+    # Read frames until one matches; anything else on the socket is skipped.
+    deadline = time.perf_counter() + timeout
+    while True:
+        raw = await asyncio.wait_for(ws.recv(), max(0.0, deadline - time.perf_counter()))
+        for msg in frames(raw):
+            if match(msg):
+                return msg
+
+
+def mux_key(channel: str, order_id: str) -> Tuple[str, str]:
+    # Same routing as the pages' Mux class: order_id only names order and
+    # call channels; home and feed frames may carry an order_id of their own.
+    return (channel, order_id if channel in ("order", "call") else "")
+
+
+class MuxSocket:
+    # A /ws/mux socket whose frames are sorted into per-subscription inboxes,
+    # so reading one channel never swallows another channel's frames.
+    def __init__(self, ws) -> None:
+        self.ws = ws
+        self.inbox: Dict[Tuple[str, str], Deque[str]] = defaultdict(deque)
+
+    async def subscribe(self, channel: str, **params) -> "MuxChannel":
+        await self.ws.send(json.dumps({"type": "subscribe", "channel": channel, **params}))
+        return MuxChannel(self, channel, params.get("order_id", ""))
+
+    async def recv(self, key: Tuple[str, str]) -> str:
+        inbox = self.inbox[key]
+        while not inbox:
+            raw = await self.ws.recv()
+            msg = json.loads(raw)
+            self.inbox[mux_key(msg.get("channel"), msg.get("order_id", ""))].append(raw)
+        return inbox.popleft()
+
+
+class MuxChannel:
+    def __init__(self, mux: MuxSocket, channel: str, order_id: str) -> None:
+        self.mux = mux
+        self.key = mux_key(channel, order_id)
+        self.tag = {"channel": channel, "order_id": order_id} if self.key[1] else {"channel": channel}
+
+    async def recv(self) -> str:
+        return await self.mux.recv(self.key)
+
+    async def send(self, text: str) -> None:
+        await self.mux.ws.send(json.dumps({**json.loads(text), **self.tag}))
+
+
+class Timings:
+    def __init__(self) -> None:
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.end_to_end: List[float] = []
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, step: str, started: float) -> float:
+        now = time.perf_counter()
+        self.steps[step].append(now - started)
+        return now
+
+
+class LaneDisplay:
+    # One lane screen per lane. Cars queue at the speaker (the lock) and each
+    # waits for a code nobody has used yet, since every connect rotates it.
+    def __init__(self, ws_base: str, lane_id: str) -> None:
+        self.url = f"{ws_base}/ws/lane/{lane_id}"
+        self.lane_id = lane_id
+        self.code: Optional[str] = None
+        self.used: Optional[str] = None
+        self.changed = asyncio.Condition()
+        self.speaker = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        ws = await ws_connect(self.url)
+        self.task = asyncio.create_task(self._watch(ws))
+        await self.fresh_code()
+
+    async def _watch(self, ws) -> None:
+        async with ws:
+            async for raw in ws:
+                for msg in frames(raw):
+                    if msg.get("type") == "lane_code":
+                        async with self.changed:
+                            self.code = msg["code"]
+                            self.changed.notify_all()
+
+    async def fresh_code(self) -> str:
+        async with self.changed:
+            await asyncio.wait_for(self.changed.wait_for(lambda: self.code and self.code != self.used), FRAME_TIMEOUT)
+            return self.code
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+
+
+async def drive_car(
+    http: httpx.AsyncClient, ws_base: str, car_id: str, display: LaneDisplay, timings: Timings, mux: bool = False,
+) -> None:
+    lane_id = display.lane_id
+    started = t = time.perf_counter()
+
+    async with ws_connect(f"{ws_base}/ws/mux?customer_id={car_id}" if mux else f"{ws_base}/ws/customer/{car_id}") as home:
+        if mux:
+            home = await MuxSocket(home).subscribe("home")
+        await expect(home, lambda m: m.get("type") == "info")
+        t = timings.record("customer_ws", t)
+
+        r = await http.post("/customer/checkin", json={"customer_id": car_id, "lane_id": lane_id})
+        r.raise_for_status()
+        t = timings.record("checkin", t)
+
+        async with display.speaker:
+            for attempt in range(CONNECT_ATTEMPTS):
+                code = await display.fresh_code()
+                t = timings.record("lane_code", t)
+                r = await http.post("/customer/connect", json={"customer_id": car_id, "lane_id": lane_id, "code": code})
+                t = timings.record("connect", t)
+                if r.status_code == 200:
+                    display.used = code
+                    break
+                timings.errors["connect_retry"] += 1  # code rotated on its timer in between
+            else:
+                r.raise_for_status()
+        order_id = r.json()["order_id"]
+
+        async with nullcontext() if mux else ws_connect(f"{ws_base}/ws/order/{order_id}/customer?customer_id={car_id}") as phone:
+            if mux:
+                phone = await home.mux.subscribe("order", order_id=order_id)
+            await expect(phone, lambda m: m.get("type") == "order_state")
+            t = timings.record("order_ws", t)
+
+            await phone.send(json.dumps({"type": "chat", "text": "1x combo, no pickles"}))
+            await expect(phone, lambda m: m.get("type") == "chat" and m.get("from") == "CUSTOMER")
+            t = timings.record("chat", t)
+
+            async with ws_connect(f"{ws_base}/ws/mux?cashier_id=bench" if mux else f"{ws_base}/ws/order/{order_id}/cashier?cashier_id=bench") as cashier:
+                if mux:
+                    await MuxSocket(cashier).subscribe("order", order_id=order_id)
+                await expect(phone, lambda m: m.get("status") == "CASHIER_CONNECTED")
+                t = timings.record("cashier_join", t)
+
+                r = await http.post(f"/cashier/order/{order_id}/confirm_total", json={"items_text": "1x combo", "total_cents": 1299})
+                r.raise_for_status()
+                pay_session_id = r.json()["pay_session_id"]
+                t = timings.record("confirm_total", t)
+
+                await expect(home, lambda m: m.get("type") == "payment_request")
+                t = timings.record("payment_request", t)
+
+                r = await http.post(f"/payment/{pay_session_id}/pay", json={"customer_id": car_id, "mode": "google_pay"})
+                r.raise_for_status()
+                t = timings.record("pay", t)
+
+                await expect(phone, lambda m: m.get("status") == "PAID_READY_FOR_PICKUP")
+                t = timings.record("paid", t)
+                await cashier.close()
+
+    timings.end_to_end.append(t - started)
+
+
+async def run_cars(base_url: str, cars: int, lanes: List[str], concurrency: int, run_id: str, mux: bool = False) -> dict:
+    ws_base = "ws" + base_url[len("http"):]
+    timings = Timings()
+    displays = {lane_id: LaneDisplay(ws_base, lane_id) for lane_id in lanes}
+    for display in displays.values():
+        await display.start()
+
+    gate = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=FRAME_TIMEOUT) as http:
+        async def one(i: int) -> None:
+            async with gate:
+                try:
+                    await drive_car(http, ws_base, f"{run_id}_{i}", displays[lanes[i % len(lanes)]], timings, mux)
+                except Exception as e:
+                    timings.errors[type(e).__name__] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(cars)))
+        wall = time.perf_counter() - started
+
+    for display in displays.values():
+        await display.stop()
+    return {"wall_seconds": wall, "timings": timings}
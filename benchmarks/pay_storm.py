@@ -0,0 +1,80 @@
+# Many concurrent pay calls on one payment session: retries that reuse one
+# Idempotency-Key, separate taps with their own keys, and calls with no key.
+# Exactly one of them may charge and save the new card; every caller must
+# see the same APPROVED result.
+#
+#   python -m benchmarks.pay_storm --requests 1000 [--processor-ms 200]
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+
+from app import fake_processor, idempotency, state
+from app.gateway import HttpGateway
+from app.helpers import current_lane_code
+from app.main import app
+from benchmarks.gateway_latency import serve
+
+NEW_CARD = {"mode": "new_card", "new_card": {"number": "4111 1111 1111 1111", "exp": "12/30", "cvv": "123"}}
+
+
+async def open_session(client: httpx.AsyncClient, customer_id: str) -> str:
+    await client.post("/customer/checkin", json={"customer_id": customer_id, "lane_id": "L1"})
+    code = current_lane_code("L1").code
+    r = await client.post("/customer/connect", json={"customer_id": customer_id, "lane_id": "L1", "code": code})
+    order_id = r.json()["order_id"]
+    r = await client.post(f"/cashier/order/{order_id}/confirm_total", json={"items_text": "1x combo", "total_cents": 1299})
+    return r.json()["pay_session_id"]
+
+
+async def main(requests: int, processor_ms: float) -> None:
+    if processor_ms:  # authorize through the HTTP gateway, so pay awaits mid-flight
+        url, server, task = await serve(fake_processor.create_app(processor_ms))
+        state.gateway = HttpGateway(url)
+    customer_id = "storm"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        pay_session_id = await open_session(client, customer_id)
+        body = {"customer_id": customer_id, **NEW_CARD}
+
+        def headers(i: int) -> dict:
+            if i % 3 == 0:
+                return {"Idempotency-Key": "retry"}        # one tap, retried
+            if i % 3 == 1:
+                return {"Idempotency-Key": f"tap-{i}"}     # separate taps
+            return {}
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(f"/payment/{pay_session_id}/pay", json=body, headers=headers(i)) for i in range(requests)
+        ))
+        elapsed = time.perf_counter() - started
+    if processor_ms:
+        await state.gateway.close()
+        server.should_exit = True
+        await task
+
+    results = Counter((r.status_code, r.json().get("status"), r.json().get("payment_method")) for r in responses)
+    new_cards = [c for c in state.store.get_cards(customer_id) if not c["card_id"].startswith("card_demo_")]
+    report = {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "results": {f"{code} {status} {method}": n for (code, status, method), n in results.items()},
+        "replayed": sum(1 for r in responses if r.headers.get("Idempotent-Replayed") == "true"),
+        "cards_saved": len(new_cards),
+        "session_locks_left": len(idempotency.sessions),
+    }
+    print(json.dumps(report, indent=2))
+    assert len(results) == 1 and next(iter(results))[:2] == (200, "APPROVED"), results
+    assert len(new_cards) == 1 and not len(idempotency.sessions)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--processor-ms", type=float, default=0, help="authorize via the fake processor with this latency")
+    args = ap.parse_args()
+    asyncio.run(main(args.requests, args.processor_ms))
@@ -0,0 +1,65 @@
+# Resident bytes per order (order + its payment session) held in the store:
+# the old dict records with string statuses and datetime times, against the
+# slotted records from app/records.py.
+#
+#   python -m benchmarks.record_memory --orders 100000
+import argparse
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.helpers import new_id
+from app.records import Order, OrderStatus, PaymentSession, PaymentStatus, epoch
+
+
+def dict_records(i: int, order_id: str, pay_session_id: str) -> tuple:
+    now = datetime.utcnow()
+    o = {
+        "order_id": order_id, "customer_id": f"cust_{i}", "lane_id": "L1" if i % 2 else "L2",
+        "status": "".join(("TOTAL_CONFIRMED_", "WAITING_PAYMENT")),  # decoded from JSON, so not interned
+        "messages": [], "items_text": "1x combo", "total_cents": 1299,
+        "created_at": now.isoformat(), "pay_session_id": pay_session_id, "chat_count": 0,
+    }
+    p = {
+        "pay_session_id": pay_session_id, "order_id": order_id, "customer_id": o["customer_id"],
+        "amount_cents": 1299, "currency": "USD", "merchant_name": "DriveThru Demo", "status": "".join(("PEN", "DING")),
+        "payment_method": None, "expires_at": now + timedelta(minutes=5), "authorization_id": None,
+    }
+    return o, p
+
+
+def slotted_records(i: int, order_id: str, pay_session_id: str) -> tuple:
+    o = Order(order_id, f"cust_{i}", "L1" if i % 2 else "L2", OrderStatus.TOTAL_CONFIRMED_WAITING_PAYMENT,
+              items_text="1x combo", total_cents=1299, pay_session_id=pay_session_id)
+    p = PaymentSession(pay_session_id, order_id, o.customer_id, 1299, epoch() + 5 * 60, status=PaymentStatus.PENDING)
+    return o, p
+
+
+def measure(build, ids: list) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(i, order_id, pay_session_id) for i, (order_id, pay_session_id) in enumerate(ids)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    return used / len(ids)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=100_000)
+    args = ap.parse_args()
+
+    # ids are shared by both shapes and allocated up front, so only the records are counted
+    ids = [(new_id("ord"), new_id("pay")) for _ in range(args.orders)]
+    report = {
+        "orders": args.orders,
+        "dict_bytes_per_order": round(measure(dict_records, ids)),
+        "slotted_bytes_per_order": round(measure(slotted_records, ids)),
+    }
+    report["saved_mb"] = round((report["dict_bytes_per_order"] - report["slotted_bytes_per_order"]) * args.orders / 2**20, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Startup recovery time of the event-log store: N orders taken through the
+# full status sequence (plus their payment sessions), a snapshot part way
+# through, and the rest left in the log tail.
+#
+#   python -m benchmarks.recovery --orders 100000
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from app.helpers import new_id
+from app.records import Order, OrderStatus, PaymentSession, PaymentStatus, epoch
+from app.storage import LogStore
+
+STATUSES = (
+    OrderStatus.CONNECTED_WAITING_CASHIER, OrderStatus.CASHIER_CONNECTED,
+    OrderStatus.TOTAL_CONFIRMED_WAITING_PAYMENT, OrderStatus.PAID_READY_FOR_PICKUP,
+)
+
+
+def populate(store: LogStore, orders: int, tail: int) -> None:
+    expires_at = epoch() + 5 * 60
+    for i in range(orders):
+        if i == orders - tail:
+            store.snapshot()
+        o = Order(new_id("ord"), f"cust_{i % 5000}", "L1" if i % 2 else "L2")
+        store.save_order(o)
+        for status in STATUSES[1:3]:
+            o.status = status
+            store.save_order(o)
+        o.items_text, o.total_cents, o.pay_session_id = "1x combo", 1299, new_id("pay")
+        p = PaymentSession(o.pay_session_id, o.order_id, o.customer_id, 1299, expires_at)
+        store.save_payment(p)
+        p.status, p.payment_method = PaymentStatus.APPROVED, "google_pay"
+        store.save_payment(p)
+        o.status = STATUSES[3]
+        store.save_order(o)
+        if i % 1000 == 999:
+            store._commit()  # a flush interval's worth of writes, without triggering snapshots
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=100_000)
+    ap.add_argument("--tail", type=int, default=10_000, help="orders written after the last snapshot")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = LogStore(directory, snapshot_every=10**12)
+        started = time.perf_counter()
+        populate(store, args.orders, args.tail)
+        store._commit()
+        write_seconds = time.perf_counter() - started
+        store._log.close()
+
+        sizes = {name: os.path.getsize(os.path.join(directory, name)) for name in sorted(os.listdir(directory))}
+        started = time.perf_counter()
+        recovered = LogStore(directory)
+        recover_seconds = time.perf_counter() - started
+        assert len(recovered.orders) == args.orders and len(recovered.payments) == args.orders
+        recovered.close()
+
+    print(json.dumps({
+        "orders": args.orders,
+        "tail_orders": args.tail,
+        "write_seconds": round(write_seconds, 3),
+        "files_mb": {name: round(size / 2**20, 1) for name, size in sizes.items()},
+        "recover_seconds": round(recover_seconds, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
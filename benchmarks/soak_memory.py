@@ -0,0 +1,79 @@
+# Soak: run the full order flow continuously with short retention and watch
+# resident memory and live record counts level off once the sweeper starts
+# evicting.
+#
+#   python -m benchmarks.soak_memory --seconds 60 --retention 5
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from app import state, timers
+from app.helpers import current_lane_code
+from app.main import app
+from app.timers import TimerWheel
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+async def run_flow(client: httpx.AsyncClient, i: int, customers: int) -> None:
+    customer_id = f"soak_{i % customers}"
+    lane_id = "L1" if i % 2 else "L2"
+    await client.post("/customer/checkin", json={"customer_id": customer_id, "lane_id": lane_id})
+    code = current_lane_code(lane_id).code
+    r = await client.post("/customer/connect", json={"customer_id": customer_id, "lane_id": lane_id, "code": code})
+    order_id = r.json()["order_id"]
+    r = await client.post(f"/cashier/order/{order_id}/confirm_total", json={"items_text": "1x combo", "total_cents": 1299})
+    pay_session_id = r.json()["pay_session_id"]
+    await client.post(f"/payment/{pay_session_id}/pay", json={"customer_id": customer_id, "mode": "paypal"})
+
+
+async def soak(seconds: float, sample_every: float, customers: int) -> list:
+    samples = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://soak") as client:
+            started = time.perf_counter()
+            next_sample = started
+            i = 0
+            while time.perf_counter() - started < seconds:
+                await run_flow(client, i, customers)
+                await asyncio.sleep(0)  # in-process requests never yield on their own
+                i += 1
+                now = time.perf_counter()
+                if now >= next_sample:
+                    samples.append({
+                        "t": round(now - started, 1),
+                        "orders_created": i,
+                        "rss_mb": rss_mb(),
+                        "live_orders": len(state.store.orders),
+                        "live_payments": len(state.store.payments),
+                        "live_checkins": len(state.store.checkins),
+                        "timers": len(timers.wheel),
+                    })
+                    next_sample = now + sample_every
+    return samples
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=60)
+    ap.add_argument("--retention", type=float, default=5, help="order/payment/check-in retention in seconds")
+    ap.add_argument("--sample-every", type=float, default=5)
+    ap.add_argument("--customers", type=int, default=500, help="distinct repeat customers")
+    args = ap.parse_args()
+
+    timers.ORDER_RETENTION = timers.STALE_ORDER_RETENTION = timers.CHECKIN_TTL = args.retention
+    timers.wheel = TimerWheel(tick=0.1)
+    print(json.dumps(asyncio.run(soak(args.seconds, args.sample_every, args.customers)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
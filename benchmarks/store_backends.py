@@ -0,0 +1,57 @@
+# Orders/sec for checkin -> connect -> confirm_total -> pay on each state store.
+#
+#   python -m benchmarks.store_backends --orders 2000
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app import state
+from app.helpers import current_lane_code
+from app.main import app
+from app.storage import MemoryStore, SqliteStore
+
+
+async def run_flow(client: httpx.AsyncClient, i: int) -> None:
+    customer_id = f"bench_{i}"
+    lane_id = "L1" if i % 2 else "L2"
+    await client.post("/customer/checkin", json={"customer_id": customer_id, "lane_id": lane_id})
+    code = current_lane_code(lane_id).code
+    r = await client.post("/customer/connect", json={"customer_id": customer_id, "lane_id": lane_id, "code": code})
+    order_id = r.json()["order_id"]
+    r = await client.post(f"/cashier/order/{order_id}/confirm_total", json={"items_text": "1x combo", "total_cents": 1299})
+    pay_session_id = r.json()["pay_session_id"]
+    r = await client.post(f"/payment/{pay_session_id}/pay", json={"customer_id": customer_id, "mode": "google_pay"})
+    assert r.json()["status"] == "APPROVED", r.text
+
+
+async def bench(store, orders: int) -> dict:
+    state.store = store
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for i in range(orders):
+            await run_flow(client, i)
+        store.flush()
+        elapsed = time.perf_counter() - started
+    store.close()
+    return {"orders": orders, "seconds": round(elapsed, 3), "orders_per_sec": round(orders / elapsed, 1)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=2000)
+    args = ap.parse_args()
+
+    results = {"memory": asyncio.run(bench(MemoryStore(), args.orders))}
+    with tempfile.TemporaryDirectory() as tmp:
+        results["sqlite"] = asyncio.run(bench(SqliteStore(str(Path(tmp) / "bench.db")), args.orders))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Parse + validate cost per request body / socket frame: the old
+# json.loads + str(payload.get(...)).strip() handling, against the typed
+# models as routes use them (json.loads, then model_validate, which is what
+# FastAPI does) and as sockets use them (validate_json on the raw text).
+#
+#   python -m benchmarks.validation --rounds 50000
+import argparse
+import json
+import time
+
+from app.models import CALL_MESSAGE, ORDER_MESSAGE, CheckinRequest, ConfirmTotalRequest, PayRequest
+
+
+def old_checkin(raw: str) -> tuple:
+    payload = json.loads(raw)
+    return str(payload.get("customer_id", "")).strip(), str(payload.get("lane_id", "")).strip().upper()
+
+
+def old_confirm_total(raw: str) -> tuple:
+    payload = json.loads(raw)
+    return str(payload.get("items_text", "")).strip(), int(payload.get("total_cents", 0))
+
+
+def old_pay(raw: str) -> tuple:
+    payload = json.loads(raw)
+    customer_id = str(payload.get("customer_id", "")).strip()
+    mode = str(payload.get("mode", "")).strip()
+    nc = payload.get("new_card") or {}
+    number = str(nc.get("number", "")).replace(" ", "")
+    return customer_id, mode, number, str(nc.get("exp", "")).strip(), str(nc.get("cvv", "")).strip()
+
+
+def old_chat(raw: str) -> str:
+    msg = json.loads(raw)
+    if msg.get("type") == "chat":
+        return str(msg.get("text", "")).strip()
+
+
+def old_call(raw: str) -> dict:
+    return json.loads(raw)
+
+
+CASES = {
+    "checkin": (
+        '{"customer_id": "cust_123", "lane_id": "L1"}',
+        old_checkin, CheckinRequest.model_validate, CheckinRequest.model_validate_json,
+    ),
+    "confirm_total": (
+        '{"items_text": "2x combo, 1x shake", "total_cents": 2599}',
+        old_confirm_total, ConfirmTotalRequest.model_validate, ConfirmTotalRequest.model_validate_json,
+    ),
+    "pay_new_card": (
+        '{"customer_id": "cust_123", "mode": "new_card", "new_card": {"number": "4111 1111 1111 1111", "exp": "12/30", "cvv": "123", "name": "A"}}',
+        old_pay, PayRequest.model_validate, PayRequest.model_validate_json,
+    ),
+    "ws_chat": (
+        '{"type": "chat", "from": "CUSTOMER", "text": "1x combo, no pickles"}',
+        old_chat, ORDER_MESSAGE.validate_python, ORDER_MESSAGE.validate_json,
+    ),
+    "ws_webrtc_ice": (
+        '{"type": "webrtc_ice", "candidate": {"candidate": "candidate:1 1 udp 2122260223 10.0.0.2 54321 typ host", "sdpMid": "0", "sdpMLineIndex": 0}}',
+        old_call, CALL_MESSAGE.validate_python, CALL_MESSAGE.validate_json,
+    ),
+}
+
+
+def per_call_us(fn, arg, rounds: int) -> float:
+    for _ in range(min(rounds, 1000)):
+        fn(arg)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(arg)
+    return round((time.perf_counter() - started) / rounds * 1e6, 2)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=50_000)
+    args = ap.parse_args()
+
+    report = {}
+    for name, (raw, old, validate, validate_json) in CASES.items():
+        report[name] = {
+            "dict_us": per_call_us(old, raw, args.rounds),
+            "model_after_json_loads_us": per_call_us(lambda r: validate(json.loads(r)), raw, args.rounds),
+            "model_from_raw_us": per_call_us(validate_json, raw, args.rounds),
+        }
+    print(json.dumps({"rounds": args.rounds, "cases": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
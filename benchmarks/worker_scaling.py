@@ -0,0 +1,97 @@
+# Orders/sec against `run.py --workers N` for several N, with the load
+# generator split across client processes (one lane each, from the lanes
+# the server lists at GET /lanes) so the client is not the bottleneck. Each
+# run gets a fresh SQLite file and relay socket.
+#
+#   python -m benchmarks.worker_scaling --workers 1,2,4 --cars 400
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from benchmarks.load.__main__ import listed_lanes
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("server did not start")
+
+
+def run(workers: int, cars: int, clients: Optional[int], concurrency: int) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, STORE_URL=f"sqlite:///{tmp}/bench.db?batch_size=1", RELAY_SOCKET=f"{tmp}/relay.sock")
+        server = subprocess.Popen(
+            [sys.executable, "run.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port, server)
+            time.sleep(0.5)  # let every worker come up and reach the hub
+            lanes = asyncio.run(listed_lanes(f"http://127.0.0.1:{port}"))
+            clients = clients or len(lanes)
+            outs = [f"{tmp}/client{i}.json" for i in range(clients)]
+            procs = [
+                subprocess.Popen([
+                    sys.executable, "-m", "benchmarks.load", "--url", f"http://127.0.0.1:{port}",
+                    "--cars", str(cars // clients), "--lane-ids", lanes[i % len(lanes)],
+                    "--concurrency", str(concurrency), "--out", out,
+                ], cwd=ROOT, stdout=subprocess.DEVNULL)
+                for i, out in enumerate(outs)
+            ]
+            for p in procs:
+                p.wait()
+            reports = [json.load(open(out)) for out in outs]
+        finally:
+            server.terminate()
+            server.wait()
+
+    completed = sum(r["completed"] for r in reports)
+    wall = max(r["wall_seconds"] for r in reports)
+    return {
+        "workers": workers,
+        "completed": completed,
+        "errors": sum(sum(r["errors"].values()) for r in reports),
+        "orders_per_second": round(completed / wall, 2),
+        "end_to_end_p50_ms": max(r["end_to_end"].get("p50_ms", 0) for r in reports),
+        "end_to_end_p99_ms": max(r["end_to_end"].get("p99_ms", 0) for r in reports),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--cars", type=int, default=400)
+    ap.add_argument("--clients", type=int, help="load generator processes, one lane each (default: one per listed lane)")
+    ap.add_argument("--concurrency", type=int, default=50, help="cars in flight per client")
+    args = ap.parse_args()
+
+    results = [run(int(n), args.cars, args.clients, args.concurrency) for n in args.workers.split(",")]
+    print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,47 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from urllib.parse import parse_qsl
+
 import uvicorn
 
+from app import relay
+
+
+def run_workers(workers: int, host: str, port: int) -> None:
+    # Sockets stay in the worker that accepted them; the relay hub forwards
+    # frames between workers, and all of them share one SQLite store.
+    url = os.environ.setdefault("STORE_URL", "sqlite:///easypay.db?batch_size=1")
+    _, _, query = url.partition("?")
+    # Batched writes stay invisible to the other workers until committed.
+    if not url.startswith("sqlite:///") or dict(parse_qsl(query)).get("batch_size") != "1":
+        raise SystemExit("--workers needs a shared store: STORE_URL=sqlite:///path?batch_size=1")
+    path = os.environ.setdefault("RELAY_SOCKET", os.path.join(tempfile.gettempdir(), f"drive-thru-relay-{port}.sock"))
+
+    if os.path.exists(path):
+        os.unlink(path)
+    hub = multiprocessing.Process(target=relay.serve_hub, args=(path,), daemon=True)
+    hub.start()
+    while not os.path.exists(path):
+        if not hub.is_alive():
+            raise SystemExit("relay hub failed to start")
+        time.sleep(0.01)
+    try:
+        uvicorn.run("app.main:app", host=host, port=port, workers=workers)
+    finally:
+        hub.terminate()
+
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, help="run N worker processes behind a relay hub (no autoreload)")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8000)
+    args = ap.parse_args()
+
+    if args.workers:
+        run_workers(args.workers, args.host, args.port)
+    else:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)